@@ -7,8 +7,12 @@ CREATE TABLE users (
     email VARCHAR(255) UNIQUE NOT NULL,
     password_hash VARCHAR(255) NOT NULL
 );
+-- Partitioned by month of transaction_date (backend/partitions.py adds the
+-- upcoming months). Unique keys must include the partition column, and
+-- partitioned tables cannot have foreign keys, so the trigger below deletes
+-- a user's transactions.
 CREATE TABLE budget_data (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     user_id INT NOT NULL,
     expense_category ENUM(
         'Food',
@@ -23,10 +27,109 @@ CREATE TABLE budget_data (
     ) NOT NULL,
     amount DECIMAL(10, 2) NOT NULL,
     transaction_date DATE NOT NULL,
+    month CHAR(7) AS (DATE_FORMAT(transaction_date, '%Y-%m')) STORED,
     description TEXT,
+    fingerprint CHAR(40) NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, transaction_date),
+    UNIQUE KEY uq_budget_data_fingerprint (fingerprint, transaction_date),
+    INDEX idx_budget_data_user_date (user_id, transaction_date, id, amount),
+    INDEX idx_budget_data_user_category (user_id, expense_category, transaction_date, id, amount),
+    INDEX idx_budget_data_user_month (user_id, month, amount)
+)
+PARTITION BY RANGE COLUMNS(transaction_date) (
+    PARTITION p_before VALUES LESS THAN ('2025-01-01'),
+    PARTITION p202501 VALUES LESS THAN ('2025-02-01'),
+    PARTITION p202502 VALUES LESS THAN ('2025-03-01'),
+    PARTITION p202503 VALUES LESS THAN ('2025-04-01'),
+    PARTITION p202504 VALUES LESS THAN ('2025-05-01'),
+    PARTITION p202505 VALUES LESS THAN ('2025-06-01'),
+    PARTITION p202506 VALUES LESS THAN ('2025-07-01'),
+    PARTITION p202507 VALUES LESS THAN ('2025-08-01'),
+    PARTITION p202508 VALUES LESS THAN ('2025-09-01'),
+    PARTITION p202509 VALUES LESS THAN ('2025-10-01'),
+    PARTITION p202510 VALUES LESS THAN ('2025-11-01'),
+    PARTITION p202511 VALUES LESS THAN ('2025-12-01'),
+    PARTITION p202512 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+    PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+    PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+    PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+    PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+    PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+    PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+    PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+    PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+CREATE TRIGGER users_delete_budget_data AFTER DELETE ON users
+FOR EACH ROW DELETE FROM budget_data WHERE user_id = OLD.id;
+CREATE TABLE merchant_categories (
+    merchant_key VARCHAR(255) PRIMARY KEY,
+    expense_category ENUM(
+        'Food',
+        'Dining',
+        'Transportation',
+        'Utilities',
+        'Shopping',
+        'Entertainment',
+        'Health',
+        'Rent',
+        'Other'
+    ) NOT NULL,
+    times_seen INT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+-- Dashboard rollups of budget_data (backend/rollups.py)
+CREATE TABLE budget_monthly_rollups (
+    user_id INT NOT NULL,
+    month CHAR(7) NOT NULL,
+    expense_category ENUM(
+        'Food',
+        'Dining',
+        'Transportation',
+        'Utilities',
+        'Shopping',
+        'Entertainment',
+        'Health',
+        'Rent',
+        'Other'
+    ) NOT NULL,
+    transaction_count INT NOT NULL,
+    total_amount DECIMAL(14, 2) NOT NULL,
+    absolute_amount DECIMAL(14, 2) NOT NULL,
+    earliest_date DATE NOT NULL,
+    latest_date DATE NOT NULL,
+    PRIMARY KEY (user_id, month, expense_category),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
+CREATE TABLE budget_daily_rollups (
+    user_id INT NOT NULL,
+    transaction_date DATE NOT NULL,
+    transaction_count INT NOT NULL,
+    total_amount DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (user_id, transaction_date),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+-- Applied migrations (backend/migrate.py). The schema above already includes
+-- 001, 002, 004 and 005; `python migrate.py up` runs the rest, which
+-- fingerprint the sample rows below and fill their rollups.
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum CHAR(64) NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INT NULL
+);
+INSERT INTO schema_migrations (version, name)
+VALUES (1, 'add_transaction_fingerprint'),
+    (2, 'budget_data_query_indexes'),
+    (4, 'partition_budget_data'),
+    (5, 'budget_rollups'),
+    (7, 'transaction_page_indexes');
 INSERT INTO users (name, email, password_hash)
 VALUES (
         'John Doe',
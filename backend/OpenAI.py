@@ -3,7 +3,8 @@ import os
 from openai import OpenAI
 import mysql.connector
 from mysql.connector import Error
-from database import get_db
+from database import get_read_db
+from llm_transport import llm_client_options
 
 # Load environment variables
 load_dotenv()
@@ -15,7 +16,8 @@ class OpenAIService:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(OpenAIService, cls).__new__(cls)
-            cls._instance.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+            # LLM_TRANSPORT_MODE can point this at recordings or a local stand-in
+            cls._instance.client = OpenAI(**llm_client_options())
         return cls._instance
 
     def get_user_transactions(self, user_id):
@@ -23,8 +25,8 @@ class OpenAIService:
         Get transactions for a specific user from the database
         """
         try:
-            # Connect to the database
-            connection = get_db()
+            # A read replica unless the user just uploaded; see database.get_read_db
+            connection = get_read_db(user_id)
             cursor = connection.cursor(dictionary=True)
 
             # Fetch transactions for the user
@@ -32,7 +34,7 @@ class OpenAIService:
             SELECT expense_category, amount, transaction_date, description
             FROM budget_data
             WHERE user_id = %s
-            ORDER BY transaction_date DESC
+            ORDER BY transaction_date DESC, id DESC
             """
             cursor.execute(query, (user_id,))
             transactions = cursor.fetchall()
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import mysql.connector
 from mysql.connector import Error
@@ -7,27 +7,83 @@ from werkzeug.utils import secure_filename
 import os
 import pdfplumber
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from collections import defaultdict
 from pdf_processor import PDFProcessor
+from merchant_index import MerchantCategoryIndex
+from ingestion import StatementIngestor
+from ingestion_metrics import REGISTRY as METRICS_REGISTRY
+from job_queue import UploadJobQueue, UploadWorkerPool
+from partitions import PartitionMaintainer
+from dashboard import fetch_summary
+from transaction_pages import build_page, page_query
+from transaction_export import FORMATS as EXPORT_FORMATS, ExportStream, export_format, export_query, open_export
 from dotenv import load_dotenv
 import logging
+import uuid
+import shutil
+import threading
+import zipfile
 
-from database import DatabaseConnection, get_db, close_db_connection
+from database import (checkout_db, checkout_read_db, get_db, get_pool, get_read_db, get_router,
+                      close_db_connection, init_app as init_db)
 
 import bcrypt
 
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:5173", "https://seng-401-final-project-ten.vercel.app"])
-
 # Initialize services
 load_dotenv()
 ai_service = OpenAIService()
-pdf_processor = PDFProcessor()
+merchant_index = MerchantCategoryIndex(connection_factory=checkout_db)
+pdf_processor = PDFProcessor(merchant_index=merchant_index)
+ingestor = StatementIngestor(pdf_processor, merchant_index=merchant_index)
+
+# Uploads are processed off the request path; set UPLOAD_WORKER_THREADS=0
+# to leave them to dedicated `python upload_worker.py` processes
+upload_jobs = UploadJobQueue()
+upload_workers = UploadWorkerPool(upload_jobs, ingestor.run_job, cleanup=ingestor.discard_upload)
+
+# Each request checks pooled connections out on first use and returns them
+# at teardown. Reads of a user's data go to a read replica when
+# MYSQL_REPLICA_HOSTS lists any, except for READ_YOUR_WRITES_SECONDS after
+# one of their uploads completes: the replicas may not have the new rows yet
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', '60'))
+init_db(app, wrote_recently=lambda user_id: upload_jobs.completed_since(user_id, READ_YOUR_WRITES_SECONDS))
+
+# Adds the upcoming monthly budget_data partitions (see partitions.py)
+partition_maintainer = PartitionMaintainer(checkout_db)
+
+# Background threads start with the first request a process serves, never
+# at import: the PDF decode processes re-import this module (spawn), and
+# neither they nor the reloader's watcher process should run workers
+_background_started = False
+_background_lock = threading.Lock()
+
+
+def start_background_workers():
+    """Start the upload workers and the partition maintainer, once per process"""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    if upload_workers.workers > 0:
+        upload_workers.start()
+    if PartitionMaintainer.enabled():
+        partition_maintainer.start()
+
+
+@app.before_request
+def ensure_background_workers():
+    if not _background_started:
+        start_background_workers()
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
+BATCH_UPLOAD_MAX_FILES = int(os.getenv('BATCH_UPLOAD_MAX_FILES', '24'))
+BATCH_UPLOAD_MAX_BYTES = int(os.getenv('BATCH_UPLOAD_MAX_MB', '200')) * 1024 * 1024
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
@@ -35,6 +91,46 @@ if not os.path.exists(UPLOAD_FOLDER):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def save_batch_files(files, batch_dir):
+    """Save uploaded PDFs and the PDFs inside uploaded ZIPs into batch_dir.
+
+    Files are numbered so the worker processes them in upload order.
+    Returns the number of statements saved; raises ValueError on bad input.
+    """
+    saved = 0
+    total_bytes = 0
+
+    def next_path(name):
+        nonlocal saved
+        saved += 1
+        if saved > BATCH_UPLOAD_MAX_FILES:
+            raise ValueError(f'At most {BATCH_UPLOAD_MAX_FILES} statements per batch')
+        return os.path.join(batch_dir, f"{saved:03d}_{secure_filename(name) or 'statement.pdf'}")
+
+    for file in files:
+        filename = file.filename or ''
+        if filename.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(file.stream) as archive:
+                    for member in archive.infolist():
+                        # Only PDFs, and only by base name so paths cannot escape batch_dir
+                        name = os.path.basename(member.filename)
+                        if member.is_dir() or not allowed_file(name) or name.startswith('.'):
+                            continue
+                        total_bytes += member.file_size
+                        if total_bytes > BATCH_UPLOAD_MAX_BYTES:
+                            raise ValueError('Archive is too large')
+                        with archive.open(member) as source, open(next_path(name), 'wb') as target:
+                            shutil.copyfileobj(source, target)
+            except zipfile.BadZipFile:
+                raise ValueError(f'Invalid ZIP archive: {filename}')
+        elif allowed_file(filename):
+            file.save(next_path(filename))
+        else:
+            raise ValueError(f'Invalid file type: {filename}')
+
+    return saved
+
 # Routes
 @app.route('/api/signup', methods=['POST'])
 def signup():
@@ -134,93 +230,131 @@ def upload_and_analyze_pdf():
             return jsonify({'error': 'Invalid request parameters'}), 400
 
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(UPLOAD_FOLDER, filename)
+            # Unique name: the file waits on disk until a worker picks it up
+            filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+            file_path = os.path.abspath(os.path.join(UPLOAD_FOLDER, filename))
             file.save(file_path)
 
-            transactions = pdf_processor.process_pdf(file_path)
-            if not transactions:
-                return jsonify({'error': 'Could not extract data from PDF'}), 400
-
-            db = get_db()
-            cursor = db.cursor()
-            
-            try:
-                transactions_added = 0
-                for transaction in transactions:
-                    cursor.execute(
-                        """INSERT INTO budget_data 
-                        (user_id, expense_category, amount, transaction_date, description)
-                        VALUES (%s, %s, %s, %s, %s)""",
-                        (user_id, transaction['expense_category'], transaction['amount'],
-                         transaction['transaction_date'], transaction['description'])
-                    )
-                    transactions_added += 1
-                db.commit()
-                return jsonify({
-                    'message': 'PDF processed successfully',
-                    'transactions_count': transactions_added
-                }), 200
-
-            except Error as e:
-                db.rollback()
-                logging.error(f"Database error: {str(e)}")
-                return jsonify({'error': 'Failed to save transactions'}), 500
-
-            finally:
-                cursor.close()
-                try:
-                    os.remove(file_path)
-                except OSError:
-                    pass
+            job_id = upload_jobs.enqueue(user_id, file_path)
+            return jsonify({
+                'message': 'PDF queued for processing',
+                'job_id': job_id,
+                'state': 'queued',
+                'status_url': f'/api/jobs/{job_id}'
+            }), 202
 
         return jsonify({'error': 'Invalid file type'}), 400
 
     except Exception as e:
-        logging.error(f"PDF processing error: {str(e)}")
+        logging.error(f"PDF upload error: {str(e)}")
         return jsonify({'error': f'Error processing PDF: {str(e)}'}), 500
 
+@app.route('/api/upload-and-analyze-pdfs', methods=['POST'])
+def upload_and_analyze_pdfs():
+    batch_dir = None
+    try:
+        files = request.files.getlist('files')
+        user_id = request.form.get('user_id')
+
+        if not user_id or not files:
+            return jsonify({'error': 'Invalid request parameters'}), 400
+
+        batch_dir = os.path.abspath(os.path.join(UPLOAD_FOLDER, f"batch_{uuid.uuid4().hex}"))
+        os.makedirs(batch_dir)
+
+        try:
+            saved = save_batch_files(files, batch_dir)
+        except ValueError as e:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return jsonify({'error': str(e)}), 400
+
+        if not saved:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return jsonify({'error': 'No PDF statements found'}), 400
+
+        # The worker sees a directory and ingests it as one batch
+        job_id = upload_jobs.enqueue(user_id, batch_dir)
+        return jsonify({
+            'message': f'{saved} PDFs queued for processing',
+            'job_id': job_id,
+            'state': 'queued',
+            'files_count': saved,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
+
+    except Exception as e:
+        if batch_dir:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+        logging.error(f"Batch upload error: {str(e)}")
+        return jsonify({'error': f'Error processing PDFs: {str(e)}'}), 500
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    try:
+        job = upload_jobs.get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        return jsonify({
+            'job_id': job['id'],
+            'user_id': job['user_id'],
+            'state': job['state'],
+            'transactions_count': job['transactions_count'],
+            'error': job['error'],
+            'results': job['results'],
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at']
+        })
+
+    except Exception as e:
+        logging.error(f"Job status error: {str(e)}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    # Ingestion counters and stage timings of this process; uploads run by
+    # separate upload_worker processes report through their job records
+    try:
+        snapshot = METRICS_REGISTRY.snapshot()
+        snapshot['upload_jobs'] = upload_jobs.state_counts()
+        snapshot['db_pool'] = get_pool().stats()
+        snapshot['db_replicas'] = get_router().stats()
+        return jsonify(snapshot)
+
+    except Exception as e:
+        logging.error(f"Metrics error: {str(e)}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+def date_range_filter(args):
+    """SQL condition and parameters for the optional ?from= and ?to= dates (inclusive).
+
+    The bounds compare transaction_date itself, never a function of it, so
+    MySQL only reads the budget_data partitions in the range.
+    """
+    conditions, params = [], []
+    for name, operator, offset in (('from', '>=', 0), ('to', '<', 1)):
+        value = args.get(name)
+        if value:
+            day = datetime.strptime(value, '%Y-%m-%d').date() + timedelta(days=offset)
+            conditions.append(f" AND transaction_date {operator} %s")
+            params.append(day)
+    return ''.join(conditions), params
+
 @app.route("/api/check-transactions/<int:user_id>", methods=["GET"])
 def check_transactions(user_id):
     try:
-        db = get_db()
-        cursor = db.cursor(dictionary=True)
+        date_filter, date_params = date_range_filter(request.args)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
 
-        try:
-            cursor.execute("SELECT COUNT(*) as total FROM budget_data WHERE user_id = %s", (user_id,))
-            total = cursor.fetchone()['total']
-
-            queries = {
-                'transactions_by_date': """
-                    SELECT DATE(transaction_date) as date, COUNT(*) as transactions_count,
-                    SUM(amount) as total_amount FROM budget_data 
-                    WHERE user_id = %s GROUP BY DATE(transaction_date) ORDER BY date DESC
-                """,
-                'recent_transactions': """
-                    SELECT transaction_date, description, amount, expense_category, id as transaction_id
-                    FROM budget_data WHERE user_id = %s ORDER BY transaction_date DESC LIMIT 10
-                """,
-                'category_summary': """
-                    SELECT expense_category, COUNT(*) as count, SUM(amount) as total_amount,
-                    MIN(transaction_date) as earliest_date, MAX(transaction_date) as latest_date
-                    FROM budget_data WHERE user_id = %s GROUP BY expense_category
-                """,
-                'monthly_spending': """
-                    SELECT DATE_FORMAT(transaction_date, '%Y-%m') as month, SUM(ABS(amount)) as total_amount
-                    FROM budget_data WHERE user_id = %s GROUP BY DATE_FORMAT(transaction_date, '%Y-%m')
-                    ORDER BY month ASC
-                """
-            }
-
-            results = {}
-            for key, query in queries.items():
-                cursor.execute(query, (user_id,))
-                results[key] = cursor.fetchall()
+    try:
+        db = get_read_db(user_id)
+        cursor = db.cursor()
 
-            return jsonify({
-                'total_transactions': total,
-                **results
-            })
+        try:
+            # Every section in one statement; see dashboard.py
+            return jsonify(fetch_summary(cursor, user_id, date_filter, date_params))
 
         finally:
             cursor.close()
@@ -232,15 +366,22 @@ def check_transactions(user_id):
 @app.route("/api/transactions/<int:user_id>", methods=["GET"])
 def get_transactions(user_id):
     try:
-        db = get_db()
+        date_filter, date_params = date_range_filter(request.args)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+    try:
+        # One page at a time; see transaction_pages.py
+        query, params, limit = page_query(user_id, request.args, date_filter, date_params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        db = get_read_db(user_id)
         cursor = db.cursor(dictionary=True)
 
         try:
-            cursor.execute("""
-                SELECT id, transaction_date, description, amount, expense_category
-                FROM budget_data WHERE user_id = %s ORDER BY transaction_date DESC
-            """, (user_id,))
-            return jsonify({"transactions": cursor.fetchall()})
+            cursor.execute(query, params)
+            return jsonify(build_page(cursor.fetchall(), limit))
 
         finally:
             cursor.close()
@@ -249,8 +390,39 @@ def get_transactions(user_id):
         logging.error(f"Transaction fetch error: {str(e)}")
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+@app.route("/api/transactions/<int:user_id>/export", methods=["GET"])
+def export_transactions(user_id):
+    try:
+        date_filter, date_params = date_range_filter(request.args)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+    try:
+        fmt = export_format(request.args)
+        query, params = export_query(user_id, request.args, date_filter, date_params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # Not get_read_db(): the stream outlives the request; see transaction_export.py
+        db = checkout_read_db(user_id)
+    except Exception as e:
+        logging.error(f"Transaction export error: {str(e)}")
+        return jsonify({"error": "Internal Server Error"}), 500
+    try:
+        cursor = open_export(db, query, params)
+    except Exception as e:
+        db.discard()
+        logging.error(f"Transaction export error: {str(e)}")
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+    return Response(ExportStream(db, cursor, fmt), mimetype=EXPORT_FORMATS[fmt], headers={
+        "Content-Disposition": f"attachment; filename=transactions-{user_id}.{fmt}",
+        # Let proxies pass each chunk on as it comes
+        "X-Accel-Buffering": "no"
+    })
+
 if __name__ == "__main__":
     try:
         app.run(debug=True, port=5001, host='0.0.0.0')
     finally:
-        DatabaseConnection.close_db_connection()
\ No newline at end of file
+        close_db_connection()
\ No newline at end of file
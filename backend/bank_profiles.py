@@ -0,0 +1,116 @@
+import json
+import os
+import re
+from dotenv import load_dotenv
+
+from merchant_index import VALID_CATEGORIES
+
+load_dotenv()
+
+DEFAULT_PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bank_profiles.json')
+
+# Extraction strategies a profile can ask for
+PARSERS = ('table', 'llm')
+
+# Section patterns the scanner understands
+SECTION_KEYS = ('payments_start', 'payments_end', 'charges_start', 'charges_end',
+                'summary_start', 'summary_total')
+
+# Transaction table settings the table parser understands
+TABLE_KEYS = ('header', 'ignore_words')
+HEADER_KEYS = ('description', 'amount', 'category')
+
+
+class BankProfile:
+    """How to read one issuer's statements: parser, skip regions, table layout and category mapping"""
+
+    def __init__(self, profile_id, name, match=(), parser='llm', sections=None, category_map=None,
+                 skip_descriptions=(), table=None):
+        if parser not in PARSERS:
+            raise ValueError(f"Profile {profile_id}: unknown parser {parser}")
+        unknown = set(sections or {}) - set(SECTION_KEYS)
+        if unknown:
+            raise ValueError(f"Profile {profile_id}: unknown sections {sorted(unknown)}")
+        unknown = set(table or {}) - set(TABLE_KEYS)
+        unknown |= set((table or {}).get('header', {})) - set(HEADER_KEYS)
+        if unknown:
+            raise ValueError(f"Profile {profile_id}: unknown table settings {sorted(unknown)}")
+        invalid = set((category_map or {}).values()) - set(VALID_CATEGORIES)
+        if invalid:
+            raise ValueError(f"Profile {profile_id}: invalid categories {sorted(invalid)}")
+
+        self.id = profile_id
+        self.name = name
+        self.match = list(match)
+        self.parser = parser
+        self.sections = {key: re.compile(pattern) for key, pattern in (sections or {}).items()}
+        self.category_map = dict(category_map or {})
+        self.skip_descriptions = [term.lower() for term in skip_descriptions]
+        self.table = dict(table or {})
+
+    def matches(self, text):
+        """True if every marker of this issuer appears in the text"""
+        return bool(self.match) and all(marker in text for marker in self.match)
+
+    def map_category(self, spend_category):
+        """Our category for the statement's own spend category, or None"""
+        if spend_category:
+            for label, category in self.category_map.items():
+                if label in spend_category:
+                    return category
+        return None
+
+    def is_summary(self, description):
+        """True for totals and other lines that are not purchases"""
+        description = description.lower()
+        return any(term in description for term in self.skip_descriptions)
+
+    def strip_ignored(self, description):
+        """The description without the glyphs the statement prints around it (table.ignore_words)"""
+        for word in self.table.get('ignore_words', ()):
+            description = description.replace(word, '')
+        return description.strip()
+
+
+class BankProfileRegistry:
+    """Statement formats we know, loaded from bank_profiles.json.
+
+    The first page of an upload is matched against each profile's markers;
+    anything unrecognised gets the generic profile, which sends every page
+    to the LLM. Supporting a new bank means adding an entry to the file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('BANK_PROFILES_PATH', DEFAULT_PROFILES_PATH)
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        defaults = data.get('defaults', {})
+        self.generic = self._build({'id': 'generic', 'name': 'Unknown format'}, defaults)
+        self.profiles = [self._build(entry, defaults) for entry in data.get('profiles', [])]
+
+    def _build(self, entry, defaults):
+        settings = {**defaults, **entry}
+        return BankProfile(
+            settings['id'],
+            settings.get('name', settings['id']),
+            match=settings.get('match', ()),
+            parser=settings.get('parser', 'llm'),
+            sections=settings.get('sections'),
+            category_map=settings.get('category_map'),
+            skip_descriptions=settings.get('skip_descriptions', ()),
+            table=settings.get('table')
+        )
+
+    def get(self, profile_id):
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return self.generic if profile_id == self.generic.id else None
+
+    def detect(self, first_page_text):
+        """Pick the profile for a statement from its first page"""
+        for profile in self.profiles:
+            if profile.matches(first_page_text or ''):
+                return profile
+        return self.generic
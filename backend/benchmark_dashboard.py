@@ -0,0 +1,164 @@
+"""Latency of the dashboard summary, the way /api/check-transactions runs it now and before.
+
+    python benchmark_dashboard.py --users 20 --repeat 50 --output dashboard.json
+    python benchmark_dashboard.py --user-id 1 --compare dashboard.json
+
+Times each variant per page view against the configured database:
+- rows_sequential: the COUNT and four queries on budget_data, one after
+  the other (the route before the rollups)
+- rollups_sequential: the same five queries on the rollups
+- rollups_parallel: the four section queries at once, each on its own
+  pooled connection
+- single_statement: dashboard.fetch_summary, one round trip (the route now)
+
+The users timed default to those with the most transactions. `round_trip`
+times a bare SELECT, and each variant's p50_round_trips is its p50 in
+multiples of that.
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmark_ingestion import _git_commit
+from dashboard import fetch_summary
+from database import ConnectionPool, open_connection
+
+ROW_QUERIES = [
+    "SELECT COUNT(*) FROM budget_data WHERE user_id = %s",
+    """SELECT transaction_date, COUNT(*), SUM(amount) FROM budget_data
+       WHERE user_id = %s GROUP BY transaction_date ORDER BY transaction_date DESC""",
+    """SELECT transaction_date, description, amount, expense_category, id FROM budget_data
+       WHERE user_id = %s ORDER BY transaction_date DESC, id DESC LIMIT 10""",
+    """SELECT expense_category, COUNT(*), SUM(amount), MIN(transaction_date), MAX(transaction_date)
+       FROM budget_data WHERE user_id = %s GROUP BY expense_category""",
+    "SELECT month, SUM(ABS(amount)) FROM budget_data WHERE user_id = %s GROUP BY month ORDER BY month"
+]
+
+ROLLUP_QUERIES = [
+    "SELECT SUM(transaction_count) FROM budget_monthly_rollups WHERE user_id = %s",
+    """SELECT transaction_date, transaction_count, total_amount FROM budget_daily_rollups
+       WHERE user_id = %s ORDER BY transaction_date DESC""",
+    ROW_QUERIES[2],
+    """SELECT expense_category, SUM(transaction_count), SUM(total_amount), MIN(earliest_date), MAX(latest_date)
+       FROM budget_monthly_rollups WHERE user_id = %s GROUP BY expense_category""",
+    """SELECT month, SUM(absolute_amount) FROM budget_monthly_rollups
+       WHERE user_id = %s GROUP BY month ORDER BY month"""
+]
+
+
+def _run_queries(cursor, queries, user_id):
+    for query in queries:
+        cursor.execute(query, (user_id,))
+        cursor.fetchall()
+
+
+def _run_on_pool(pool, query, user_id):
+    connection = pool.checkout()
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, (user_id,))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+def _latencies(page_view, user_ids, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for user_id in user_ids:
+            started = time.perf_counter()
+            page_view(user_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 3),
+        'mean_ms': round(statistics.fmean(latencies), 3)
+    }
+
+
+def heaviest_users(cursor, count):
+    cursor.execute("""
+        SELECT user_id FROM budget_monthly_rollups GROUP BY user_id
+        ORDER BY SUM(transaction_count) DESC LIMIT %s
+    """, (count,))
+    return [user_id for user_id, in cursor.fetchall()]
+
+
+def run(user_ids=None, users=20, repeat=20):
+    connection = open_connection()
+    pool = ConnectionPool(size=4, max_overflow=0, connect=open_connection)
+    executor = ThreadPoolExecutor(max_workers=4)
+    cursor = connection.cursor()
+    try:
+        user_ids = user_ids or heaviest_users(cursor, users)
+        if not user_ids:
+            raise SystemExit("No rollups found; run `python migrate.py up` or pass --user-id")
+
+        def parallel(user_id):
+            list(executor.map(lambda query: _run_on_pool(pool, query, user_id), ROLLUP_QUERIES[1:]))
+
+        variants = {
+            'round_trip': lambda user_id: _run_queries(cursor, ["SELECT %s"], user_id),
+            'rows_sequential': lambda user_id: _run_queries(cursor, ROW_QUERIES, user_id),
+            'rollups_sequential': lambda user_id: _run_queries(cursor, ROLLUP_QUERIES, user_id),
+            'rollups_parallel': parallel,
+            'single_statement': lambda user_id: fetch_summary(cursor, user_id)
+        }
+        # One untimed pass warms the buffer pool and the pooled connections
+        for page_view in variants.values():
+            for user_id in user_ids:
+                page_view(user_id)
+        results = {name: _latencies(page_view, user_ids, repeat) for name, page_view in variants.items()}
+    finally:
+        cursor.close()
+        connection.close()
+        executor.shutdown()
+        pool.dispose()
+
+    baseline = results['rows_sequential']['p50_ms']
+    for name, result in results.items():
+        result['p50_vs_rows_sequential'] = f"{(result['p50_ms'] / baseline - 1) * 100:+.1f}%"
+        result['p50_round_trips'] = round(result['p50_ms'] / results['round_trip']['p50_ms'], 1)
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'user_ids': user_ids,
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def compare(report, baseline):
+    """p50 change of each variant against an earlier report"""
+    before = baseline.get('results', {})
+    return {name: f"{(result['p50_ms'] / before[name]['p50_ms'] - 1) * 100:+.1f}%"
+            for name, result in report['results'].items() if before.get(name, {}).get('p50_ms')}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the dashboard summary variants")
+    parser.add_argument("--user-id", type=int, action="append", help="User to time (repeatable)")
+    parser.add_argument("--users", type=int, default=20, help="Without --user-id, time this many heaviest users")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    report = run(args.user_id, args.users, args.repeat)
+    if args.compare:
+        with open(args.compare) as f:
+            report['compared_to'] = {'file': args.compare, 'changes': compare(report, json.load(f))}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
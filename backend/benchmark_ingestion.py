@@ -0,0 +1,280 @@
+"""Per-stage benchmark of the statement ingestion pipeline.
+
+    python benchmark_ingestion.py --pages 20 --per-page 40 --output bench.json
+    python benchmark_ingestion.py --pdf onlineStatement.pdf --extract llm --db
+    python benchmark_ingestion.py --pages 20 --compare bench.json
+
+Each statement goes through the same stages as an upload (load, split,
+extract, clean, reconcile, db_insert), timed one at a time with the peak
+Python memory of each, followed by an end-to-end run of
+PDFProcessor.iter_transactions. Statements are generated with
+statement_generator unless --pdf is given. LLM calls use the synthetic
+transport unless LLM_TRANSPORT_MODE is set, so the numbers need no API key
+and stay comparable between commits. The report is JSON; --compare prints
+each stage's change against an earlier report.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from langchain_core.documents import Document
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ('load', 'split', 'extract', 'clean', 'reconcile', 'db_insert')
+
+
+class StageTimer:
+    """Wall time and peak traced memory of named stages"""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = {}
+        try:
+            yield result
+        finally:
+            result['seconds'] = round(time.perf_counter() - started, 4)
+            if self.trace_memory:
+                result['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+            self.stages[name] = result
+
+
+def _throughput(count, seconds):
+    return round(count / seconds, 1) if seconds else None
+
+
+def _extract_llm(processor, chunks):
+    """Raw items for each chunk, in order, using the processor's chains and workers"""
+    chains = processor.make_chains()
+
+    def invoke(chunk):
+        try:
+            result = chains['full'].invoke(chunk.page_content)
+        except Exception as e:
+            print(f"Chunk failed: {str(e)}")
+            return []
+        if isinstance(result, dict):
+            return result.get('text', [])
+        return result if isinstance(result, list) else []
+
+    with ThreadPoolExecutor(max_workers=processor.max_workers) as executor:
+        return list(executor.map(invoke, chunks))
+
+
+def benchmark_statement(processor, file_path, extract='auto', user_id=None, connection_factory=None,
+                        trace_memory=True):
+    """Run one statement through every stage and return the timings"""
+    from fingerprint import TransactionDedupSet
+    from ingestion import StatementIngestor
+    from statement_scanner import StatementScanner, strip_spans
+
+    timer = StageTimer(trace_memory)
+
+    with timer.stage('load') as stage:
+        pages = list(processor.text_extractor.iter_pages(file_path))
+        stage['pages'] = len(pages)
+
+    profile = processor.profiles.detect(pages[0].page_content) if pages else processor.profiles.generic
+    use_parser = extract == 'parser' or (extract == 'auto' and profile.parser == 'table')
+
+    with timer.stage('split') as stage:
+        scanner = StatementScanner(profile.sections)
+        splitter = processor.make_text_splitter()
+        chunks_by_page = []
+        for index, page in enumerate(pages):
+            layout = scanner.scan_page(page.metadata.get('page', index), page.page_content)
+            text = strip_spans(page.page_content, layout['skip_spans'])
+            chunks = []
+            if text.strip():
+                chunks = splitter.split_documents([Document(page_content=text, metadata=page.metadata)])
+            chunks_by_page.append(chunks)
+        stage['chunks'] = sum(len(chunks) for chunks in chunks_by_page)
+
+    with timer.stage('extract') as stage:
+        raw_items = []
+        llm_chunks = []
+        if use_parser:
+            # Pages the parser is unsure of go to the LLM, as in iter_transactions
+            for index, parsed in enumerate(processor.table_parser.iter_pages(file_path, profile)):
+                if parsed['confident']:
+                    raw_items.extend(parsed['rows'])
+                elif index < len(chunks_by_page):
+                    llm_chunks.extend(chunks_by_page[index])
+        else:
+            llm_chunks = [chunk for chunks in chunks_by_page for chunk in chunks]
+        for items in _extract_llm(processor, llm_chunks) if llm_chunks else []:
+            raw_items.extend(items)
+        stage['method'] = 'parser' if use_parser else 'llm'
+        stage['llm_chunks'] = len(llm_chunks)
+        stage['items'] = len(raw_items)
+
+    with timer.stage('clean') as stage:
+        transactions = processor._clean_items(raw_items, profile, scanner.header.period)
+        stage['transactions'] = len(transactions)
+
+    with timer.stage('reconcile') as stage:
+        extracted_total = round(sum(t['amount'] for t in transactions), 2)
+        statement_total = scanner.header.total
+        stage['statement_total'] = statement_total
+        stage['extracted_total'] = extracted_total
+        stage['delta'] = round(statement_total - extracted_total, 2) if statement_total is not None else None
+
+    if connection_factory is None:
+        timer.stages['db_insert'] = {'skipped': 'no database (pass --db)'}
+    else:
+        try:
+            db = connection_factory()
+        except Exception as e:
+            timer.stages['db_insert'] = {'skipped': f"could not connect: {str(e)}"}
+        else:
+            ingestor = StatementIngestor(processor, connection_factory=connection_factory)
+            cursor = db.cursor()
+            try:
+                with timer.stage('db_insert') as stage:
+                    _, saved, _ = ingestor._insert_statement(cursor, user_id, transactions, TransactionDedupSet())
+                    stage['rows'] = saved
+            finally:
+                # Benchmark rows are never kept
+                db.rollback()
+                cursor.close()
+                db.close()
+
+    for name, stage in timer.stages.items():
+        if 'seconds' in stage:
+            stage['transactions_per_second'] = _throughput(len(transactions), stage['seconds'])
+
+    with timer.stage('end_to_end') as stage:
+        stage['transactions'] = sum(1 for _ in processor.iter_transactions(file_path))
+    end_to_end = timer.stages.pop('end_to_end')
+    end_to_end['transactions_per_second'] = _throughput(end_to_end['transactions'], end_to_end['seconds'])
+
+    return {
+        'file': os.path.basename(file_path),
+        'profile': profile.id,
+        'pages': len(pages),
+        'transactions': len(transactions),
+        'stages': {name: timer.stages[name] for name in STAGES if name in timer.stages},
+        'end_to_end': end_to_end
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline):
+    """Per-stage change in seconds against an earlier report, matched by file name"""
+    previous = {result['file']: result for result in baseline.get('results', [])}
+    changes = {}
+    for result in report['results']:
+        before = previous.get(result['file'])
+        if not before:
+            continue
+        stages = dict(result['stages'], end_to_end=result['end_to_end'])
+        before_stages = dict(before['stages'], end_to_end=before['end_to_end'])
+        changes[result['file']] = {
+            name: f"{(stage['seconds'] / before_stages[name]['seconds'] - 1) * 100:+.1f}%"
+            for name, stage in stages.items()
+            if 'seconds' in stage and before_stages.get(name, {}).get('seconds')
+        }
+    return changes
+
+
+def run(pdfs=None, pages=20, per_page=40, statements=1, seed=0, extract='auto', workers=None,
+        use_db=False, user_id=1, trace_memory=True):
+    """Benchmark the given PDFs, or freshly generated statements, and return the report"""
+    # The synthetic transport has to be chosen before the processor builds its clients
+    os.environ.setdefault('LLM_TRANSPORT_MODE', 'synthetic')
+    from pdf_processor import PDFProcessor
+    from statement_generator import generate_statement
+
+    # The extraction cache would turn repeated runs into cache reads
+    processor = PDFProcessor(max_workers=workers, extraction_cache=False)
+    connection_factory = None
+    if use_db:
+        from database import open_ingest_connection
+        connection_factory = open_ingest_connection
+
+    with tempfile.TemporaryDirectory() as workdir:
+        files = list(pdfs or [])
+        if not files:
+            for i in range(statements):
+                path = os.path.join(workdir, f"statement_{seed + i}.pdf")
+                generate_statement(path, pages, per_page, seed + i)
+                files.append(path)
+        try:
+            results = [benchmark_statement(processor, path, extract, user_id, connection_factory, trace_memory)
+                       for path in files]
+        finally:
+            processor.text_extractor.shutdown()
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'llm_transport': os.getenv('LLM_TRANSPORT_MODE'),
+        'extract': extract,
+        'workers': processor.max_workers,
+        'results': results
+    }
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux
+        report['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark each stage of statement ingestion")
+    parser.add_argument("--pdf", action="append", help="Statement PDF to benchmark (repeatable)")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per generated statement")
+    parser.add_argument("--per-page", type=int, default=40, help="Transactions per generated page")
+    parser.add_argument("--statements", type=int, default=1, help="Number of statements to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extract", choices=('auto', 'parser', 'llm'), default='auto',
+                        help="auto follows the bank profile; llm sends every chunk to the model")
+    parser.add_argument("--workers", type=int, help="Concurrent LLM calls")
+    parser.add_argument("--llm-latency-ms", type=int, help="Latency of the synthetic LLM server")
+    parser.add_argument("--db", action="store_true", help="Time inserts on the configured database (rolled back)")
+    parser.add_argument("--user-id", type=int, default=1, help="Owner of the benchmark rows")
+    parser.add_argument("--no-trace-memory", action="store_true", help="Skip tracemalloc, which slows every stage")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier report to compare stage timings against")
+    args = parser.parse_args()
+
+    if args.llm_latency_ms is not None:
+        os.environ['LLM_SYNTHETIC_LATENCY_MS'] = str(args.llm_latency_ms)
+
+    report = run(args.pdf, args.pages, args.per_page, args.statements, args.seed, args.extract, args.workers,
+                 args.db, args.user_id, not args.no_trace_memory)
+    if args.compare:
+        with open(args.compare) as f:
+            report['compared_to'] = {'file': args.compare, 'changes': compare(report, json.load(f))}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,268 @@
+"""Benchmark of the dashboard queries on a plain and a month-partitioned budget_data.
+
+    python benchmark_partitions.py --rows 10000000 --output partitions.json
+    python benchmark_partitions.py --reuse --repeat 20 --compare partitions.json
+
+Builds two copies of one synthetic transaction history in the configured
+database: bench_budget_flat (budget_data as it was before migration 004) and
+bench_budget_partitioned (as it is after). It then times the
+check_transactions queries on both for a sample of users, over the whole
+history and over date-bounded windows. EXPLAIN's partitions column is
+recorded, so the report shows which partitions each query read. The tables
+are kept for --reuse; --drop removes them.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from benchmark_ingestion import _git_commit
+from database import bulk_insert, open_ingest_connection
+from merchant_index import VALID_CATEGORIES
+from partitions import add_months, month_start, partition_by
+
+FLAT = 'bench_budget_flat'
+PARTITIONED = 'bench_budget_partitioned'
+NUMBERS = 'bench_numbers'
+NUMBERS_SIZE = 10000
+# Rows generated per INSERT ... SELECT
+CHUNK_ROWS = 200000
+
+COLUMNS = "id, user_id, expense_category, amount, transaction_date, description"
+
+# The check_transactions queries, with {table} and an optional date {bound}
+QUERIES = {
+    'total': "SELECT COUNT(*) FROM {table} WHERE user_id = %s{bound}",
+    'transactions_by_date': """
+        SELECT transaction_date, COUNT(*), SUM(amount) FROM {table}
+        WHERE user_id = %s{bound} GROUP BY transaction_date ORDER BY transaction_date DESC
+    """,
+    'recent_transactions': """
+        SELECT transaction_date, description, amount, expense_category, id FROM {table}
+        WHERE user_id = %s{bound} ORDER BY transaction_date DESC, id DESC LIMIT 10
+    """,
+    'category_summary': """
+        SELECT expense_category, COUNT(*), SUM(amount), MIN(transaction_date), MAX(transaction_date)
+        FROM {table} WHERE user_id = %s{bound} GROUP BY expense_category
+    """,
+    'monthly_spending': """
+        SELECT month, SUM(ABS(amount)) FROM {table}
+        WHERE user_id = %s{bound} GROUP BY month ORDER BY month
+    """
+}
+
+
+def table_ddl(name, partitioned, first_month=None, last_month=None):
+    """budget_data's definition, before or after migration 004"""
+    categories = ', '.join(f"'{category}'" for category in VALID_CATEGORIES)
+    # Unique keys of a partitioned table must include transaction_date
+    key_suffix = ', transaction_date' if partitioned else ''
+    ddl = f"""
+        CREATE TABLE {name} (
+            id INT AUTO_INCREMENT,
+            user_id INT NOT NULL,
+            expense_category ENUM({categories}) NOT NULL,
+            amount DECIMAL(10, 2) NOT NULL,
+            transaction_date DATE NOT NULL,
+            month CHAR(7) AS (DATE_FORMAT(transaction_date, '%Y-%m')) STORED,
+            description TEXT,
+            fingerprint CHAR(40) NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id{key_suffix}),
+            UNIQUE KEY uq_fingerprint (fingerprint{key_suffix}),
+            INDEX idx_user_date (user_id, transaction_date),
+            INDEX idx_user_category (user_id, expense_category),
+            INDEX idx_user_month (user_id, month, amount)
+        )
+    """
+    if partitioned:
+        ddl += partition_by(first_month, last_month)
+    return ddl
+
+
+def _execute(connection, query, params=None):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall() if cursor.with_rows else None
+        connection.commit()
+        return rows
+    finally:
+        cursor.close()
+
+
+def _generated_rows_query(table, start, end, total_rows, users, first_day, days):
+    # Rows are a pure function of n, so every build of a size is identical
+    categories = ', '.join(f"'{category}'" for category in VALID_CATEGORIES)
+    return f"""
+        INSERT INTO {table} (user_id, expense_category, amount, transaction_date, description)
+        SELECT n % {users} + 1,
+               ELT(n % {len(VALID_CATEGORIES)} + 1, {categories}),
+               ((n * 104729) % 50000) / 100,
+               DATE_ADD('{first_day}', INTERVAL (n * 7919) % {days} DAY),
+               CONCAT('MERCHANT ', (n * 31) % 2000)
+        FROM (SELECT a.n * {NUMBERS_SIZE} + b.n AS n FROM {NUMBERS} a CROSS JOIN {NUMBERS} b
+              WHERE a.n >= {start // NUMBERS_SIZE} AND a.n < {end // NUMBERS_SIZE}) numbers
+        WHERE n < {total_rows}
+        ORDER BY n
+    """
+
+
+def build(connection, rows, users, years, today):
+    """Create and fill both tables; returns the seconds each step took"""
+    first_day = add_months(month_start(today), -12 * years)
+    days = (today - first_day).days + 1
+    timings = {}
+
+    for table in (FLAT, PARTITIONED, NUMBERS):
+        _execute(connection, f"DROP TABLE IF EXISTS {table}")
+    _execute(connection, f"CREATE TABLE {NUMBERS} (n INT PRIMARY KEY)")
+    cursor = connection.cursor()
+    try:
+        bulk_insert(cursor, NUMBERS, ('n',), [(n,) for n in range(NUMBERS_SIZE)])
+        connection.commit()
+    finally:
+        cursor.close()
+
+    _execute(connection, table_ddl(FLAT, False))
+    started = time.perf_counter()
+    chunk = max(NUMBERS_SIZE, CHUNK_ROWS // NUMBERS_SIZE * NUMBERS_SIZE)
+    for start in range(0, rows, chunk):
+        _execute(connection, _generated_rows_query(FLAT, start, start + chunk, rows, users, first_day, days))
+        print(f"{FLAT}: {min(rows, start + chunk)}/{rows} rows")
+    timings['fill_flat'] = round(time.perf_counter() - started, 1)
+
+    _execute(connection, table_ddl(PARTITIONED, True, first_day, add_months(month_start(today), 3)))
+    started = time.perf_counter()
+    for start in range(0, rows, CHUNK_ROWS):
+        _execute(connection, f"INSERT INTO {PARTITIONED} ({COLUMNS}) SELECT {COLUMNS} FROM {FLAT} "
+                             f"WHERE id > {start} AND id <= {start + CHUNK_ROWS}")
+        print(f"{PARTITIONED}: {min(rows, start + CHUNK_ROWS)}/{rows} rows")
+    timings['fill_partitioned'] = round(time.perf_counter() - started, 1)
+
+    for table in (FLAT, PARTITIONED):
+        _execute(connection, f"ANALYZE TABLE {table}")
+    _execute(connection, f"DROP TABLE {NUMBERS}")
+    return timings
+
+
+def windows(today):
+    """Date bounds the dashboard could ask for, as (name, SQL condition)"""
+    return [
+        ('all_time', ''),
+        ('last_year', f" AND transaction_date >= '{today - timedelta(days=365)}'"),
+        ('last_3_months', f" AND transaction_date >= '{add_months(month_start(today), -2)}'"),
+        ('one_month', f" AND transaction_date >= '{add_months(month_start(today), -1)}'"
+                      f" AND transaction_date < '{month_start(today)}'"),
+    ]
+
+
+def time_query(connection, query, user_ids, repeat):
+    """Latencies in milliseconds of `query` run for each user, `repeat` times"""
+    cursor = connection.cursor()
+    latencies = []
+    try:
+        for _ in range(repeat):
+            for user_id in user_ids:
+                started = time.perf_counter()
+                cursor.execute(query, (user_id,))
+                cursor.fetchall()
+                latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        cursor.close()
+    latencies.sort()
+    return {
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        'mean_ms': round(statistics.fmean(latencies), 3)
+    }
+
+
+def partitions_read(connection, query, user_id):
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + query, (user_id,))
+        plan = cursor.fetchall()
+    finally:
+        cursor.close()
+    return [row.get('partitions') for row in plan]
+
+
+def run(connection, rows=10_000_000, users=2000, years=8, sample_users=20, repeat=5, reuse=False, seed=0):
+    today = date.today()
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'server': _execute(connection, "SELECT VERSION()")[0][0],
+        'rows': rows,
+        'users': users,
+        'years': years
+    }
+    if not reuse:
+        report['build_seconds'] = build(connection, rows, users, years, today)
+    report['rows_loaded'] = _execute(connection, f"SELECT COUNT(*) FROM {PARTITIONED}")[0][0]
+
+    user_ids = random.Random(seed).sample(range(1, users + 1), min(sample_users, users))
+    results = {}
+    for window, bound in windows(today):
+        results[window] = {}
+        for name, template in QUERIES.items():
+            entry = {}
+            for label, table in (('flat', FLAT), ('partitioned', PARTITIONED)):
+                query = template.format(table=table, bound=bound)
+                entry[label] = time_query(connection, query, user_ids, repeat)
+                if label == 'partitioned':
+                    entry['partitions_read'] = partitions_read(connection, query, user_ids[0])
+            entry['p50_change'] = f"{(entry['partitioned']['p50_ms'] / entry['flat']['p50_ms'] - 1) * 100:+.1f}%"
+            results[window][name] = entry
+        print(f"{window}: " + ', '.join(f"{name} {entry['p50_change']}" for name, entry in results[window].items()))
+    report['results'] = results
+    return report
+
+
+def compare(report, baseline):
+    """p50 change of every partitioned query against an earlier report"""
+    changes = {}
+    for window, queries in report['results'].items():
+        for name, entry in queries.items():
+            before = baseline.get('results', {}).get(window, {}).get(name)
+            if before:
+                changes[f"{window}.{name}"] = \
+                    f"{(entry['partitioned']['p50_ms'] / before['partitioned']['p50_ms'] - 1) * 100:+.1f}%"
+    return changes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dashboard queries on plain and partitioned budget_data")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=8, help="Span of transaction dates, ending today")
+    parser.add_argument("--sample-users", type=int, default=20, help="Users whose dashboards are timed")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="Time the tables left by an earlier run")
+    parser.add_argument("--drop", action="store_true", help="Drop the benchmark tables and exit")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    connection = open_ingest_connection()
+    try:
+        if args.drop:
+            for table in (FLAT, PARTITIONED, NUMBERS):
+                _execute(connection, f"DROP TABLE IF EXISTS {table}")
+        else:
+            report = run(connection, args.rows, args.users, args.years, args.sample_users, args.repeat, args.reuse)
+            if args.compare:
+                with open(args.compare) as f:
+                    report['compared_to'] = {'file': args.compare, 'changes': compare(report, json.load(f))}
+            text = json.dumps(report, indent=2)
+            if args.output:
+                with open(args.output, 'w') as f:
+                    f.write(text + "\n")
+            print(text)
+    finally:
+        connection.close()
@@ -0,0 +1,105 @@
+"""Check the read replicas the backend would route reads to.
+
+    python check_replicas.py
+    python check_replicas.py --probe --timeout 10
+
+Two local MySQL instances are enough: the primary from MYSQLHOST/MYSQLPORT
+and a replica of it, e.g.
+
+    docker network create bw
+    docker run -d --name bw-primary --network bw -p 3306:3306 -e MYSQL_ROOT_PASSWORD=pw mysql:8 \\
+        --server-id=1 --log-bin --gtid-mode=ON --enforce-gtid-consistency=ON
+    docker run -d --name bw-replica --network bw -p 3307:3306 -e MYSQL_ROOT_PASSWORD=pw mysql:8 \\
+        --server-id=2 --gtid-mode=ON --enforce-gtid-consistency=ON
+    # on the replica, before loading BudgetWise.sql into the primary:
+    #   CHANGE REPLICATION SOURCE TO SOURCE_HOST='bw-primary', SOURCE_PORT=3306,
+    #       SOURCE_USER='root', SOURCE_PASSWORD='pw', SOURCE_AUTO_POSITION=1, GET_SOURCE_PUBLIC_KEY=1;
+    #   START REPLICA;
+
+and MYSQL_REPLICA_HOSTS=127.0.0.1:3307. Every replica is reported with
+its health, lag and the last error; lag_unknown says why the lag could not
+be read (the MySQL user needs REPLICATION CLIENT on the replica, see
+REPLICA_LAG_UNKNOWN in database.py). --probe writes a row into the
+replication_probe table on the primary and times how long each replica
+takes to show it, which is roughly how long READ_YOUR_WRITES_SECONDS has to
+cover. Stopping the replica container (or STOP REPLICA on it) shows the
+failover: it is marked unhealthy and the reads fall back to the primary.
+"""
+import argparse
+import json
+import time
+import uuid
+
+from database import ReplicaRouter, open_connection
+
+PROBE_TABLE = 'replication_probe'
+
+
+def _write_probe(connection):
+    token = uuid.uuid4().hex
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {PROBE_TABLE} (id INT PRIMARY KEY, token CHAR(32) NOT NULL)")
+        cursor.execute(f"INSERT INTO {PROBE_TABLE} (id, token) VALUES (1, %s) "
+                       "ON DUPLICATE KEY UPDATE token = VALUES(token)", (token,))
+        connection.commit()
+    finally:
+        cursor.close()
+    return token
+
+
+def _wait_for_probe(host, port, token, timeout):
+    """Seconds until the replica at host:port has the probe row, or None"""
+    started = time.perf_counter()
+    connection = open_connection(host, port)
+    try:
+        connection.autocommit = True
+        cursor = connection.cursor()
+        try:
+            while time.perf_counter() - started < timeout:
+                try:
+                    cursor.execute(f"SELECT 1 FROM {PROBE_TABLE} WHERE id = 1 AND token = %s", (token,))
+                    if cursor.fetchall():
+                        return round(time.perf_counter() - started, 3)
+                except Exception:
+                    # The table itself may not have arrived yet
+                    pass
+                time.sleep(0.01)
+            return None
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+def run(probe=False, timeout=10):
+    router = ReplicaRouter(check_after=0)
+    try:
+        if not router.endpoints:
+            raise SystemExit("MYSQL_REPLICA_HOSTS is empty; every read goes to the primary")
+        # One checkout per replica runs its health and lag checks
+        for _ in router.endpoints:
+            connection = router.checkout()
+            if connection is not None:
+                connection.close()
+        report = router.stats()
+    finally:
+        router.dispose()
+
+    if probe:
+        primary = open_connection()
+        try:
+            token = _write_probe(primary)
+        finally:
+            primary.close()
+        report['probe_seconds'] = {f"{host}:{port}": _wait_for_probe(host, port, token, timeout)
+                                   for host, port in router.endpoints}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Health, lag and replication delay of the read replicas")
+    parser.add_argument("--probe", action="store_true", help="Time a write on the primary reaching each replica")
+    parser.add_argument("--timeout", type=float, default=10, help="Seconds to wait for the probe row")
+    args = parser.parse_args()
+    print(json.dumps(run(args.probe, args.timeout), indent=2, default=str))
@@ -0,0 +1,86 @@
+"""The dashboard summary behind /api/check-transactions, in one round trip.
+
+Every section of the summary is one branch of a single UNION ALL statement,
+tagged with the section it belongs to, so a page view costs one query
+however many sections there are. The whole history is read from the
+rollups (see rollups.py); a date-bounded summary aggregates the rows in the
+budget_data partitions in range. Sections are put in order here rather than
+in SQL, since each is at most a few thousand rows. The total is the sum of
+the category counts, not a query of its own.
+"""
+
+# Every branch returns the columns named in the first; a section leaves the
+# ones it does not use NULL
+ROLLUP_SUMMARY = """
+    (SELECT 'by_date' AS section, transaction_date AS day, NULL AS label, NULL AS category,
+            transaction_count, total_amount AS amount, NULL AS earliest_date, NULL AS latest_date, NULL AS id
+     FROM budget_daily_rollups WHERE user_id = %s)
+    UNION ALL
+    (SELECT 'category', NULL, NULL, expense_category, SUM(transaction_count), SUM(total_amount),
+            MIN(earliest_date), MAX(latest_date), NULL
+     FROM budget_monthly_rollups WHERE user_id = %s GROUP BY expense_category)
+    UNION ALL
+    (SELECT 'month', NULL, month, NULL, NULL, SUM(absolute_amount), NULL, NULL, NULL
+     FROM budget_monthly_rollups WHERE user_id = %s GROUP BY month)
+    UNION ALL
+    (SELECT 'recent', transaction_date, description, expense_category, NULL, amount, NULL, NULL, id
+     FROM budget_data WHERE user_id = %s ORDER BY transaction_date DESC, id DESC LIMIT 10)
+"""
+
+RANGE_SUMMARY = """
+    (SELECT 'by_date' AS section, transaction_date AS day, NULL AS label, NULL AS category,
+            COUNT(*) AS transaction_count, SUM(amount) AS amount, NULL AS earliest_date, NULL AS latest_date,
+            NULL AS id
+     FROM budget_data WHERE user_id = %s{date_filter} GROUP BY transaction_date)
+    UNION ALL
+    (SELECT 'category', NULL, NULL, expense_category, COUNT(*), SUM(amount),
+            MIN(transaction_date), MAX(transaction_date), NULL
+     FROM budget_data WHERE user_id = %s{date_filter} GROUP BY expense_category)
+    UNION ALL
+    (SELECT 'month', NULL, month, NULL, NULL, SUM(ABS(amount)), NULL, NULL, NULL
+     FROM budget_data WHERE user_id = %s{date_filter} GROUP BY month)
+    UNION ALL
+    (SELECT 'recent', transaction_date, description, expense_category, NULL, amount, NULL, NULL, id
+     FROM budget_data WHERE user_id = %s{date_filter} ORDER BY transaction_date DESC, id DESC LIMIT 10)
+"""
+
+
+def summary_query(user_id, date_filter='', date_params=()):
+    """The summary statement and its parameters (see app.date_range_filter for the filter)"""
+    params = [user_id, *date_params] * 4
+    if date_filter:
+        return RANGE_SUMMARY.format(date_filter=date_filter), params
+    return ROLLUP_SUMMARY, params
+
+
+def build_summary(rows):
+    """The /api/check-transactions payload from the rows of the summary statement"""
+    by_date, categories, months, recent = [], [], [], []
+    for section, day, label, category, count, amount, earliest, latest, row_id in rows:
+        if section == 'by_date':
+            by_date.append({'date': day, 'transactions_count': int(count), 'total_amount': amount})
+        elif section == 'category':
+            categories.append({'expense_category': category, 'count': int(count), 'total_amount': amount,
+                               'earliest_date': earliest, 'latest_date': latest})
+        elif section == 'month':
+            months.append({'month': label, 'total_amount': amount})
+        else:
+            recent.append({'transaction_date': day, 'description': label, 'amount': amount,
+                           'expense_category': category, 'transaction_id': row_id})
+    by_date.sort(key=lambda entry: entry['date'], reverse=True)
+    months.sort(key=lambda entry: entry['month'])
+    recent.sort(key=lambda entry: (entry['transaction_date'], entry['transaction_id']), reverse=True)
+    return {
+        'total_transactions': sum(entry['count'] for entry in categories),
+        'transactions_by_date': by_date,
+        'recent_transactions': recent,
+        'category_summary': categories,
+        'monthly_spending': months
+    }
+
+
+def fetch_summary(cursor, user_id, date_filter='', date_params=()):
+    """Run the summary statement on a plain (tuple) cursor and return the payload"""
+    query, params = summary_query(user_id, date_filter, date_params)
+    cursor.execute(query, params)
+    return build_summary(cursor.fetchall())
@@ -1,53 +1,581 @@
+import functools
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
 import os
+import tempfile
+import threading
+import time
+from flask import g, has_app_context
 from dotenv import load_dotenv
 import logging
 
 load_dotenv()
 
-class DatabaseConnection:
-    _instance = None
-    _connection = None
+# Rows per multi-row INSERT; a year of transactions fits in one or two
+BULK_INSERT_BATCH_SIZE = int(os.getenv('BULK_INSERT_BATCH_SIZE', '2000'))
+# Imports at least this large use LOAD DATA LOCAL INFILE (0 turns it off)
+BULK_LOAD_MIN_ROWS = int(os.getenv('BULK_LOAD_MIN_ROWS', '20000'))
+# LOCAL INFILE is only allowed from here; /dev/shm keeps the file in memory
+BULK_LOAD_DIR = os.getenv('BULK_LOAD_DIR') or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+# Errors meaning LOAD DATA LOCAL INFILE is turned off rather than failed:
+# disabled on the server (3948), the command not allowed (1148) and the
+# client refusing the file (2068)
+LOAD_DATA_REFUSED_ERRNOS = frozenset({1148, 2068, 3948})
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(DatabaseConnection, cls).__new__(cls)
-            cls._initialize_connection()
-        return cls._instance
 
-    @classmethod
-    def _initialize_connection(cls):
+class PooledConnection:
+    """A connection checked out of a ConnectionPool; close() hands it back"""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self._checked_out_at = time.perf_counter()
+
+    def __getattr__(self, name):
+        connection = self.__dict__.get('_connection')
+        if connection is None:
+            raise PoolError("Connection has already been returned to the pool")
+        return getattr(connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool._checkin(connection, time.perf_counter() - self._checked_out_at)
+
+    def discard(self):
+        """Close the connection instead of returning it, e.g. with a result left unread"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool._checkin(connection, time.perf_counter() - self._checked_out_at, reusable=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections.
+
+    Up to `size` connections are kept open between requests and up to
+    `max_overflow` more are opened under load, then closed when returned.
+    A caller that finds the pool exhausted waits up to `timeout` seconds.
+    Connections are health-checked on checkout, and only if they have sat
+    idle for `check_after` seconds. Returned connections have any open
+    transaction rolled back.
+    """
+
+    def __init__(self, size=None, max_overflow=None, timeout=None, check_after=None, connect=None):
+        self.size = size if size is not None else int(os.getenv('DB_POOL_SIZE', '5'))
+        self.max_overflow = max_overflow if max_overflow is not None else int(os.getenv('DB_POOL_MAX_OVERFLOW', '10'))
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', '30'))
+        self.check_after = check_after if check_after is not None else float(
+            os.getenv('DB_POOL_CHECK_AFTER', '5'))
+        self._connect = connect or open_connection
+        self._condition = threading.Condition()
+        # Most recently returned last, so the warmest connection is reused
+        self._idle = []
+        self._opened = 0
+        self._stats = {'checkouts': 0, 'waits': 0, 'wait_seconds': 0.0, 'timeouts': 0, 'connections_opened': 0,
+                       'health_checks': 0, 'discarded': 0, 'checkout_seconds': 0.0, 'max_checkout_seconds': 0.0}
+
+    def checkout(self):
+        """Return a PooledConnection, waiting for a free one if the pool is exhausted"""
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        waited = False
+        with self._condition:
+            while True:
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                    break
+                if self._opened < self.size + self.max_overflow:
+                    # Reserve the slot now, connect outside the lock
+                    self._opened += 1
+                    connection, returned_at = None, None
+                    break
+                waited = True
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolError(f"No database connection free after {self.timeout:g}s")
+                self._condition.wait(remaining)
+
+        if connection is not None and time.monotonic() - returned_at > self.check_after:
+            with self._condition:
+                self._stats['health_checks'] += 1
+            if not self._healthy(connection):
+                logging.warning("Discarding dead pooled database connection")
+                self._close(connection)
+                with self._condition:
+                    self._stats['discarded'] += 1
+                connection = None
+        if connection is None:
+            connection = self._open()
+
+        with self._condition:
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_seconds'] += time.perf_counter() - started
+        return PooledConnection(self, connection)
+
+    def _open(self):
         try:
-            cls._connection = mysql.connector.connect(
-                host=os.getenv("MYSQLHOST"),
-                user=os.getenv("MYSQLUSER"),
-                password=os.getenv("MYSQLPASSWORD"),
-                database=os.getenv("MYSQLDATABASE"),
-                port=os.getenv("MYSQLPORT"),
-                pool_size=5,
-                pool_name="budgetwise_pool",
-                pool_reset_session=True
-            )
-            logging.info("Database connection pool created")
-        except Error as e:
+            connection = self._connect()
+        except Exception as e:
             logging.error(f"Database connection failed: {e}")
+            with self._condition:
+                self._opened -= 1
+                self._condition.notify()
             raise
+        with self._condition:
+            self._stats['connections_opened'] += 1
+        return connection
+
+    @staticmethod
+    def _healthy(connection):
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _checkin(self, connection, held_seconds, reusable=True):
+        # Leave no transaction open for the next user
+        try:
+            if reusable and connection.in_transaction:
+                connection.rollback()
+        except Exception:
+            reusable = False
+
+        with self._condition:
+            self._stats['checkout_seconds'] += held_seconds
+            self._stats['max_checkout_seconds'] = max(self._stats['max_checkout_seconds'], held_seconds)
+            keep = reusable and self._opened <= self.size
+            if keep:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._opened -= 1
+                if not reusable:
+                    self._stats['discarded'] += 1
+            self._condition.notify()
+        if not keep:
+            self._close(connection)
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._opened,
+                'idle': len(self._idle),
+                'in_use': self._opened - len(self._idle)
+            })
+        checkouts = stats['checkouts']
+        stats['avg_checkout_seconds'] = round(stats['checkout_seconds'] / checkouts, 4) if checkouts else 0.0
+        for name in ('wait_seconds', 'checkout_seconds', 'max_checkout_seconds'):
+            stats[name] = round(stats[name], 4)
+        return stats
+
+    def dispose(self):
+        """Close every idle connection; checked-out ones close when returned"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for connection, _ in idle:
+            self._close(connection)
+        if idle:
+            logging.info(f"Closed {len(idle)} pooled database connections")
+
+
+def parse_endpoints(value):
+    """[(host, port)] from "host[:port],..."; a missing port is MYSQLPORT's"""
+    endpoints = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if item:
+            host, _, port = item.partition(':')
+            endpoints.append((host, port or os.getenv("MYSQLPORT")))
+    return endpoints
+
+
+# The account lacks REPLICATION CLIENT, so SHOW REPLICA STATUS is refused
+ACCESS_DENIED_ERRNOS = frozenset({1227})
+# What a replica whose lag cannot be read is used for
+LAG_UNKNOWN_POLICIES = ('use', 'skip')
+
+
+class ReplicaStatusUnavailable(Exception):
+    """A replica's lag cannot be read: no privilege, or the server is not a replica"""
+
+
+def replica_lag(connection):
+    """Seconds a replica is behind its source, or None if replication is stopped.
+
+    Raises ReplicaStatusUnavailable when the status cannot be read at all,
+    which says nothing about how far behind the server is.
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        for statement in ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS"):
+            try:
+                cursor.execute(statement)
+                break
+            except Error as e:
+                if e.errno in ACCESS_DENIED_ERRNOS:
+                    raise ReplicaStatusUnavailable(f"No privilege to read the replica status: {e}")
+                # SHOW SLAVE STATUS is for MySQL before 8.0.22
+                if statement == "SHOW SLAVE STATUS":
+                    raise
+        channels = cursor.fetchall()
+    finally:
+        cursor.close()
+    if not channels:
+        raise ReplicaStatusUnavailable("The server has no replication channels")
+    lags = [channel.get('Seconds_Behind_Source', channel.get('Seconds_Behind_Master')) for channel in channels]
+    if None in lags:
+        return None
+    return max(int(lag) for lag in lags)
+
+
+class ReplicaRouter:
+    """Hands out connections to read replicas, each with its own ConnectionPool.
+
+    Replicas take turns. One is left out for `retry_after` seconds when a
+    connection to it fails, or when the lag check (at most every
+    `check_after` seconds) finds it more than `max_lag` seconds behind or
+    not replicating; max_lag=0 turns the check off. A replica whose lag
+    cannot be read (the account lacks REPLICATION CLIENT, or the server is
+    not a replica) is still used when `lag_unknown` is "use", the default,
+    and left out when it is "skip"; either way this is logged once.
+    checkout() returns None when no replica is usable and the caller reads
+    the primary instead. A replica pool with no free connection waits only
+    `pool_timeout` seconds (none by default) before that happens.
+    """
+
+    def __init__(self, endpoints=None, retry_after=None, max_lag=None, check_after=None, pool_size=None,
+                 connect=None, lag_unknown=None, pool_timeout=None):
+        self.endpoints = endpoints if endpoints is not None else parse_endpoints(os.getenv('MYSQL_REPLICA_HOSTS'))
+        self.retry_after = retry_after if retry_after is not None else float(os.getenv('REPLICA_RETRY_AFTER', '30'))
+        self.max_lag = max_lag if max_lag is not None else float(os.getenv('REPLICA_MAX_LAG', '30'))
+        self.check_after = check_after if check_after is not None else float(os.getenv('REPLICA_CHECK_AFTER', '5'))
+        self.lag_unknown = lag_unknown or os.getenv('REPLICA_LAG_UNKNOWN', 'use')
+        # The primary is always there to fall back on, so waiting for a busy replica buys nothing
+        self.pool_timeout = pool_timeout if pool_timeout is not None else float(
+            os.getenv('REPLICA_POOL_TIMEOUT', '0'))
+        if self.lag_unknown not in LAG_UNKNOWN_POLICIES:
+            raise ValueError(f"REPLICA_LAG_UNKNOWN must be one of: {', '.join(LAG_UNKNOWN_POLICIES)}")
+        connect = connect or open_connection
+        self._replicas = [{
+            'name': f"{endpoint[0]}:{endpoint[1]}",
+            'pool': ConnectionPool(size=pool_size, timeout=self.pool_timeout,
+                                   connect=functools.partial(connect, *endpoint)),
+            'down_until': 0.0,
+            'checked_at': None,
+            'lag': None,
+            'lag_unknown': None,
+            'error': None
+        } for endpoint in self.endpoints]
+        self._lock = threading.Lock()
+        self._next = 0
+        self._stats = {'replica_reads': 0, 'primary_fallbacks': 0, 'failovers': 0}
+
+    def checkout(self):
+        """A PooledConnection to a healthy replica, or None"""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % max(1, len(self._replicas))
+        for replica in self._replicas[start:] + self._replicas[:start]:
+            if replica['down_until'] > time.monotonic():
+                continue
+            try:
+                connection = replica['pool'].checkout()
+            except PoolError:
+                # Busy rather than broken; another replica or the primary will do
+                continue
+            except Exception as e:
+                self._mark_down(replica, f"Connection failed: {e}")
+                continue
+            if self._lagging(replica, connection):
+                continue
+            with self._lock:
+                self._stats['replica_reads'] += 1
+            return connection
+        if self._replicas:
+            with self._lock:
+                self._stats['primary_fallbacks'] += 1
+        return None
+
+    def _lagging(self, replica, connection):
+        checked_at = replica['checked_at']
+        if not self.max_lag or (checked_at is not None and time.monotonic() - checked_at < self.check_after):
+            return False
+        try:
+            lag = replica_lag(connection)
+        except ReplicaStatusUnavailable as e:
+            return self._lag_unknown(replica, connection, str(e))
+        except Exception as e:
+            connection.discard()
+            self._mark_down(replica, f"Lag check failed: {e}")
+            return True
+        with self._lock:
+            replica['checked_at'] = time.monotonic()
+            replica['lag'] = lag
+            replica['lag_unknown'] = None
+        if lag is None or lag > self.max_lag:
+            connection.close()
+            self._mark_down(replica, "Not replicating" if lag is None else f"{lag}s behind the primary")
+            return True
+        return False
+
+    def _lag_unknown(self, replica, connection, reason):
+        # Not the same as lagging: nothing is known, so the policy decides
+        with self._lock:
+            first = replica['lag_unknown'] is None
+            replica['checked_at'] = time.monotonic()
+            replica['lag'] = None
+            replica['lag_unknown'] = reason
+        if first:
+            action = "reads use it anyway" if self.lag_unknown == 'use' else "reads skip it"
+            logging.warning(f"Read replica {replica['name']}: lag unknown ({reason}); "
+                            f"{action} (REPLICA_LAG_UNKNOWN={self.lag_unknown})")
+        if self.lag_unknown == 'use':
+            return False
+        connection.close()
+        self._mark_down(replica, reason, log=False)
+        return True
+
+    def _mark_down(self, replica, error, log=True):
+        if log:
+            logging.warning(f"Read replica {replica['name']} out of rotation for {self.retry_after:g}s: {error}")
+        with self._lock:
+            replica['down_until'] = time.monotonic() + self.retry_after
+            # Checked again as soon as it is back
+            replica['checked_at'] = None
+            replica['error'] = error
+            self._stats['failovers'] += 1
 
-    @classmethod
-    def get_connection(cls):
-        if not cls._connection.is_connected():
-            cls._connection.reconnect(attempts=3, delay=5)
-        return cls._connection
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        now = time.monotonic()
+        stats['replicas'] = [{
+            'endpoint': replica['name'],
+            'healthy': replica['down_until'] <= now,
+            'lag_seconds': replica['lag'],
+            'lag_unknown': replica['lag_unknown'],
+            'last_error': replica['error'],
+            'pool': replica['pool'].stats()
+        } for replica in self._replicas]
+        return stats
+
+    def dispose(self):
+        for replica in self._replicas:
+            replica['pool'].dispose()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_router = None
+# Set by init_app: whether a user wrote recently enough that their reads
+# must go to the primary
+_wrote_recently = None
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def get_router():
+    global _router
+    with _pool_lock:
+        if _router is None:
+            _router = ReplicaRouter()
+        return _router
+
+
+def checkout_db():
+    """Check a connection out of the pool; the caller closes it to return it"""
+    return get_pool().checkout()
 
-    @classmethod
-    def close_connection(cls):
-        if cls._connection.is_connected():
-            cls._connection.close()
-            logging.info("Database connection closed")
 
 def get_db():
-    return DatabaseConnection().get_connection()
+    """The connection for the current request.
+
+    Inside a Flask app context the first call checks a connection out and
+    later calls reuse it; it goes back to the pool when the context ends
+    (see init_app). Outside one this is checkout_db() and the caller closes
+    the connection.
+    """
+    if not has_app_context():
+        return checkout_db()
+    if 'db' not in g:
+        g.db = checkout_db()
+    return g.db
+
+
+def _reads_primary(user_id):
+    return (user_id is not None and _wrote_recently is not None and bool(get_router().endpoints)
+            and _wrote_recently(user_id))
+
+
+def checkout_read_db(user_id=None):
+    """Like checkout_db(), for reads of `user_id`'s data a replica may serve.
+
+    The primary's connection if the user wrote recently (see init_app) or
+    no replica is healthy.
+    """
+    if not _reads_primary(user_id):
+        connection = get_router().checkout()
+        if connection is not None:
+            return connection
+    return checkout_db()
+
+
+def get_read_db(user_id=None):
+    """Like get_db(), for reads of `user_id`'s data a replica may serve.
+
+    Replication is asynchronous, so a user who wrote recently reads from
+    the primary (get_db()) to see their own writes.
+    """
+    if not has_app_context():
+        return checkout_read_db(user_id)
+    if _reads_primary(user_id):
+        return get_db()
+    if 'read_db' not in g:
+        connection = get_router().checkout()
+        g.read_db = connection if connection is not None else get_db()
+    return g.read_db
+
+
+def release_db(exception=None):
+    for name in ('read_db', 'db'):
+        db = g.pop(name, None)
+        if db is not None:
+            db.close()
+
+
+def init_app(app, wrote_recently=None):
+    """Return each request's connections to their pools when its context ends.
+
+    `wrote_recently(user_id)` tells get_read_db() which users must read
+    their own writes from the primary.
+    """
+    global _wrote_recently
+    _wrote_recently = wrote_recently
+    app.teardown_appcontext(release_db)
+
+
+def open_connection(host=None, port=None, local_infile=False):
+    """Open a dedicated connection for background work; the caller closes it.
+
+    `host` and `port` point it at another server with the same database
+    and credentials, such as a read replica. Only connections opened with
+    `local_infile` may send files from BULK_LOAD_DIR with LOAD DATA LOCAL
+    INFILE; pooled and read connections never can.
+    """
+    options = {'allow_local_infile_in_path': BULK_LOAD_DIR} if local_infile else {}
+    return mysql.connector.connect(
+        host=host or os.getenv("MYSQLHOST"),
+        user=os.getenv("MYSQLUSER"),
+        password=os.getenv("MYSQLPASSWORD"),
+        database=os.getenv("MYSQLDATABASE"),
+        port=port or os.getenv("MYSQLPORT"),
+        **options
+    )
+
+
+def open_ingest_connection():
+    """Open a connection for bulk imports, the only kind allowed LOAD DATA LOCAL INFILE"""
+    return open_connection(local_infile=True)
+
+
+# Set once the server refuses LOAD DATA LOCAL INFILE (local_infile=OFF)
+_load_data_refused = False
+
+
+def bulk_insert(cursor, table, columns, rows, on_duplicate=None, batch_size=None, load_min_rows=None):
+    """Insert many rows in as few round trips as possible; returns the rows inserted.
+
+    Rows go out as multi-row INSERT statements of `batch_size` rows, or
+    through a single LOAD DATA LOCAL INFILE once there are `load_min_rows`
+    of them. `on_duplicate` is the ON DUPLICATE KEY UPDATE clause; with it,
+    LOAD DATA skips rows that hit a unique key (IGNORE). Nothing is
+    committed, so the rows land atomically with the caller's transaction.
+    """
+    global _load_data_refused
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+        return 0
+    batch_size = batch_size or BULK_INSERT_BATCH_SIZE
+    load_min_rows = BULK_LOAD_MIN_ROWS if load_min_rows is None else load_min_rows
+
+    if load_min_rows and len(rows) >= load_min_rows and not _load_data_refused:
+        try:
+            return _load_data(cursor, table, columns, rows, ignore=on_duplicate is not None)
+        except Error as e:
+            # Only a refused LOAD DATA is safe to retry as INSERTs: anything
+            # else (a deadlock, a lock wait timeout) may have rolled back the
+            # caller's transaction, and carrying on would commit part of it
+            if e.errno not in LOAD_DATA_REFUSED_ERRNOS:
+                raise
+            logging.warning(f"LOAD DATA LOCAL INFILE unavailable, using INSERT: {str(e)}")
+            _load_data_refused = True
+
+    row_placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ', '.join([row_placeholders] * len(batch))
+        if on_duplicate:
+            query += f" ON DUPLICATE KEY UPDATE {on_duplicate}"
+        cursor.execute(query, [value for row in batch for value in row])
+        inserted += cursor.rowcount
+    return inserted
+
+
+def _load_value(value):
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def _load_data(cursor, table, columns, rows, ignore=False):
+    # The connector reads LOCAL INFILE from a path, so the rows are written
+    # to a file in BULK_LOAD_DIR (memory-backed by default) for the statement
+    fd, path = tempfile.mkstemp(dir=BULK_LOAD_DIR, suffix='.tsv')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            for row in rows:
+                f.write('\t'.join(_load_value(value) for value in row))
+                f.write('\n')
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s {'IGNORE ' if ignore else ''}INTO TABLE {table} "
+            "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({', '.join(columns)})",
+            (path,)
+        )
+        return cursor.rowcount
+    finally:
+        os.remove(path)
+
 
 def close_db_connection():
-    DatabaseConnection.close_connection()
\ No newline at end of file
+    if _pool is not None:
+        _pool.dispose()
+    if _router is not None:
+        _router.dispose()
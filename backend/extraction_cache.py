@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Next to this file, whatever directory the app was started from
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extraction_cache.sqlite3')
+
+
+class ExtractionCache:
+    """Persistent cache of raw LLM extraction results keyed by chunk content.
+
+    Entries live in a local SQLite file so they survive restarts and are
+    shared by every worker process on the host. The key covers the chunk
+    text, the extraction schema and the model name, so changing either of
+    the latter two naturally invalidates old entries, and the LLM transport
+    mode, so answers from recordings or the synthetic stand-in never serve a
+    live upload. `clock` returns the current time in seconds (time.time by
+    default).
+    """
+
+    def __init__(self, path=None, max_entries=None, max_age_seconds=None, clock=None):
+        self.path = path or os.getenv('EXTRACTION_CACHE_PATH') or DEFAULT_CACHE_PATH
+        self.clock = clock or time.time
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', '10000'))
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else int(
+            os.getenv('EXTRACTION_CACHE_MAX_AGE_DAYS', '90')) * 86400
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                cache_key TEXT PRIMARY KEY,
+                items TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache (last_used_at)")
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(text, schema, model_name, mode='live'):
+        """Hash the chunk text together with the schema, model name and transport mode"""
+        digest = hashlib.sha256()
+        # Live keys are unchanged from before the mode was part of them
+        if mode != 'live':
+            digest.update(mode.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(json.dumps(schema, sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached items for a key, or None on a miss"""
+        now = self.clock()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT items, created_at FROM extraction_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE extraction_cache SET last_used_at = ? WHERE cache_key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, items):
+        """Store the raw extracted items for a key and evict stale entries"""
+        now = self.clock()
+        with self._lock:
+            self._connection.execute(
+                """INSERT OR REPLACE INTO extraction_cache (cache_key, items, created_at, last_used_at)
+                VALUES (?, ?, ?, ?)""",
+                (key, json.dumps(items), now, now)
+            )
+            self._evict(now)
+            self._connection.commit()
+
+    def _evict(self, now):
+        # Age-based first, then trim the least recently used beyond the size cap
+        self._connection.execute(
+            "DELETE FROM extraction_cache WHERE created_at < ?", (now - self.max_age_seconds,))
+        self._connection.execute(
+            """DELETE FROM extraction_cache WHERE cache_key IN (
+                SELECT cache_key FROM extraction_cache
+                ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM extraction_cache")
+            self._connection.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries
+        }
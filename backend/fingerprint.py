@@ -0,0 +1,168 @@
+"""Transaction fingerprints used to keep duplicate rows out of budget_data.
+
+A fingerprint hashes the user, date, normalized description and amount of a
+transaction plus its occurrence number: the nth identical row in the same
+statement gets occurrence n. Two genuine coffees on the same day therefore
+get different fingerprints, while re-uploading a statement (or uploading two
+statements that overlap) reproduces fingerprints that already exist and the
+unique index on budget_data.fingerprint turns those inserts into no-ops.
+
+Rows saved before the column existed are fingerprinted by migration 003
+(`python migrate.py up`).
+"""
+import hashlib
+import time
+from collections import Counter
+from datetime import date
+from dotenv import load_dotenv
+
+from merchant_index import normalize_merchant
+from statement_parser import row_descriptions
+
+load_dotenv()
+
+
+def merchant_key(description):
+    """Normalized description used for duplicate detection"""
+    description = description or ''
+    return normalize_merchant(description) or description.strip().upper()
+
+
+def transaction_key(transaction):
+    """Identity of a transaction: date, normalized description and amount"""
+    return (str(transaction['transaction_date']),
+            merchant_key(transaction['description']),
+            f"{round(float(transaction['amount']), 2):.2f}")
+
+
+def transaction_fingerprint(user_id, transaction, occurrence=1):
+    """Hex digest stored in budget_data.fingerprint"""
+    date, merchant, amount = transaction_key(transaction)
+    value = f"{int(user_id)}|{date}|{merchant}|{amount}|{occurrence}"
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def fingerprint_statement(user_id, transactions):
+    """Yield (fingerprint, transaction) for each transaction of one statement"""
+    occurrences = Counter()
+    for transaction in transactions:
+        key = transaction_key(transaction)
+        occurrences[key] += 1
+        yield transaction_fingerprint(user_id, transaction, occurrences[key]), transaction
+
+
+class TransactionDedupSet:
+    """In-memory set of the fingerprints accepted so far in an ingest"""
+
+    def __init__(self):
+        self._seen = set()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self._seen
+
+    def add(self, fingerprint):
+        """Remember a fingerprint; returns False if it was already there"""
+        if fingerprint in self._seen:
+            return False
+        self._seen.add(fingerprint)
+        return True
+
+
+def drop_overlap_duplicates(transactions, previous, overlap_text, ignore_words=()):
+    """Drop rows that the previous chunk already returned from the shared overlap.
+
+    Consecutive chunks of a page share `overlap_text`, so a row printed there
+    is extracted twice. A row is dropped only when the previous chunk
+    returned the same transaction and its merchant appears in the overlap,
+    and never more often than either count, so genuine repeats survive.
+    """
+    if not transactions or not previous or not overlap_text:
+        return transactions
+
+    in_overlap = Counter(merchant_key(description) for description in row_descriptions(overlap_text, ignore_words))
+    if not in_overlap:
+        return transactions
+    in_previous = Counter(transaction_key(transaction) for transaction in previous)
+
+    kept = []
+    for transaction in transactions:
+        key = transaction_key(transaction)
+        merchant = key[1]
+        if in_previous[key] > 0 and in_overlap[merchant] > 0:
+            in_previous[key] -= 1
+            in_overlap[merchant] -= 1
+            continue
+        kept.append(transaction)
+    return kept
+
+
+def backfill_fingerprints(connection, batch_size=1000, progress=None, pause=None):
+    """Fingerprint rows saved before the fingerprint column existed.
+
+    Identical legacy rows are numbered per user in id order, so existing
+    duplicates keep distinct fingerprints. A legacy row whose fingerprint
+    was already taken by a newer upload is a duplicate of it and stays
+    NULL. The table is walked in (user_id, transaction_date, id) order along
+    idx_budget_data_user_date, `batch_size` rows at a time, and each batch is
+    written back with one UPDATE, then committed, with an optional `pause`
+    (seconds) after it so the table stays available and replicas keep up.
+    `progress(done, total)` is called per batch. Returns the number of rows
+    updated.
+    """
+    cursor = connection.cursor()
+    updated = 0
+    done = 0
+    try:
+        cursor.execute("SELECT COUNT(*) FROM budget_data WHERE fingerprint IS NULL")
+        (total,) = cursor.fetchone()
+
+        # Identical rows share a user and a date, so each (user, date) is
+        # walked in one piece and only its own occurrences are kept
+        occurrences = Counter()
+        last = (0, date.min, 0)
+        while True:
+            cursor.execute("""
+                SELECT id, user_id, transaction_date, description, amount FROM budget_data
+                WHERE (user_id, transaction_date, id) > (%s, %s, %s) AND fingerprint IS NULL
+                ORDER BY user_id, transaction_date, id LIMIT %s
+            """, (*last, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            batch = []
+            for row_id, user_id, transaction_date, description, amount in rows:
+                if (user_id, transaction_date) != last[:2]:
+                    occurrences.clear()
+                transaction = {'transaction_date': transaction_date, 'description': description, 'amount': amount}
+                key = transaction_key(transaction)
+                occurrences[key] += 1
+                batch.append((row_id, transaction_fingerprint(user_id, transaction, occurrences[key])))
+                last = (user_id, transaction_date, row_id)
+            updated += _update_fingerprints(connection, batch)
+            done += len(rows)
+            if progress:
+                progress(done, total)
+            if pause:
+                time.sleep(pause)
+    finally:
+        cursor.close()
+    return updated
+
+
+def _update_fingerprints(connection, batch):
+    # IGNORE leaves a row whose fingerprint is taken as NULL and updates the rest
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"UPDATE IGNORE budget_data SET fingerprint = CASE id {' '.join(['WHEN %s THEN %s'] * len(batch))} END "
+            f"WHERE id IN ({', '.join(['%s'] * len(batch))})",
+            [value for pair in batch for value in pair] + [row_id for row_id, _ in batch]
+        )
+        connection.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
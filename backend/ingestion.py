@@ -0,0 +1,310 @@
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from mysql.connector import Error
+
+from database import BULK_INSERT_BATCH_SIZE, bulk_insert, open_ingest_connection
+from fingerprint import TransactionDedupSet, fingerprint_statement
+from ingestion_metrics import IngestionMetrics
+from rollups import apply_inserted, lock_user
+
+load_dotenv()
+
+TRANSACTION_COLUMNS = ('user_id', 'expense_category', 'amount', 'transaction_date', 'description', 'fingerprint')
+# Rows whose fingerprint already exists are skipped by the unique index;
+# "id = id" changes nothing, so they count as 0 affected rows
+SKIP_DUPLICATES = "id = id"
+
+
+class IngestionError(Exception):
+    """Raised when a statement produced nothing that could be saved"""
+
+
+class StatementIngestor:
+    """Extracts transactions from an uploaded statement and saves them for a user.
+
+    Every row carries a fingerprint (see fingerprint.py). Duplicates inside an
+    upload are dropped in memory and rows that are already in budget_data are
+    skipped by the insert, so re-uploading a statement adds nothing. The
+    dashboard rollups (see rollups.py) are updated in the same transaction.
+    """
+
+    def __init__(self, pdf_processor, merchant_index=None, connection_factory=None, batch_size=None,
+                 batch_workers=None):
+        self.pdf_processor = pdf_processor
+        self.merchant_index = merchant_index
+        self.connection_factory = connection_factory or open_ingest_connection
+        self.batch_size = batch_size or int(os.getenv('UPLOAD_INSERT_BATCH_SIZE', str(BULK_INSERT_BATCH_SIZE)))
+        self.batch_workers = batch_workers or int(os.getenv('BATCH_UPLOAD_WORKERS', '3'))
+
+    def ingest(self, user_id, file_path):
+        """Stream the statement into budget_data.
+
+        Returns the number of rows saved and a result for the file, with the
+        statement's stage metrics.
+        """
+        metrics = IngestionMetrics(os.path.basename(file_path))
+        started = time.perf_counter()
+        db = self.connection_factory()
+        cursor = db.cursor()
+
+        try:
+            # Insert in batches while later pages are still being extracted;
+            # everything is committed together once the stream finishes
+            transactions = self.pdf_processor.iter_transactions(file_path, metrics=metrics)
+            extracted, saved, categorized = self._insert_statement(
+                cursor, user_id, transactions, TransactionDedupSet(), metrics)
+
+            if not extracted:
+                db.rollback()
+                raise IngestionError('Could not extract data from PDF')
+
+            with metrics.stage('db_insert'):
+                db.commit()
+
+        except Error as e:
+            db.rollback()
+            logging.error(f"Database error: {str(e)}")
+            raise IngestionError('Failed to save transactions')
+
+        except IngestionError:
+            raise
+
+        except Exception as e:
+            db.rollback()
+            logging.error(f"PDF extraction error: {str(e)}")
+            raise IngestionError('Could not extract data from PDF')
+
+        finally:
+            cursor.close()
+            db.close()
+
+        # Saved transactions teach the merchant index for next time
+        if self.merchant_index:
+            self.merchant_index.record(categorized)
+
+        metrics.increment('duplicates_skipped', extracted - saved)
+        metrics.add_time('total', time.perf_counter() - started)
+        return {
+            'transactions_count': saved,
+            'results': [{
+                'file': os.path.basename(file_path),
+                'transactions_count': saved,
+                'duplicates_skipped': extracted - saved,
+                'error': None,
+                'metrics': metrics.to_dict()
+            }]
+        }
+
+    def ingest_many(self, user_id, file_paths):
+        """Ingest several statements as one batch.
+
+        Statements are extracted in parallel, transactions an earlier
+        statement in the batch (or an earlier upload) already holds are
+        skipped, and every new row is written in a single commit. The whole
+        batch costs one lookup of existing fingerprints and one bulk insert
+        per BULK_INSERT_BATCH_SIZE rows, plus the user lock and two rollup
+        updates. Returns the number of rows saved and a result per file.
+        """
+        with ThreadPoolExecutor(max_workers=self.batch_workers) as executor:
+            extracted = list(executor.map(self._extract_statement, file_paths))
+
+        if all(error for _, error, _ in extracted):
+            raise IngestionError('Could not extract data from any PDF')
+
+        # Overlapping statements (a monthly and a year-to-date export)
+        # reproduce the same fingerprints and share one dedup set
+        seen = TransactionDedupSet()
+        results = []
+        categorized = []
+        db = self.connection_factory()
+        cursor = db.cursor()
+        try:
+            statements = []
+            for transactions, error, metrics in extracted:
+                count, rows, learned = self._statement_rows(user_id, transactions or [], seen)
+                categorized.extend(learned)
+                statements.append((count, rows))
+
+            started = time.perf_counter()
+            lock_user(cursor, user_id)
+            existing = self._existing_fingerprints(cursor, [row for _, rows in statements for row in rows])
+            new_rows = [row for _, rows in statements for row in rows if row[-1] not in existing]
+            inserted = self._bulk_insert(cursor, new_rows)
+            db.commit()
+            insert_seconds = time.perf_counter() - started
+            if inserted != len(new_rows):
+                # Another upload saved some of the same rows in the meantime
+                logging.info(f"Batch insert saved {inserted} of {len(new_rows)} new rows")
+
+            total_rows = len(new_rows) or 1
+            for file_path, (count, rows), (_, error, metrics) in zip(file_paths, statements, extracted):
+                saved = sum(1 for row in rows if row[-1] not in existing)
+                metrics.increment('duplicates_skipped', count - saved)
+                # The batch is written in one go; each file is charged its share
+                metrics.add_time('db_insert', insert_seconds * saved / total_rows)
+                results.append({
+                    'file': os.path.basename(file_path),
+                    'transactions_count': saved,
+                    'duplicates_skipped': count - saved,
+                    'error': error,
+                    'metrics': metrics
+                })
+
+        except Error as e:
+            db.rollback()
+            logging.error(f"Database error: {str(e)}")
+            raise IngestionError('Failed to save transactions')
+
+        finally:
+            cursor.close()
+            db.close()
+
+        if self.merchant_index:
+            self.merchant_index.record(categorized)
+
+        for result in results:
+            result['metrics'] = result['metrics'].to_dict()
+        return {'transactions_count': sum(result['transactions_count'] for result in results),
+                'results': results}
+
+    def _insert_statement(self, cursor, user_id, transactions, seen, metrics=None):
+        """Insert one statement's new rows while it is still being extracted.
+
+        Every `batch_size` new rows go out as one multi-row INSERT. The user
+        is locked only once extraction is over, to add the inserted rows to
+        the rollups just before the commit. Returns (rows extracted, rows
+        saved, categorized rows for the merchant index).
+        """
+        metrics = metrics or IngestionMetrics()
+        extracted = 0
+        batch = []
+        # (rows, rows inserted) per INSERT, for the rollups
+        batches = []
+        categorized = []
+        for fingerprint, transaction in fingerprint_statement(user_id, transactions):
+            extracted += 1
+            categorized.append({'description': transaction['description'],
+                                'expense_category': transaction['expense_category'],
+                                'category_source': transaction.get('category_source')})
+            if not seen.add(fingerprint):
+                continue
+            batch.append(_transaction_row(user_id, fingerprint, transaction))
+            if len(batch) >= self.batch_size:
+                with metrics.stage('db_insert'):
+                    batches.append((batch, self._insert_rows(cursor, batch)))
+                batch = []
+        if batch:
+            with metrics.stage('db_insert'):
+                batches.append((batch, self._insert_rows(cursor, batch)))
+
+        saved = sum(inserted for _, inserted in batches)
+        if saved:
+            # Held from here to the commit, not while the LLM extracts
+            with metrics.stage('db_insert'):
+                lock_user(cursor, user_id)
+                self._apply_rollups(cursor, batches)
+        return extracted, saved, categorized
+
+    def _statement_rows(self, user_id, transactions, seen):
+        """Rows of a statement not yet seen in this upload.
+
+        Returns (rows extracted, new rows, categorized rows for the merchant index).
+        """
+        extracted = 0
+        rows = []
+        categorized = []
+        for fingerprint, transaction in fingerprint_statement(user_id, transactions):
+            extracted += 1
+            categorized.append({'description': transaction['description'],
+                                'expense_category': transaction['expense_category'],
+                                'category_source': transaction.get('category_source')})
+            if seen.add(fingerprint):
+                rows.append(_transaction_row(user_id, fingerprint, transaction))
+        return extracted, rows, categorized
+
+    def _bulk_insert(self, cursor, rows):
+        """Insert rows and add them to the rollups; returns the rows inserted"""
+        inserted = self._insert_rows(cursor, rows)
+        apply_inserted(cursor, TRANSACTION_COLUMNS, rows, inserted)
+        return inserted
+
+    @staticmethod
+    def _insert_rows(cursor, rows):
+        return bulk_insert(cursor, 'budget_data', TRANSACTION_COLUMNS, rows, on_duplicate=SKIP_DUPLICATES)
+
+    @staticmethod
+    def _apply_rollups(cursor, batches):
+        """Add (rows, rows inserted) batches to the rollups; the user must be locked"""
+        # Fully inserted batches add up in one upsert per rollup table
+        whole = [row for rows, inserted in batches if inserted == len(rows) for row in rows]
+        apply_inserted(cursor, TRANSACTION_COLUMNS, whole, len(whole))
+        for rows, inserted in batches:
+            if 0 < inserted < len(rows):
+                apply_inserted(cursor, TRANSACTION_COLUMNS, rows, inserted)
+
+    @staticmethod
+    def _existing_fingerprints(cursor, rows):
+        """Fingerprints of `rows` that budget_data already holds"""
+        existing = set()
+        # Sorted by date, each lookup is bounded to a few budget_data partitions
+        date = TRANSACTION_COLUMNS.index('transaction_date')
+        rows = sorted(rows, key=lambda row: str(row[date]))
+        for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+            chunk = rows[start:start + BULK_INSERT_BATCH_SIZE]
+            cursor.execute(
+                f"SELECT fingerprint FROM budget_data WHERE fingerprint IN ({', '.join(['%s'] * len(chunk))}) "
+                "AND transaction_date BETWEEN %s AND %s",
+                [row[-1] for row in chunk] + [chunk[0][date], chunk[-1][date]]
+            )
+            existing.update(fingerprint for fingerprint, in cursor.fetchall())
+        return existing
+
+    def _extract_statement(self, file_path):
+        # One bad statement must not sink the rest of the batch
+        metrics = IngestionMetrics(os.path.basename(file_path))
+        started = time.perf_counter()
+        try:
+            transactions = list(self.pdf_processor.iter_transactions(file_path, metrics=metrics))
+            if not transactions:
+                return None, 'Could not extract data from PDF', metrics
+            return transactions, None, metrics
+        except Exception as e:
+            logging.error(f"PDF extraction error for {file_path}: {str(e)}")
+            metrics.increment('statement_errors')
+            return None, 'Could not extract data from PDF', metrics
+        finally:
+            metrics.add_time('total', time.perf_counter() - started)
+
+    def run_job(self, job):
+        """Job handler for UploadWorkerPool.
+
+        A job's file_path is either a single statement or a batch directory
+        holding several statements. The files stay in place: a retry of the
+        job needs them until discard_upload runs.
+        """
+        file_path = job['file_path']
+        if os.path.isdir(file_path):
+            file_paths = sorted(os.path.join(file_path, name) for name in os.listdir(file_path)
+                                if name.lower().endswith('.pdf'))
+            return self.ingest_many(job['user_id'], file_paths)
+        return self.ingest(job['user_id'], file_path)
+
+    def discard_upload(self, job):
+        """UploadWorkerPool cleanup: remove a finished job's uploaded files"""
+        file_path = job['file_path']
+        if os.path.isdir(file_path):
+            shutil.rmtree(file_path, ignore_errors=True)
+        else:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+
+def _transaction_row(user_id, fingerprint, transaction):
+    return (user_id, transaction['expense_category'], transaction['amount'],
+            transaction['transaction_date'], transaction['description'], fingerprint)
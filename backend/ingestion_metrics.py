@@ -0,0 +1,132 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class MetricsRegistry:
+    """Process-wide counters and timing summaries, shared by every upload.
+
+    Counters only go up; timings keep a count, total and max per name so
+    averages and outliers (a slow or retried LLM call) are both visible.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timing = self._timings.setdefault(name, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            timing['count'] += 1
+            timing['total_seconds'] += seconds
+            timing['max_seconds'] = max(timing['max_seconds'], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            timings = {}
+            for name, timing in self._timings.items():
+                timings[name] = {
+                    'count': timing['count'],
+                    'total_seconds': round(timing['total_seconds'], 4),
+                    'avg_seconds': round(timing['total_seconds'] / timing['count'], 4),
+                    'max_seconds': round(timing['max_seconds'], 4)
+                }
+            return {'counters': dict(self._counters), 'timings': timings}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# Registry behind /api/metrics; worker processes keep their own
+REGISTRY = MetricsRegistry()
+
+
+class IngestionMetrics:
+    """Stage timings and counts for one statement.
+
+    Stages: load, scan, parse, split, extract, llm, llm_wait, clean,
+    db_insert and total. Chunks are extracted on several threads, so
+    extract and llm add up time spent across threads. llm_wait is the time
+    the stream sat waiting on them. Every update is mirrored to the
+    registry under an "ingestion." prefix.
+    """
+
+    def __init__(self, file=None, registry=None):
+        self.file = file
+        self.registry = registry if registry is not None else REGISTRY
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counts = {}
+        self.reconciliation = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.registry.observe(f"ingestion.{name}", seconds)
+
+    def timed(self, name, iterable):
+        """Iterate, charging the time spent producing each item to a stage"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - started)
+                return
+            self.add_time(name, time.perf_counter() - started)
+            yield item
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+        self.registry.increment(f"ingestion.{name}", value)
+
+    def reconcile(self, statement_total, extracted_total, balancing_amount=None):
+        self.reconciliation = {
+            'statement_total': statement_total,
+            'extracted_total': round(extracted_total, 2),
+            'delta': round(statement_total - extracted_total, 2) if statement_total is not None else None,
+            'balancing_amount': round(balancing_amount, 2) if balancing_amount is not None else None
+        }
+        if balancing_amount is not None:
+            self.registry.increment('ingestion.balancing_transactions')
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'file': self.file,
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'counts': dict(self.counts),
+                'reconciliation': dict(self.reconciliation)
+            }
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Counts the tokens each LLM call reports into an IngestionMetrics"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        self.metrics.increment('llm_calls')
+        self.metrics.increment('tokens_in', usage.get('prompt_tokens') or 0)
+        self.metrics.increment('tokens_out', usage.get('completion_tokens') or 0)
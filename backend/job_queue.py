@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# Next to this file, so the web app and upload workers share it whatever directory they start in
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_jobs.sqlite3')
+
+
+class UploadJobQueue:
+    """Durable queue of statement uploads backed by a local SQLite file.
+
+    Every web worker and every upload worker process on the host opens the
+    same file, so no external broker is needed. Claiming a job is a single
+    write transaction, which keeps two workers from picking the same job.
+
+    A claimed job holds a lease of `lease_seconds` that its worker renews
+    while it runs. A job whose lease ran out lost its worker, and the next
+    claim puts it back on the queue; a job that is merely slow never does.
+    After `max_attempts` lost leases the job is failed instead, so an upload
+    that kills its worker every time cannot keep taking workers down.
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None):
+        self.path = path or os.getenv('UPLOAD_JOB_DB_PATH') or DEFAULT_DB_PATH
+        self.lease_seconds = lease_seconds if lease_seconds is not None else float(
+            os.getenv('UPLOAD_JOB_LEASE_SECONDS', '60'))
+        self.max_attempts = max_attempts if max_attempts is not None else int(
+            os.getenv('UPLOAD_JOB_MAX_ATTEMPTS', '3'))
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS upload_jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    file_path TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    transactions_count INTEGER,
+                    error TEXT,
+                    results TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    lease_expires_at REAL
+                )
+            """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_upload_jobs_state ON upload_jobs (state, created_at)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_upload_jobs_user ON upload_jobs (user_id, finished_at)")
+            # Queue files created before per-file results existed
+            columns = [row['name'] for row in connection.execute("PRAGMA table_info(upload_jobs)")]
+            if 'results' not in columns:
+                connection.execute("ALTER TABLE upload_jobs ADD COLUMN results TEXT")
+            if 'lease_expires_at' not in columns:
+                connection.execute("ALTER TABLE upload_jobs ADD COLUMN lease_expires_at REAL")
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _connect(self):
+        # A short-lived connection per call keeps this safe across threads
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def enqueue(self, user_id, file_path):
+        """Add an upload to the queue and return its job id"""
+        job_id = uuid.uuid4().hex
+        connection = self._connect()
+        try:
+            connection.execute(
+                """INSERT INTO upload_jobs (id, user_id, file_path, state, created_at)
+                VALUES (?, ?, ?, ?, ?)""",
+                (job_id, int(user_id), file_path, QUEUED, time.time())
+            )
+        finally:
+            connection.close()
+        return job_id
+
+    def claim(self, abandoned=None):
+        """Atomically move the oldest queued job to running and return it.
+
+        Jobs whose lease has expired are requeued first, so they are picked
+        up again by whichever worker is still alive. Those already tried
+        `max_attempts` times are failed instead and appended to `abandoned`,
+        if given, so the caller can release their files.
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            # Jobs claimed before leases existed have none; they get one lease from their start
+            expired = "state = ? AND COALESCE(lease_expires_at, started_at + ?) < ?"
+            given_up = connection.execute(
+                f"SELECT * FROM upload_jobs WHERE {expired} AND attempts >= ?",
+                (RUNNING, self.lease_seconds, now, self.max_attempts)
+            ).fetchall()
+            if given_up:
+                connection.execute(
+                    f"""UPDATE upload_jobs SET state = ?, error = ?, finished_at = ?, lease_expires_at = NULL
+                    WHERE {expired} AND attempts >= ?""",
+                    (FAILED, f"Gave up after {self.max_attempts} attempts", now,
+                     RUNNING, self.lease_seconds, now, self.max_attempts)
+                )
+                logging.error(f"Failed {len(given_up)} upload jobs that lost their worker "
+                              f"{self.max_attempts} times")
+                if abandoned is not None:
+                    abandoned.extend(dict(row, state=FAILED) for row in given_up)
+            requeued = connection.execute(
+                f"UPDATE upload_jobs SET state = ?, lease_expires_at = NULL WHERE {expired}",
+                (QUEUED, RUNNING, self.lease_seconds, now)
+            ).rowcount
+            if requeued:
+                logging.info(f"Requeued {requeued} upload jobs whose lease expired")
+            row = connection.execute(
+                "SELECT * FROM upload_jobs WHERE state = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                """UPDATE upload_jobs SET state = ?, started_at = ?, lease_expires_at = ?,
+                attempts = attempts + 1 WHERE id = ?""",
+                (RUNNING, now, now + self.lease_seconds, row['id'])
+            )
+            connection.execute("COMMIT")
+            job = dict(row)
+            job.update(state=RUNNING, started_at=now, attempts=row['attempts'] + 1)
+            return job
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def renew(self, job):
+        """Extend the lease on a claimed job; False if it was requeued or finished meanwhile"""
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                "UPDATE upload_jobs SET lease_expires_at = ? WHERE id = ? AND state = ? AND attempts = ?",
+                (time.time() + self.lease_seconds, job['id'], RUNNING, job['attempts'])
+            )
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    def complete(self, job_id, transactions_count, results=None, attempts=None):
+        """Mark a job completed; False if the claim was no longer current"""
+        return self._finish(job_id, COMPLETED, transactions_count=transactions_count, results=results,
+                            attempts=attempts)
+
+    def fail(self, job_id, error, attempts=None):
+        """Mark a job failed; False if the claim was no longer current"""
+        return self._finish(job_id, FAILED, error=error, attempts=attempts)
+
+    def _finish(self, job_id, state, transactions_count=None, error=None, results=None, attempts=None):
+        # With `attempts`, only the claim that is still running may finish the job
+        query = """UPDATE upload_jobs SET state = ?, transactions_count = ?, error = ?, results = ?,
+                finished_at = ?, lease_expires_at = NULL WHERE id = ?"""
+        params = [state, transactions_count, error,
+                  json.dumps(results) if results is not None else None, time.time(), job_id]
+        if attempts is not None:
+            query += " AND state = ? AND attempts = ?"
+            params += [RUNNING, attempts]
+        connection = self._connect()
+        try:
+            return connection.execute(query, params).rowcount == 1
+        finally:
+            connection.close()
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it does not exist"""
+        connection = self._connect()
+        try:
+            row = connection.execute("SELECT * FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job['results'] = json.loads(job['results']) if job['results'] else None
+            return job
+        finally:
+            connection.close()
+
+    def state_counts(self):
+        """Number of jobs in each state, for monitoring queue depth"""
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT state, COUNT(*) FROM upload_jobs GROUP BY state").fetchall()
+            return {state: count for state, count in rows}
+        finally:
+            connection.close()
+
+    def completed_since(self, user_id, seconds):
+        """Whether an upload of the user's completed in the last `seconds`"""
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT 1 FROM upload_jobs WHERE user_id = ? AND finished_at >= ? AND state = ? LIMIT 1",
+                (user_id, time.time() - seconds, COMPLETED)
+            ).fetchone()
+            return row is not None
+        finally:
+            connection.close()
+
+class UploadWorkerPool:
+    """Threads that claim upload jobs and hand them to a handler.
+
+    The handler receives the job dict and returns the number of transactions
+    saved, or a dict with 'transactions_count' and per-file 'results'; any
+    exception marks the job as failed with its message.
+
+    `cleanup` receives each job once it is over for good, to remove its
+    uploaded files: after this worker finished it while still holding the
+    lease, or after the queue gave up on it. A worker that lost the lease
+    leaves the files to the one that took the job over.
+    """
+
+    def __init__(self, queue, handler, workers=None, poll_interval=None, cleanup=None):
+        self.queue = queue
+        self.handler = handler
+        self.cleanup = cleanup
+        self.workers = workers if workers is not None else int(os.getenv('UPLOAD_WORKER_THREADS', '2'))
+        self.poll_interval = poll_interval if poll_interval is not None else float(
+            os.getenv('UPLOAD_WORKER_POLL_SECONDS', '1.0'))
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"upload-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Started {self.workers} upload workers")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self):
+        """Process a single queued job; returns False when the queue is empty"""
+        abandoned = []
+        job = self.queue.claim(abandoned)
+        for given_up in abandoned:
+            self._cleanup(given_up)
+        if job is None:
+            return False
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done),
+                                     name=f"upload-lease-{job['id'][:8]}", daemon=True)
+        heartbeat.start()
+        finished = False
+        try:
+            outcome = self.handler(job)
+            if isinstance(outcome, dict):
+                transactions_count = outcome['transactions_count']
+                finished = self.queue.complete(job['id'], transactions_count, outcome.get('results'),
+                                               job['attempts'])
+            else:
+                transactions_count = outcome
+                finished = self.queue.complete(job['id'], transactions_count, attempts=job['attempts'])
+            logging.info(f"Upload job {job['id']} completed with {transactions_count} transactions")
+        except Exception as e:
+            logging.error(f"Upload job {job['id']} failed: {str(e)}")
+            finished = self.queue.fail(job['id'], str(e), job['attempts'])
+        finally:
+            done.set()
+            heartbeat.join()
+        if finished:
+            self._cleanup(job)
+        else:
+            logging.warning(f"Upload job {job['id']} was taken over by another worker; its result was dropped")
+        return True
+
+    def _cleanup(self, job):
+        if self.cleanup is None:
+            return
+        try:
+            self.cleanup(job)
+        except Exception as e:
+            logging.error(f"Upload job {job['id']} cleanup failed: {str(e)}")
+
+    def _heartbeat(self, job, done):
+        # Renew well inside the lease so one slow write does not lose it
+        while not done.wait(self.queue.lease_seconds / 3):
+            try:
+                if not self.queue.renew(job):
+                    logging.warning(f"Upload job {job['id']} lost its lease")
+                    return
+            except Exception as e:
+                logging.error(f"Upload job {job['id']} lease renewal failed: {str(e)}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                logging.error(f"Upload worker error: {str(e)}")
+                self._stop.wait(self.poll_interval)
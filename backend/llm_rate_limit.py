@@ -0,0 +1,297 @@
+"""Shared rate limiting for every OpenAI call made by the backend.
+
+PDFProcessor (through ChatOpenAI) and OpenAIService (through OpenAI) both
+get their HTTP client from llm_transport.llm_client_options(), which wraps
+its transport in RateLimitedTransport. Each request then goes through:
+
+- token buckets for requests and tokens per minute (LLM_RATE_LIMIT_RPM,
+  LLM_RATE_LIMIT_TPM). They live in a SQLite file next to this module (or
+  LLM_RATE_LIMIT_DB), the same way the upload job queue is shared, so web
+  workers and upload worker processes on a host draw from one quota
+- an adaptive concurrency limit per process that halves on 429s and 5xx
+  responses, shrinks when latency climbs well above the best seen, and
+  otherwise grows by about one slot per round of calls
+- retries of 429s, 5xx responses and connection errors with full-jitter
+  exponential backoff, honouring Retry-After. A 429 also drains the shared
+  request bucket, so the other workers back off too
+
+The OpenAI clients' own retries are turned off while the limiter is on, so
+a request is never retried twice over. Set LLM_RATE_LIMIT=off to disable.
+"""
+import json
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from ingestion_metrics import REGISTRY
+
+load_dotenv()
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Characters per token for estimating a request before it is sent
+CHARS_PER_TOKEN = 4
+
+# Next to this file, so every process on the host shares it whatever directory it starts in
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'llm_rate_limit.sqlite3')
+
+
+class SharedTokenBucket:
+    """Token bucket whose state lives in a SQLite file shared across processes.
+
+    `reserve` always takes the tokens, letting the bucket go negative, and
+    returns how long the caller must wait before its turn. Callers are
+    therefore served in order without polling. `capacity` caps the burst
+    after an idle period.
+    """
+
+    def __init__(self, name, rate_per_minute, burst_seconds=None, path=None):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        burst_seconds = burst_seconds or float(os.getenv('LLM_RATE_LIMIT_BURST_SECONDS', '10'))
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.path = path or os.getenv('LLM_RATE_LIMIT_DB') or DEFAULT_DB_PATH
+        connection = self._connect()
+        try:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS rate_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _update(self, amount):
+        # One write transaction per call keeps concurrent processes consistent
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = connection.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+            tokens -= amount
+            connection.execute(
+                "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (self.name, tokens, now)
+            )
+            connection.execute("COMMIT")
+            return tokens
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def reserve(self, amount):
+        """Take `amount` tokens and return the seconds to wait before using them"""
+        tokens = self._update(amount)
+        return max(0.0, -tokens / self.rate)
+
+    def refund(self, amount):
+        """Give back tokens that were reserved but not used (negative to take more)"""
+        if amount:
+            self._update(-amount)
+
+    def pause(self, seconds):
+        """Hold every user of the bucket back for roughly `seconds`"""
+        self._update(seconds * self.rate)
+
+
+class AdaptiveConcurrencyLimit:
+    """Per-process cap on in-flight calls, adjusted from how calls fare.
+
+    Overload (429s, 5xx) halves the limit. A call much slower than the best
+    recent latency shrinks it by 10%. Any other call grows it by 1/limit,
+    so a full round of successful calls adds about one slot.
+    """
+
+    def __init__(self, initial=None, minimum=None, maximum=None, latency_tolerance=None):
+        self.minimum = minimum or int(os.getenv('LLM_MIN_CONCURRENCY', '1'))
+        self.maximum = maximum or int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+        self.latency_tolerance = latency_tolerance or float(os.getenv('LLM_LATENCY_TOLERANCE', '3'))
+        initial = initial or int(os.getenv('LLM_INITIAL_CONCURRENCY', '4'))
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.in_flight = 0
+        self._baseline = None
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency=None, overloaded=False):
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                self.limit = max(self.minimum, self.limit / 2)
+            elif latency is not None:
+                # The baseline creeps up so it can follow a lasting change
+                self._baseline = latency if self._baseline is None else min(latency, self._baseline * 1.02)
+                if latency > self._baseline * self.latency_tolerance:
+                    self.limit = max(self.minimum, self.limit * 0.9)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class RateLimiter:
+    """The buckets, concurrency limit and retry policy shared by one process"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, concurrency=None, max_retries=None,
+                 path=None):
+        requests_per_minute = requests_per_minute if requests_per_minute is not None else int(
+            os.getenv('LLM_RATE_LIMIT_RPM', '500'))
+        tokens_per_minute = tokens_per_minute if tokens_per_minute is not None else int(
+            os.getenv('LLM_RATE_LIMIT_TPM', '200000'))
+        # A limit of 0 switches that bucket off
+        self.requests = SharedTokenBucket('requests', requests_per_minute, path=path) if requests_per_minute else None
+        self.tokens = SharedTokenBucket('tokens', tokens_per_minute, path=path) if tokens_per_minute else None
+        self.concurrency = concurrency or AdaptiveConcurrencyLimit()
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('LLM_MAX_RETRIES', '5'))
+        self.retry_base = float(os.getenv('LLM_RETRY_BASE_MS', '500')) / 1000
+        self.retry_max = float(os.getenv('LLM_RETRY_MAX_MS', '30000')) / 1000
+        self.default_completion_tokens = int(os.getenv('LLM_ESTIMATED_COMPLETION_TOKENS', '500'))
+
+    def estimate_tokens(self, body):
+        """Tokens a request will be charged: its prompt plus the completion budget"""
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return math.ceil(len(body or b'') / CHARS_PER_TOKEN)
+        prompt = {key: value for key, value in payload.items()
+                  if key in ('messages', 'functions', 'tools', 'input')}
+        completion = payload.get('max_tokens') or payload.get('max_completion_tokens') \
+            or self.default_completion_tokens
+        return math.ceil(len(json.dumps(prompt)) / CHARS_PER_TOKEN) + completion
+
+    def wait_for_quota(self, estimated_tokens):
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        if wait > 0:
+            REGISTRY.increment('llm.throttled')
+            REGISTRY.observe('llm.throttle_wait', wait)
+            time.sleep(wait)
+
+    def backoff(self, attempt, response=None):
+        """Seconds before retry `attempt` (1-based): Retry-After, else full jitter"""
+        if response is not None:
+            retry_after = _retry_after(response.headers)
+            if retry_after is not None:
+                return min(self.retry_max, retry_after) + random.uniform(0, self.retry_base)
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+
+
+def _retry_after(headers):
+    if 'retry-after-ms' in headers:
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    if 'retry-after' in headers:
+        try:
+            return float(headers['retry-after'])
+        except ValueError:
+            pass
+    return None
+
+
+def _usage_tokens(response):
+    try:
+        usage = json.loads(response.content).get('usage') or {}
+    except (ValueError, AttributeError):
+        return None
+    return usage.get('total_tokens')
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Applies a RateLimiter around another transport"""
+
+    def __init__(self, inner, limiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def handle_request(self, request):
+        limiter = self.limiter
+        request.read()
+        estimated = limiter.estimate_tokens(request.content)
+        attempt = 0
+        while True:
+            limiter.wait_for_quota(estimated)
+            limiter.concurrency.acquire()
+            started = time.perf_counter()
+            response = None
+            latency, overloaded, failed = None, False, False
+            try:
+                response = self.inner.handle_request(request)
+                response.read()
+                latency = time.perf_counter() - started
+                overloaded = response.status_code in RETRY_STATUSES
+            except httpx.TransportError as e:
+                overloaded = failed = True
+                if attempt >= limiter.max_retries:
+                    if limiter.tokens:
+                        limiter.tokens.refund(estimated)
+                    raise
+                logging.warning(f"LLM request failed ({str(e)}), retrying")
+            finally:
+                # The slot goes back whatever was raised, retried or not
+                limiter.concurrency.release(latency, overloaded)
+
+            if not failed:
+                if not overloaded or attempt >= limiter.max_retries:
+                    if limiter.tokens and overloaded:
+                        # Rejected on the last try: no more charged than the retried attempts
+                        limiter.tokens.refund(estimated)
+                    elif limiter.tokens:
+                        used = _usage_tokens(response) if response.status_code < 400 else None
+                        if used is not None:
+                            limiter.tokens.refund(estimated - used)
+                    return response
+                logging.warning(f"LLM request got {response.status_code}, retrying")
+                if response.status_code == 429 and limiter.requests:
+                    limiter.requests.pause(_retry_after(response.headers) or limiter.retry_base)
+                response.close()
+
+            # A rejected attempt is not charged for tokens
+            if limiter.tokens:
+                limiter.tokens.refund(estimated)
+            attempt += 1
+            REGISTRY.increment('llm.retries')
+            time.sleep(limiter.backoff(attempt, response))
+
+    def close(self):
+        self.inner.close()
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def shared_rate_limiter():
+    """The process-wide limiter, or None when LLM_RATE_LIMIT is off"""
+    global _shared_limiter
+    if os.getenv('LLM_RATE_LIMIT', 'on').lower() in ('off', '0', 'false'):
+        return None
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
@@ -0,0 +1,412 @@
+"""Pluggable transport for the OpenAI calls made by PDFProcessor and OpenAIService.
+
+LLM_TRANSPORT_MODE selects how requests are served:
+
+- live (default): straight to the OpenAI API
+- record: to the OpenAI API, saving every response in LLM_CASSETTE_DIR
+- replay: from LLM_CASSETTE_DIR only; a request that was never recorded fails
+- synthetic: to a local stand-in server that fakes the API with configurable
+  latency, jitter and error injection. Set LLM_SYNTHETIC_URL to share one
+  server between processes (`python llm_transport.py serve`), otherwise one
+  is started inside the process.
+
+Replay and synthetic need no network or API key, so the upload and analyze
+paths can be benchmarked and load-tested offline.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import openai
+from dotenv import load_dotenv
+
+from bank_profiles import BankProfileRegistry
+from llm_rate_limit import RateLimitedTransport, shared_rate_limiter
+from statement_parser import MONTHS
+
+load_dotenv()
+
+MODES = ('live', 'record', 'replay', 'synthetic')
+
+# Only these response headers are worth keeping in a recording
+RECORDED_HEADERS = ('content-type', 'x-request-id')
+
+
+class Cassette:
+    """Recorded LLM responses, one JSON file per distinct request"""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('LLM_CASSETTE_DIR', 'llm_cassettes')
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def make_key(request):
+        """Hash of the method, path and (canonicalised) JSON body"""
+        body = request.content or b''
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode('utf-8')
+        except ValueError:
+            pass
+        digest = hashlib.sha256()
+        digest.update(f"{request.method} {request.url.path}\n".encode('utf-8'))
+        digest.update(body)
+        return digest.hexdigest()
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.path, f"{key}.json"), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, request, response):
+        entry = {
+            'request': {
+                'method': request.method,
+                'url': str(request.url),
+                'body': _json_or_text(request.content)
+            },
+            'response': {
+                'status_code': response.status_code,
+                'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+                'body': _json_or_text(response.content)
+            }
+        }
+        # Write then rename so concurrent workers never see half a file
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(temp_path, os.path.join(self.path, f"{key}.json"))
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.path) if name.endswith('.json'))
+
+
+def _json_or_text(content):
+    text = (content or b'').decode('utf-8', errors='replace')
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _build_response(status_code, headers, body, request):
+    content = body if isinstance(body, str) else json.dumps(body)
+    return httpx.Response(status_code, headers=headers, content=content.encode('utf-8'), request=request)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Sends requests upstream and saves successful responses to a cassette"""
+
+    def __init__(self, cassette, inner=None):
+        self.cassette = cassette
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request):
+        request.read()
+        response = self.inner.handle_request(request)
+        response.read()
+        headers = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+        # Rate limits and server errors are not part of the conversation
+        if response.status_code < 400:
+            self.cassette.put(self.cassette.make_key(request), request, response)
+        # The body has been decoded, so hand back a plain copy
+        return httpx.Response(response.status_code, headers=headers, content=response.content, request=request)
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Answers requests from a cassette without touching the network"""
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+
+    def handle_request(self, request):
+        request.read()
+        entry = self.cassette.get(self.cassette.make_key(request))
+        if entry is None:
+            # 400 is not retried by the OpenAI client, so a miss fails fast
+            return _build_response(400, {'content-type': 'application/json'}, {
+                'error': {
+                    'message': f"No recorded response for {request.method} {request.url.path}",
+                    'type': 'cassette_miss'
+                }
+            }, request)
+        response = entry['response']
+        return _build_response(response['status_code'], response['headers'], response['body'], request)
+
+
+# Synthetic responses
+
+ROW_LINE = re.compile(
+    r'^(?P<month>Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? (?P<day>\d{1,2})'
+    r'(?: (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? \d{1,2})?'
+    r' (?:Ý )?(?P<description>.+?)(?: (?P<amount>-?\$?[\d,]+\.\d{2}))?\s*$',
+    re.IGNORECASE
+)
+TRAILING_AMOUNT = re.compile(r'^(?P<label>.*?)\s*(?P<amount>-?\$?[\d,]+\.\d{2})\s*$')
+PASSAGE = re.compile(r'Passage:\s*(.*)', re.DOTALL)
+CATEGORY_LINE = re.compile(r'^- (?P<category>[A-Za-z]+): \$')
+
+
+def synthetic_rows(passage, year=2025, profiles=None):
+    """Pull transaction rows out of statement text the way the model would"""
+    lines = [line.strip() for line in passage.splitlines()]
+    rows = []
+    for i, line in enumerate(lines):
+        match = ROW_LINE.match(line)
+        if not match:
+            continue
+        description = match.group('description').strip()
+        amount = match.group('amount')
+        spend_category = ''
+        # Layouts that print the category and amount on the next line
+        if amount is None and i + 1 < len(lines):
+            follow = TRAILING_AMOUNT.match(lines[i + 1])
+            if follow and not ROW_LINE.match(lines[i + 1]):
+                spend_category = follow.group('label')
+                amount = follow.group('amount')
+        if amount is None:
+            continue
+        category = 'Other'
+        for profile in (profiles.profiles if profiles else []):
+            category = profile.map_category(spend_category) or category
+        rows.append({
+            'date': f"{year}-{MONTHS[match.group('month')[:3].lower()]:02d}-{int(match.group('day')):02d}",
+            'description': description,
+            'amount': float(amount.replace('$', '').replace(',', '')),
+            'category': category,
+            'spend_category': spend_category
+        })
+    return rows
+
+
+def synthetic_analysis(prompt):
+    """A well-formed spending analysis naming the categories in the prompt"""
+    categories = [match.group('category') for match in map(CATEGORY_LINE.match, prompt.splitlines()) if match]
+    categories = categories or ['Other']
+    reduce_lines = "\n".join(
+        f"- **{category}**: \n  - Current Spending: $0.00 (0.0%)\n  - Suggested Reduction: 10% \n  - Potential Savings: $0.00"
+        for category in categories[:3]
+    )
+    return (
+        f"- AREAS TO REDUCE:\n{reduce_lines}\n\n"
+        "- RECOMMENDATIONS:\n1. Set a weekly spending limit.\n2. Review subscriptions monthly.\n"
+        "3. Plan meals ahead.\n\n"
+        f"- HIGH EXPENSE CATEGORIES:\n- {categories[0]} is above the typical benchmark.\n\n"
+        "- ACTION PLAN:\n1. Track spending this week.\n2. Cancel one unused service this month.\n"
+        "3. Review progress in 30 days.\n"
+    )
+
+
+def synthetic_completion(body, profiles=None):
+    """Build a chat.completions response for a request body"""
+    messages = body.get('messages', [])
+    prompt = "\n".join(str(message.get('content') or '') for message in messages)
+    message = {'role': 'assistant', 'content': None}
+    finish_reason = 'stop'
+
+    functions = body.get('functions') or []
+    tools = body.get('tools') or []
+    if functions or tools:
+        # Extraction chains force a function call and read its arguments
+        passage = PASSAGE.search(prompt)
+        arguments = json.dumps({'info': synthetic_rows(passage.group(1) if passage else prompt, profiles=profiles)})
+        if functions:
+            message['function_call'] = {'name': functions[0]['name'], 'arguments': arguments}
+            finish_reason = 'function_call'
+        else:
+            message['tool_calls'] = [{
+                'id': 'call_synthetic', 'type': 'function',
+                'function': {'name': tools[0]['function']['name'], 'arguments': arguments}
+            }]
+            finish_reason = 'tool_calls'
+        completion_text = arguments
+    else:
+        message['content'] = synthetic_analysis(prompt)
+        completion_text = message['content']
+
+    # Roughly four characters per token, like the real tokenizer on English
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(completion_text) // 4)
+    return {
+        'id': f"chatcmpl-synthetic-{random.getrandbits(48):012x}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'synthetic'),
+        'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason, 'logprobs': None}],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+    }
+
+
+class SyntheticLLMServer:
+    """Local HTTP stand-in for the chat completions API.
+
+    Every request waits latency_ms +/- jitter_ms, then fails with a 429 or 500
+    with probability error_rate, or returns a synthetic completion.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=None, jitter_ms=None, error_rate=None, seed=None):
+        self.latency_ms = latency_ms if latency_ms is not None else float(
+            os.getenv('LLM_SYNTHETIC_LATENCY_MS', '500'))
+        self.jitter_ms = jitter_ms if jitter_ms is not None else float(
+            os.getenv('LLM_SYNTHETIC_JITTER_MS', '150'))
+        self.error_rate = error_rate if error_rate is not None else float(
+            os.getenv('LLM_SYNTHETIC_ERROR_RATE', '0'))
+        self.random = random.Random(seed)
+        self.profiles = BankProfileRegistry()
+        self.stats = {'requests': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="synthetic-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next_outcome(self):
+        with self._lock:
+            self.stats['requests'] += 1
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self.random.random() < self.error_rate
+            status = self.random.choice((429, 500)) if failed else 200
+            if failed:
+                self.stats['errors'] += 1
+        return delay, status
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not self.path.endswith('/chat/completions'):
+                    return self._reply(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'not_found'}})
+
+                delay, status = server._next_outcome()
+                time.sleep(delay)
+                if status != 200:
+                    return self._reply(status, {'error': {
+                        'message': 'Injected synthetic error', 'type': 'server_error', 'code': status}})
+                self._reply(200, synthetic_completion(body, server.profiles))
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+_synthetic_server = None
+_synthetic_lock = threading.Lock()
+
+
+def _shared_synthetic_server():
+    global _synthetic_server
+    with _synthetic_lock:
+        if _synthetic_server is None:
+            _synthetic_server = SyntheticLLMServer().start()
+        return _synthetic_server
+
+
+def upstream_transport(base_url=None):
+    """An HTTPTransport to the OpenAI API set up as openai.DefaultHttpxClient's would be.
+
+    A client given its own transport ignores HTTPS_PROXY and friends, so
+    the proxy they name for `base_url` (unless NO_PROXY covers it) is set
+    on the transport, along with the SDK's connection limits.
+    """
+    url = httpx.URL(base_url or os.getenv('OPENAI_BASE_URL') or 'https://api.openai.com/v1')
+    proxies = urllib.request.getproxies_environment()
+    proxy = None
+    if not urllib.request.proxy_bypass_environment(url.host, proxies):
+        proxy = proxies.get(url.scheme) or proxies.get('all')
+    return httpx.HTTPTransport(limits=openai.DEFAULT_CONNECTION_LIMITS, proxy=proxy)
+
+
+def llm_client_options(mode=None):
+    """Keyword arguments for OpenAI() and ChatOpenAI() in the configured mode.
+
+    Every mode's transport goes through the shared rate limiter (see
+    llm_rate_limit.py), which also takes over retries from the client.
+    """
+    mode = mode or os.getenv('LLM_TRANSPORT_MODE', 'live')
+    if mode not in MODES:
+        raise ValueError(f"Unknown LLM transport mode: {mode}")
+
+    options = {'api_key': os.getenv('OPENAI_API_KEY')}
+    if mode == 'live':
+        transport = upstream_transport()
+    else:
+        # Offline modes never send the key anywhere that checks it
+        options['api_key'] = options['api_key'] or 'offline'
+        if mode == 'record':
+            transport = RecordingTransport(Cassette(), upstream_transport())
+        elif mode == 'replay':
+            transport = ReplayTransport(Cassette())
+        else:
+            transport = httpx.HTTPTransport()
+            options['base_url'] = os.getenv('LLM_SYNTHETIC_URL') or _shared_synthetic_server().url
+
+    limiter = shared_rate_limiter()
+    if limiter:
+        transport = RateLimitedTransport(transport, limiter)
+        options['max_retries'] = 0
+    elif mode == 'live':
+        return options
+    # The SDK's own timeout and redirect handling around our transport
+    options['http_client'] = openai.DefaultHttpxClient(transport=transport)
+    return options
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local synthetic stand-in for the OpenAI chat API")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    serve = subcommands.add_parser("serve", help="Run the synthetic server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8089)
+    serve.add_argument("--latency-ms", type=float)
+    serve.add_argument("--jitter-ms", type=float)
+    serve.add_argument("--error-rate", type=float)
+    serve.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = SyntheticLLMServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    print(f"Synthetic LLM listening on {server.url} (set LLM_SYNTHETIC_URL to this)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
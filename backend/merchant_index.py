@@ -0,0 +1,178 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from mysql.connector import Error
+
+load_dotenv()
+
+VALID_CATEGORIES = ["Food", "Dining", "Transportation", "Utilities",
+                    "Shopping", "Entertainment", "Health", "Rent", "Other"]
+
+# Descriptions we generate ourselves and must never learn from
+IGNORED_DESCRIPTIONS = {'Additional transactions to match statement total'}
+
+# Where a transaction's category came from (its "category_source"). Only
+# the statement's own spend category and a user's choice are facts; LLM
+# guesses, the "Other" fallback and the index's own answers are not learned.
+CONFIRMED_SOURCES = ('statement', 'user')
+
+PROVINCE_SUFFIX = re.compile(r'\s+[A-Z]{2}$')
+STORE_NUMBER = re.compile(r'(?:#\s*\d+|(?<!\S)\d[\d-]*(?!\S))')
+NON_WORD = re.compile(r'[^A-Z0-9/&\.\'\- ]+')
+WHITESPACE = re.compile(r'\s+')
+
+
+class _Unknown:
+    """Marks a merchant we looked up and did not find, until `expires_at`"""
+    __slots__ = ('expires_at',)
+
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+
+
+def normalize_merchant(description):
+    """Reduce a statement description to a stable merchant key.
+
+    Drops the trailing "CITY PROV" location and store numbers, so
+    "FRESHCO #8966   CALGARY   AB" becomes "FRESHCO". Issuer glyphs such as
+    a cash-back marker are the bank profile's to strip (strip_ignored).
+    """
+    if not description:
+        return None
+    text = WHITESPACE.sub(' ', description).strip()
+    if PROVINCE_SUFFIX.search(text):
+        text = PROVINCE_SUFFIX.sub('', text)
+        # The word before the province is the city
+        text = text.rsplit(' ', 1)[0] if ' ' in text else text
+    text = STORE_NUMBER.sub(' ', text.upper())
+    text = NON_WORD.sub(' ', text)
+    text = WHITESPACE.sub(' ', text).strip(" -.")
+    return text[:255] or None
+
+
+class MerchantCategoryIndex:
+    """Normalized merchant -> category index backed by MySQL with an LRU in front.
+
+    Lookups are answered from memory when possible and fall back to the
+    merchant_categories table. The index is filled from transactions whose
+    category was confirmed (see CONFIRMED_SOURCES) so known merchants never
+    need the LLM to be categorized.
+
+    Merchants the table does not have are remembered as unknown for
+    `miss_ttl` seconds only: another process may learn them meanwhile.
+    `clock` returns the current time in seconds (time.monotonic by default).
+    """
+
+    def __init__(self, connection_factory=None, capacity=None, miss_ttl=None, clock=None):
+        self.connection_factory = connection_factory
+        self.capacity = capacity or int(os.getenv('MERCHANT_INDEX_CACHE_SIZE', '5000'))
+        self.miss_ttl = miss_ttl if miss_ttl is not None else float(os.getenv('MERCHANT_INDEX_MISS_TTL', '300'))
+        self.clock = clock or time.monotonic
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, description):
+        """Return the known category for a description, or None"""
+        return self.lookup_many([description]).get(normalize_merchant(description))
+
+    def lookup_many(self, descriptions):
+        """Resolve several descriptions at once; returns {merchant_key: category}"""
+        keys = {normalize_merchant(description) for description in descriptions}
+        keys.discard(None)
+        found = {}
+        missing = []
+
+        now = self.clock()
+        with self._lock:
+            for key in keys:
+                cached = self._cache.get(key)
+                if cached is None or (isinstance(cached, _Unknown) and cached.expires_at <= now):
+                    missing.append(key)
+                    continue
+                self._cache.move_to_end(key)
+                if not isinstance(cached, _Unknown):
+                    found[key] = cached
+
+        if missing and self.connection_factory:
+            # The query runs unlocked so other lookups are not held up by it
+            rows = self._fetch(missing)
+            # Only remember misses when the database actually answered
+            if rows is not None:
+                unknown = _Unknown(self.clock() + self.miss_ttl)
+                with self._lock:
+                    for key in missing:
+                        # A record() that landed during the fetch is newer
+                        if key not in self._cache or isinstance(self._cache[key], _Unknown):
+                            self._remember(key, rows.get(key, unknown))
+                found.update(rows)
+
+        return found
+
+    def record(self, transactions):
+        """Learn merchant categories from transactions whose category was confirmed"""
+        learned = {}
+        for transaction in transactions:
+            if transaction.get('category_source') not in CONFIRMED_SOURCES:
+                continue
+            if transaction.get('description') in IGNORED_DESCRIPTIONS:
+                continue
+            key = normalize_merchant(transaction.get('description'))
+            category = transaction.get('expense_category')
+            if key and category in VALID_CATEGORIES:
+                learned[key] = category
+        if not learned:
+            return 0
+
+        if self.connection_factory:
+            self._store(learned)
+        with self._lock:
+            for key, category in learned.items():
+                self._remember(key, category)
+        return len(learned)
+
+    def _remember(self, key, category):
+        self._cache[key] = category
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    def _fetch(self, keys):
+        try:
+            connection = self.connection_factory()
+            cursor = connection.cursor()
+            try:
+                placeholders = ', '.join(['%s'] * len(keys))
+                cursor.execute(
+                    f"SELECT merchant_key, expense_category FROM merchant_categories WHERE merchant_key IN ({placeholders})",
+                    tuple(keys)
+                )
+                return {merchant_key: category for merchant_key, category in cursor.fetchall()}
+            finally:
+                cursor.close()
+                connection.close()
+        except Error as e:
+            logging.error(f"Merchant index lookup failed: {str(e)}")
+            return None
+
+    def _store(self, learned):
+        try:
+            connection = self.connection_factory()
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(
+                    """INSERT INTO merchant_categories (merchant_key, expense_category)
+                    VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE expense_category = VALUES(expense_category),
+                    times_seen = times_seen + 1""",
+                    list(learned.items())
+                )
+                connection.commit()
+            finally:
+                cursor.close()
+                connection.close()
+        except Error as e:
+            logging.error(f"Merchant index update failed: {str(e)}")
@@ -0,0 +1,326 @@
+"""Versioned schema migrations.
+
+    python migrate.py status
+    python migrate.py up [--to VERSION] [--dry-run]
+    python migrate.py baseline VERSION
+
+Migrations live in migrations/ as NNN_description.sql or NNN_description.py
+and are applied in version order, each once. The applied versions are
+recorded in the schema_migrations table. SQL migrations are split into
+statements. Python migrations define upgrade(connection, progress) and are
+meant for data work such as batched backfills, calling progress(done, total)
+as they go.
+
+Every ALTER TABLE that does not name an ALGORITHM runs with
+ALGORITHM=INPLACE, LOCK=NONE. A change MySQL cannot make while the table
+stays writable then fails up front instead of blocking writes. A migration
+that accepts a table copy says so with an explicit ALGORITHM=COPY.
+
+MySQL commits DDL as it goes, so a migration is recorded only after all of
+its statements succeed. Keep each file to steps that are safe to re-run.
+"""
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.(sql|py)$')
+ALTER_TABLE = re.compile(r'^\s*ALTER\s+TABLE\s+(`?\w+`?)\s+', re.IGNORECASE)
+# Partition maintenance takes its own ALGORITHM rules, so it is left alone
+HAS_ONLINE_CLAUSE = re.compile(r'\bALGORITHM\s*=|\bPARTITION\b', re.IGNORECASE)
+# Only one runner at a time, across every host sharing the database
+LOCK_NAME = 'budgetwise_schema_migrations'
+
+
+class MigrationError(Exception):
+    """Raised when migrations cannot be discovered or applied"""
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        self.kind = os.path.splitext(path)[1][1:]
+        with open(path, 'rb') as f:
+            self.checksum = hashlib.sha256(f.read()).hexdigest()
+
+    @property
+    def label(self):
+        return f"{self.version:03d}_{self.name}"
+
+
+def discover_migrations(directory=None):
+    """All migrations in the directory, in version order"""
+    directory = directory or MIGRATIONS_DIR
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Two migrations share version {version}: "
+                                 f"{os.path.basename(migrations[version].path)} and {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def split_statements(sql):
+    """Split a SQL script on semicolons outside quotes and comments"""
+    statements = []
+    current = []
+    quote = None
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        if quote:
+            current.append(char)
+            if char == '\\' and i + 1 < len(sql):
+                current.append(sql[i + 1])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in ("'", '"', '`'):
+            quote = char
+            current.append(char)
+        elif sql.startswith('--', i) or char == '#':
+            # Comment to the end of the line
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+            continue
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def online_ddl(statement):
+    """Ask for an in-place, non-locking ALTER unless the statement chose otherwise"""
+    match = ALTER_TABLE.match(statement)
+    if not match or HAS_ONLINE_CLAUSE.search(statement):
+        return statement
+    return f"{statement[:match.end()]}ALGORITHM=INPLACE, LOCK=NONE, {statement[match.end():]}"
+
+
+class ProgressReporter:
+    """Prints progress of a long step at most every `interval` seconds"""
+
+    def __init__(self, label, interval=None):
+        self.label = label
+        self.interval = interval if interval is not None else float(os.getenv('MIGRATION_PROGRESS_SECONDS', '5'))
+        self.started = time.perf_counter()
+        self._last = 0.0
+
+    def __call__(self, done, total=None):
+        now = time.perf_counter()
+        finished = total is not None and done >= total
+        if not finished and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = now - self.started
+        rate = f", {done / elapsed:.0f}/s" if elapsed > 0 else ""
+        of_total = f"/{total} ({done * 100 // total if total else 100}%)" if total is not None else ""
+        print(f"[{self.label}] {done}{of_total}{rate}")
+
+
+class MigrationRunner:
+    def __init__(self, connection, directory=None, online=True):
+        self.connection = connection
+        self.migrations = discover_migrations(directory)
+        self.online = online
+
+    def ensure_table(self):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    checksum CHAR(64) NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    duration_ms INT NULL
+                )
+            """)
+        finally:
+            cursor.close()
+
+    def applied(self):
+        """{version: checksum} of every applied migration"""
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("SELECT version, checksum FROM schema_migrations")
+            return dict(cursor.fetchall())
+        finally:
+            cursor.close()
+
+    def status(self):
+        """One entry per known or recorded migration"""
+        self.ensure_table()
+        applied = self.applied()
+        entries = []
+        for migration in self.migrations:
+            checksum = applied.get(migration.version)
+            state = 'pending'
+            if migration.version in applied:
+                state = 'applied' if checksum in (None, migration.checksum) else 'changed since applied'
+            entries.append({'version': migration.version, 'name': migration.name, 'state': state})
+        known = {migration.version for migration in self.migrations}
+        for version in sorted(set(applied) - known):
+            entries.append({'version': version, 'name': None, 'state': 'applied, file missing'})
+        return entries
+
+    def pending(self, target=None):
+        applied = self.applied()
+        return [migration for migration in self.migrations
+                if migration.version not in applied and (target is None or migration.version <= target)]
+
+    def migrate(self, target=None, dry_run=False):
+        """Apply pending migrations up to `target`; returns the versions applied"""
+        self.ensure_table()
+        self._lock()
+        try:
+            applied = []
+            for migration in self.pending(target):
+                if dry_run:
+                    print(f"[{migration.label}] would apply")
+                    terminator = ';' if migration.kind == 'sql' else ''
+                    for statement in self._statements(migration):
+                        print(f"    {statement}{terminator}")
+                    continue
+                started = time.perf_counter()
+                print(f"[{migration.label}] applying")
+                if migration.kind == 'sql':
+                    self._run_sql(migration)
+                else:
+                    self._run_python(migration)
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                self._record(migration, duration_ms)
+                print(f"[{migration.label}] done in {duration_ms / 1000:.1f}s")
+                applied.append(migration.version)
+            return applied
+        finally:
+            self._unlock()
+
+    def baseline(self, version):
+        """Record migrations up to `version` as applied without running them.
+
+        For databases whose schema already contains them, e.g. ones
+        created from BudgetWise.sql before the runner existed.
+        """
+        self.ensure_table()
+        # The same lock as migrate(), so the two never interleave
+        self._lock()
+        try:
+            recorded = []
+            for migration in self.pending(version):
+                self._record(migration, None)
+                recorded.append(migration.version)
+            return recorded
+        finally:
+            self._unlock()
+
+    def _statements(self, migration):
+        if migration.kind != 'sql':
+            return [f"-- python: {os.path.basename(migration.path)}"]
+        with open(migration.path, encoding='utf-8') as f:
+            statements = split_statements(f.read())
+        return [online_ddl(statement) for statement in statements] if self.online else statements
+
+    def _run_sql(self, migration):
+        cursor = self.connection.cursor()
+        try:
+            for statement in self._statements(migration):
+                started = time.perf_counter()
+                summary = ' '.join(statement.split())[:80]
+                print(f"[{migration.label}] {summary}")
+                cursor.execute(statement)
+                self.connection.commit()
+                print(f"[{migration.label}]   ok ({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            raise MigrationError(f"{migration.label} failed: {str(e)}") from e
+        finally:
+            cursor.close()
+
+    def _run_python(self, migration):
+        spec = importlib.util.spec_from_file_location(f"migration_{migration.version:03d}", migration.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if not hasattr(module, 'upgrade'):
+            raise MigrationError(f"{migration.label} does not define upgrade(connection, progress)")
+        try:
+            module.upgrade(self.connection, ProgressReporter(migration.label))
+            self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            raise MigrationError(f"{migration.label} failed: {str(e)}") from e
+
+    def _record(self, migration, duration_ms):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+                (migration.version, migration.name, migration.checksum, duration_ms)
+            )
+            self.connection.commit()
+        finally:
+            cursor.close()
+
+    def _lock(self):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, int(os.getenv('MIGRATION_LOCK_TIMEOUT', '60'))))
+            (locked,) = cursor.fetchone()
+        finally:
+            cursor.close()
+        if locked != 1:
+            raise MigrationError("Another migration run holds the lock")
+
+    def _unlock(self):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
+
+if __name__ == "__main__":
+    from database import open_connection
+
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("status", help="List migrations and whether they are applied")
+    up = subcommands.add_parser("up", help="Apply pending migrations")
+    up.add_argument("--to", type=int, help="Stop after this version")
+    up.add_argument("--dry-run", action="store_true", help="Print the statements without running them")
+    up.add_argument("--allow-locking", action="store_true",
+                    help="Do not add ALGORITHM=INPLACE, LOCK=NONE to ALTER TABLE statements")
+    baseline = subcommands.add_parser("baseline", help="Mark migrations as applied without running them")
+    baseline.add_argument("version", type=int)
+    args = parser.parse_args()
+
+    connection = open_connection()
+    try:
+        runner = MigrationRunner(connection, online=not getattr(args, 'allow_locking', False))
+        if args.command == "status":
+            for entry in runner.status():
+                print(f"{entry['version']:03d} {entry['name'] or '?':45} {entry['state']}")
+        elif args.command == "up":
+            applied = runner.migrate(args.to, args.dry_run)
+            if not args.dry_run:
+                print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+        else:
+            print(f"Recorded {len(runner.baseline(args.version))} migration(s) as applied")
+    finally:
+        connection.close()
@@ -0,0 +1,7 @@
+-- Fingerprint of (user, date, normalized description, amount, occurrence)
+-- used to skip duplicate transactions. Rows inserted by hand keep NULL,
+-- which the unique index allows any number of times.
+-- Migration 003 fingerprints the existing rows.
+ALTER TABLE budget_data
+    ADD COLUMN fingerprint CHAR(40) NULL AFTER description,
+    ADD UNIQUE KEY uq_budget_data_fingerprint (fingerprint);
@@ -0,0 +1,20 @@
+-- Indexes for the per-user dashboard and listing queries.
+-- (user_id, transaction_date) serves WHERE user_id = ? ORDER BY transaction_date
+-- and the per-day summary without a filesort; (user_id, expense_category)
+-- serves the category summary. `month` is a stored generated column so the
+-- monthly summary groups on an index instead of DATE_FORMAT() per row; amount
+-- is in that index so the summary never touches the table rows.
+-- These composite indexes start with user_id, so MySQL drops the index it
+-- created implicitly for the user_id foreign key.
+
+-- MySQL can only add a STORED generated column by copying the table. Reads
+-- continue during the copy but writes wait, so run this off-peak.
+ALTER TABLE budget_data
+    ADD COLUMN month CHAR(7) AS (DATE_FORMAT(transaction_date, '%Y-%m')) STORED AFTER transaction_date,
+    ALGORITHM=COPY, LOCK=SHARED;
+
+-- The indexes build in place while the table stays writable
+ALTER TABLE budget_data
+    ADD INDEX idx_budget_data_user_date (user_id, transaction_date),
+    ADD INDEX idx_budget_data_user_category (user_id, expense_category),
+    ADD INDEX idx_budget_data_user_month (user_id, month, amount);
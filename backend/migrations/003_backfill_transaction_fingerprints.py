@@ -0,0 +1,13 @@
+"""Fingerprint the budget_data rows saved before migration 001 added the column"""
+import os
+
+from fingerprint import backfill_fingerprints
+
+
+def upgrade(connection, progress):
+    backfill_fingerprints(
+        connection,
+        batch_size=int(os.getenv('MIGRATION_BATCH_SIZE', '1000')),
+        progress=progress,
+        pause=float(os.getenv('MIGRATION_BATCH_PAUSE_MS', '0')) / 1000
+    )
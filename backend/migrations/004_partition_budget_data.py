@@ -0,0 +1,51 @@
+"""Range-partition budget_data by month of transaction_date (see partitions.py).
+
+MySQL partitioning rules force three schema changes:
+- every unique key must contain transaction_date. The primary key becomes
+  (id, transaction_date) and the fingerprint key becomes
+  (fingerprint, transaction_date). A fingerprint already encodes the date,
+  so the fingerprint key rejects exactly the same duplicates as before
+- partitioned tables cannot have foreign keys. The user_id foreign key is
+  dropped, and a trigger on users keeps ON DELETE CASCADE
+- partitioning rebuilds the table with ALGORITHM=COPY. Reads continue
+  during the copy but writes wait, so run this off-peak
+"""
+from partitions import existing_partitions, initial_range, partition_by
+
+
+def upgrade(connection, progress):
+    cursor = connection.cursor()
+    try:
+        if existing_partitions(cursor):
+            return
+
+        cursor.execute("""
+            SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+            WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'budget_data'
+        """)
+        for name, in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE budget_data DROP FOREIGN KEY `{name}`, ALGORITHM=INPLACE, LOCK=NONE")
+        progress(1, 3)
+
+        cursor.execute("DROP TRIGGER IF EXISTS users_delete_budget_data")
+        cursor.execute("""
+            CREATE TRIGGER users_delete_budget_data AFTER DELETE ON users
+            FOR EACH ROW DELETE FROM budget_data WHERE user_id = OLD.id
+        """)
+        progress(2, 3)
+
+        cursor.execute("SELECT MIN(transaction_date) FROM budget_data")
+        (earliest,) = cursor.fetchone()
+        first, last = initial_range(earliest)
+        cursor.execute(f"""
+            ALTER TABLE budget_data
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (id, transaction_date),
+                DROP INDEX uq_budget_data_fingerprint,
+                ADD UNIQUE KEY uq_budget_data_fingerprint (fingerprint, transaction_date),
+                ALGORITHM=COPY, LOCK=SHARED
+            {partition_by(first, last)}
+        """)
+        progress(3, 3)
+    finally:
+        cursor.close()
@@ -0,0 +1,34 @@
+-- Per-user rollups read by the dashboard summary (see rollups.py). The
+-- ingest keeps them current in its insert transaction; migration 006 fills
+-- them from the existing rows.
+CREATE TABLE IF NOT EXISTS budget_monthly_rollups (
+    user_id INT NOT NULL,
+    month CHAR(7) NOT NULL,
+    expense_category ENUM(
+        'Food',
+        'Dining',
+        'Transportation',
+        'Utilities',
+        'Shopping',
+        'Entertainment',
+        'Health',
+        'Rent',
+        'Other'
+    ) NOT NULL,
+    transaction_count INT NOT NULL,
+    total_amount DECIMAL(14, 2) NOT NULL,
+    absolute_amount DECIMAL(14, 2) NOT NULL,
+    earliest_date DATE NOT NULL,
+    latest_date DATE NOT NULL,
+    PRIMARY KEY (user_id, month, expense_category),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS budget_daily_rollups (
+    user_id INT NOT NULL,
+    transaction_date DATE NOT NULL,
+    transaction_count INT NOT NULL,
+    total_amount DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (user_id, transaction_date),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
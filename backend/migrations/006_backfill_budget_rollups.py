@@ -0,0 +1,6 @@
+"""Fill the dashboard rollups from the rows already in budget_data"""
+from rollups import rebuild
+
+
+def upgrade(connection, progress):
+    rebuild(connection, progress=progress)
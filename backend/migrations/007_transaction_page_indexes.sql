@@ -0,0 +1,13 @@
+-- Indexes for the keyset-paginated /api/transactions (see transaction_pages.py).
+-- A page is WHERE user_id = ? [AND expense_category = ?] plus a bound on
+-- (transaction_date, id), ORDER BY transaction_date DESC, id DESC LIMIT n.
+-- Both indexes end in transaction_date, id so the page is read in index
+-- order and stops after n rows, with no filesort. amount comes last so an
+-- amount range is checked on the index entry (index condition pushdown)
+-- before the row is read. Each replaces an index it extends, so the
+-- queries that used the old one keep using its prefix.
+ALTER TABLE budget_data
+    DROP INDEX idx_budget_data_user_date,
+    ADD INDEX idx_budget_data_user_date (user_id, transaction_date, id, amount),
+    DROP INDEX idx_budget_data_user_category,
+    ADD INDEX idx_budget_data_user_category (user_id, expense_category, transaction_date, id, amount);
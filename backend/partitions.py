@@ -0,0 +1,192 @@
+"""Monthly RANGE partitions of budget_data on transaction_date.
+
+budget_data is partitioned by RANGE COLUMNS(transaction_date). p_before
+holds everything before the first month, then there is one partition per
+month (pYYYYMM), and p_future (MAXVALUE) catches later dates. A query
+that bounds transaction_date itself (`transaction_date >= '2025-01-01'`,
+not a function of it such as YEAR() or the month column) only reads the
+partitions in that range.
+
+New months are split off p_future by ensure_future_partitions() ahead of
+time, while it is still empty (or holds only the odd future-dated row), so
+the split is cheap. PartitionMaintainer runs it daily in the web app and the
+upload worker (PARTITION_MAINTENANCE=off turns that off); `python
+partitions.py` does the same from cron.
+
+MySQL requires every unique key of a partitioned table to include
+transaction_date and does not allow foreign keys on one; see migration 004.
+"""
+import argparse
+import logging
+import os
+import re
+import threading
+from datetime import date
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TABLE = 'budget_data'
+# Months kept split off p_future beyond the current one
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+# Rows older than this many months share p_before
+PARTITION_HISTORY_MONTHS = int(os.getenv('PARTITION_HISTORY_MONTHS', '120'))
+PARTITION_CHECK_HOURS = float(os.getenv('PARTITION_CHECK_HOURS', '24'))
+LOCK_NAME = 'budgetwise_budget_data_partitions'
+MONTH_PARTITION = re.compile(r'^p(\d{4})(\d{2})$')
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def months_between(first, last):
+    """First days of the months from `first` to `last` inclusive"""
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def month_partitions(first, last):
+    """Definitions of one partition per month from `first` to `last` inclusive"""
+    return [f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1)}')"
+            for month in months_between(first, last)]
+
+
+def partition_by(first, last):
+    """PARTITION BY clause covering the months from `first` to `last`"""
+    definitions = [f"PARTITION p_before VALUES LESS THAN ('{month_start(first)}')"]
+    definitions += month_partitions(first, last)
+    definitions.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+    return "PARTITION BY RANGE COLUMNS(transaction_date) (\n    " + ",\n    ".join(definitions) + "\n)"
+
+
+def initial_range(earliest, today=None, months_ahead=None, history_months=None):
+    """First and last month to create when partitioning a table whose oldest row is `earliest`"""
+    today = today or date.today()
+    months_ahead = PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    history_months = PARTITION_HISTORY_MONTHS if history_months is None else history_months
+    current = month_start(today)
+    first = max(month_start(earliest or today), add_months(current, -history_months))
+    return min(first, current), add_months(current, months_ahead)
+
+
+def existing_partitions(cursor, table=TABLE):
+    """Partition names of `table` in order; empty when it is not partitioned"""
+    cursor.execute("""
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    return [name for name, in cursor.fetchall()]
+
+
+def last_partitioned_month(partitions):
+    months = [date(int(match.group(1)), int(match.group(2)), 1)
+              for match in map(MONTH_PARTITION.match, partitions) if match]
+    return max(months) if months else None
+
+
+def ensure_future_partitions(connection, months_ahead=None, today=None, table=TABLE):
+    """Split months off p_future until the table covers `months_ahead` months past today.
+
+    Returns the names of the partitions created. Does nothing to a table
+    that is not partitioned.
+    """
+    months_ahead = PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    target = add_months(month_start(today or date.today()), months_ahead)
+    cursor = connection.cursor()
+    try:
+        # Several processes run this; one splitting at a time is enough
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))
+        (locked,) = cursor.fetchone()
+        if locked != 1:
+            return []
+        try:
+            partitions = existing_partitions(cursor, table)
+            if 'p_future' not in partitions:
+                return []
+            last = last_partitioned_month(partitions)
+            first = add_months(last, 1) if last else month_start(today or date.today())
+            if first > target:
+                return []
+            cursor.execute(
+                f"ALTER TABLE {table} REORGANIZE PARTITION p_future INTO (\n    "
+                + ",\n    ".join(month_partitions(first, target))
+                + ",\n    PARTITION p_future VALUES LESS THAN (MAXVALUE)\n)"
+            )
+            created = [partition_name(month) for month in months_between(first, target)]
+            logging.info(f"Added {table} partitions {created[0]}..{created[-1]}")
+            return created
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+class PartitionMaintainer:
+    """Background thread that keeps future partitions in place"""
+
+    def __init__(self, connection_factory, interval_hours=None):
+        self.connection_factory = connection_factory
+        self.interval = (interval_hours if interval_hours is not None else PARTITION_CHECK_HOURS) * 3600
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def enabled():
+        return os.getenv('PARTITION_MAINTENANCE', 'on').lower() not in ('off', '0', 'false')
+
+    def run_once(self):
+        try:
+            connection = self.connection_factory()
+            try:
+                return ensure_future_partitions(connection)
+            finally:
+                connection.close()
+        except Exception as e:
+            # Rows still land in p_future, so a failed check is not urgent
+            logging.error(f"Partition maintenance failed: {str(e)}")
+            return []
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='partition-maintainer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+
+if __name__ == "__main__":
+    from database import open_connection
+
+    parser = argparse.ArgumentParser(description="Add upcoming monthly partitions to budget_data")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    connection = open_connection()
+    try:
+        created = ensure_future_partitions(connection, args.months_ahead)
+        print(f"Created {len(created)} partition(s)" if created else "Partitions are up to date")
+    finally:
+        connection.close()
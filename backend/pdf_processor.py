@@ -1,22 +1,93 @@
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import ChatOpenAI
 from langchain.chains import create_extraction_chain
 from langchain.prompts import ChatPromptTemplate
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from datetime import date, datetime
 import os
+import time
 from dotenv import load_dotenv
+from statement_parser import StatementTableParser, row_descriptions, year_in_period
+from merchant_index import normalize_merchant
+from extraction_cache import ExtractionCache
+from pdf_text import PDFTextExtractor
+from statement_scanner import StatementScanner, strip_spans
+from fingerprint import drop_overlap_duplicates
+from bank_profiles import BankProfileRegistry
+from llm_transport import llm_client_options
+from ingestion_metrics import IngestionMetrics, TokenUsageCallback
+from langchain_core.documents import Document
 import json
 
 # Load environment variables
 load_dotenv()
 
+# Pages without parsed rows held back before giving up on the fast path
+MAX_HELD_PAGES = 2
+
+# Dates as the LLM returns them, then forms without a year
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y')
+YEARLESS_DATE_FORMATS = ('%b %d', '%B %d', '%m/%d')
+
+
+def parse_transaction_date(value, period=None):
+    """The date of an extracted row, or None if it cannot be read.
+
+    With the statement `period` (start, end) known, the year comes from it
+    (see year_in_period): the page itself only prints the month and day.
+    Without it a date must carry its own year.
+    """
+    value = str(value or '').strip()
+    # A yearless date is read in a leap year so Feb 29 survives until the real year is known
+    candidates = [(value, fmt) for fmt in DATE_FORMATS]
+    if period:
+        candidates += [(f"2000 {value}", f"%Y {fmt}") for fmt in YEARLESS_DATE_FORMATS]
+    parsed = None
+    for text, fmt in candidates:
+        try:
+            parsed = datetime.strptime(text, fmt).date()
+            break
+        except ValueError:
+            continue
+    if parsed is None or not period:
+        return parsed
+    try:
+        return date(year_in_period(parsed.month, period), parsed.month, parsed.day)
+    except ValueError:
+        # Feb 29 outside a leap year
+        return None
+
+
 class PDFProcessor:
-    def __init__(self):
+    def __init__(self, max_workers=None, table_parser=None, extraction_cache=None, merchant_index=None,
+                 text_extractor=None, profiles=None):
+        # Number of chunks sent to the LLM at the same time (1 = serial)
+        if max_workers is None:
+            max_workers = int(os.getenv('PDF_EXTRACTION_WORKERS', '4'))
+        self.max_workers = max(1, max_workers)
+
+        # Layout-aware parser tried before any LLM call (False disables it)
+        self.table_parser = table_parser if table_parser is not None else StatementTableParser()
+
+        # Persistent per-chunk cache of LLM results (False disables it)
+        self.extraction_cache = extraction_cache if extraction_cache is not None else ExtractionCache()
+
+        # Page text decoding; large statements are decoded on a process pool
+        self.text_extractor = text_extractor or PDFTextExtractor()
+
+        # Known merchant categories, consulted before the LLM (optional, needs the DB)
+        self.merchant_index = merchant_index
+
+        # Per-bank statement formats; unknown formats go to the LLM
+        self.profiles = profiles or BankProfileRegistry()
+
+        # LLM_TRANSPORT_MODE can point this at recordings or a local stand-in
+        self.transport_mode = os.getenv('LLM_TRANSPORT_MODE', 'live')
         self.llm = ChatOpenAI(
             model="gpt-4-turbo-preview",
             temperature=0,
-            api_key=os.getenv('OPENAI_API_KEY')
+            **llm_client_options(self.transport_mode)
         )
         
         # Schema for transaction extraction
@@ -35,117 +106,20 @@ class PDFProcessor:
             "required": ["date", "description", "amount"]
         }
 
+        # Smaller schema for chunks whose merchants are all already categorized
+        self.schema_without_category = {
+            "properties": {
+                key: value for key, value in self.schema["properties"].items()
+                if key not in ("category", "spend_category")
+            },
+            "required": self.schema["required"]
+        }
+
     def process_pdf(self, file_path):
         try:
             print(f"Processing PDF file: {file_path}")
-            # Load PDF
-            loader = PyPDFLoader(file_path)
-            pages = loader.load()
-            
-            # First, extract the statement total from the Spend Report section
-            statement_total = self._extract_statement_total(pages)
-            print(f"Extracted statement total: ${statement_total}")
-            
-            # Split text into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=100
-            )
-            splits = text_splitter.split_documents(pages)
-            
-            all_transactions = []
-            
-            # Process each chunk
-            for i, split in enumerate(splits):
-                print(f"Processing chunk {i+1} of {len(splits)}")
-                
-                # Skip summary sections and payment sections
-                if "Spend Report" in split.page_content and "Total" in split.page_content:
-                    print(f"Skipping summary section in chunk {i+1}")
-                    continue
-                
-                if "Your payments" in split.page_content and "PAYMENT THANK YOU" in split.page_content:
-                    print(f"Skipping payments section in chunk {i+1}")
-                    continue
-                    
-                try:
-                    # Create extraction chain
-                    chain = create_extraction_chain(self.schema, self.llm)
-                    
-                    # Extract transactions from the chunk
-                    result = chain.invoke(split.page_content)
-                    
-                    # Handle the result
-                    if isinstance(result, dict) and 'text' in result:
-                        extracted_items = result.get('text', [])
-                    elif isinstance(result, list):
-                        extracted_items = result
-                    else:
-                        print(f"Unexpected result format: {type(result)}")
-                        continue
+            all_transactions = list(self.iter_transactions(file_path))
 
-                    # Process extracted items
-                    for item in extracted_items:
-                        if not isinstance(item, dict):
-                            print(f"Skipping invalid item format: {type(item)}")
-                            continue
-                            
-                        try:
-                            cleaned_transaction = self._clean_transaction(item)
-                            if cleaned_transaction:
-                                # Skip zero-value transactions
-                                if cleaned_transaction['amount'] == 0:
-                                    print(f"Skipping zero-value transaction: {cleaned_transaction['description']}")
-                                    continue
-                                    
-                                # Skip if this looks like a summary line
-                                if any(summary_term in cleaned_transaction['description'] for summary_term in 
-                                      ["Total", "Spend Categories", "Year-to-date", "Budget", "PAYMENT THANK YOU"]):
-                                    print(f"Skipping summary line: {cleaned_transaction['description']}")
-                                    continue
-                                
-                                all_transactions.append(cleaned_transaction)
-                        except Exception as e:
-                            print(f"Error cleaning transaction: {str(e)}, Item: {item}")
-                            continue
-                            
-                except Exception as e:
-                    print(f"Error processing chunk {i+1}: {str(e)}")
-                    continue
-            
-            # Calculate the total amount from extracted transactions
-            extracted_total = sum(transaction['amount'] for transaction in all_transactions)
-            print(f"Total from extracted transactions: ${extracted_total:.2f}")
-            
-            # Check if we need to add a balancing transaction
-            if statement_total and abs(statement_total - extracted_total) > 0.01:
-                difference = statement_total - extracted_total
-                print(f"Adding balancing transaction of ${difference:.2f} to match statement total")
-                
-                # Determine the most appropriate category for the balancing transaction
-                category_counts = {}
-                for transaction in all_transactions:
-                    category = transaction['expense_category']
-                    if category not in category_counts:
-                        category_counts[category] = 0
-                    category_counts[category] += 1
-                
-                # Use the most common category
-                most_common_category = max(category_counts.items(), key=lambda x: x[1])[0]
-                
-                # Add a balancing transaction
-                balancing_transaction = {
-                    'transaction_date': '2025-01-11',  # Use a date from the statement period
-                    'description': 'Additional transactions to match statement total',
-                    'amount': difference,
-                    'expense_category': most_common_category
-                }
-                all_transactions.append(balancing_transaction)
-                
-                # Recalculate total
-                extracted_total = sum(transaction['amount'] for transaction in all_transactions)
-                print(f"Updated total: ${extracted_total:.2f}")
-            
             print(f"Successfully processed {len(all_transactions)} transactions")
             # Print the first 5 transactions for debugging
             if all_transactions:
@@ -160,67 +134,314 @@ class PDFProcessor:
         except Exception as e:
             print(f"Error processing PDF: {str(e)}")
             return None
+
+    def iter_transactions(self, file_path, metrics=None):
+        """Yield cleaned transactions page by page, in statement order.
+
+        Pages are loaded lazily and LLM chunks run on a bounded thread pool
+        while earlier results are being consumed. The balancing transaction
+        from the statement-total reconciliation, if any, is yielded last.
+        Stage timings and counts are recorded in `metrics` (an
+        IngestionMetrics) when one is given.
+        """
+        metrics = metrics or IngestionMetrics(os.path.basename(file_path))
+        text_splitter = self.make_text_splitter()
+        chains = self.make_chains()
+
+        # Page-ordered queue of (ready transaction list or in-flight future,
+        # text shared with the previous chunk of the same page)
+        queue = deque()
+        previous_chunk = [None]
+        max_in_flight = self.max_workers * 2
+        chunk_counter = [0]
+
+        # Pages with no rows are held until we know whether the parser
+        # recognised the layout; unrecognised layouts fall back to the LLM
+        layout_known = False
+        held_pages = []
+
+        # The bank profile is picked from the first page; one scan per page
+        # then gives both the page layout and the statement header
+        profile = self.profiles.generic
+        scanner = StatementScanner()
+        header = scanner.header
+        parsed_pages = None
+
+        # Running figures for the reconciliation at the end of the stream
+        totals = {'amount': 0, 'count': 0, 'categories': {}, 'last_date': None}
+
+        def queue_llm_page(page, layout):
+            # Once the layout is recognised, pages outside the transaction
+            # sections (disclosures, legal text) never reach the LLM
+            if header.recognized and not layout['has_rows'] and not layout['in_transactions']:
+                print(f"Skipping page {page.metadata.get('page')} with no transactions")
+                metrics.increment('skipped_pages')
+                return
+            # Payment and summary sections are cut out before chunking
+            text = strip_spans(page.page_content, layout['skip_spans'])
+            if not text.strip():
+                metrics.increment('skipped_pages')
+                return
+            metrics.increment('llm_pages')
+            page = Document(page_content=text, metadata=page.metadata)
+            with metrics.stage('split'):
+                splits = text_splitter.split_documents([page])
+            metrics.increment('chunks', len(splits))
+            previous_end = None
+            for split in splits:
+                i = chunk_counter[0]
+                chunk_counter[0] += 1
+                start = split.metadata['start_index']
+                overlap = text[start:previous_end] if previous_end is not None and start < previous_end else None
+                previous_end = start + len(split.page_content)
+                if self.max_workers > 1:
+                    queue.append((executor.submit(self._extract_chunk, chains, i, split, profile, metrics, header.period), overlap))
+                else:
+                    queue.append((self._extract_chunk(chains, i, split, profile, metrics, header.period), overlap))
+
+        def ready(item):
+            return not isinstance(item[0], Future) or item[0].done()
+
+        def drain(limit):
+            # Hand back everything that is ready, blocking only once the
+            # number of queued chunks exceeds the limit
+            while queue and (len(queue) > limit or ready(queue[0])):
+                item, overlap = queue.popleft()
+                if isinstance(item, Future):
+                    with metrics.stage('llm_wait'):
+                        transactions = item.result()
+                else:
+                    transactions = item
+                # Rows in the text two chunks share are extracted by both
+                kept = drop_overlap_duplicates(transactions, previous_chunk[0], overlap,
+                                               profile.table.get('ignore_words', ()))
+                if len(kept) < len(transactions):
+                    metrics.increment('overlap_duplicates', len(transactions) - len(kept))
+                previous_chunk[0] = transactions
+                yield from kept
+
+        def tally(transactions):
+            for transaction in transactions:
+                totals['amount'] += transaction['amount']
+                totals['count'] += 1
+                totals['last_date'] = transaction['transaction_date']
+                category = transaction['expense_category']
+                totals['categories'][category] = totals['categories'].get(category, 0) + 1
+                yield transaction
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pages = metrics.timed('load', self.text_extractor.iter_pages(file_path))
+            for page_index, page in enumerate(pages):
+                metrics.increment('pages')
+                if page_index == 0:
+                    profile = self.profiles.detect(page.page_content)
+                    print(f"Detected statement format: {profile.name}")
+                    scanner = StatementScanner(profile.sections)
+                    header = scanner.header
+                    if self.table_parser and profile.parser == 'table':
+                        parsed_pages = self.table_parser.iter_pages(file_path, profile)
+
+                with metrics.stage('scan'):
+                    layout = scanner.scan_page(page.metadata.get('page', page_index), page.page_content)
+
+                parsed = None
+                if parsed_pages is not None:
+                    try:
+                        with metrics.stage('parse'):
+                            parsed = next(parsed_pages)
+                    except Exception as e:
+                        print(f"Table parser failed, falling back to LLM extraction: {str(e)}")
+                        parsed_pages = None
+
+                if parsed is None or not parsed['confident']:
+                    for held_page in held_pages:
+                        queue_llm_page(*held_page)
+                    held_pages = []
+                    queue_llm_page(page, layout)
+                elif parsed['rows']:
+                    # The parser understands this layout, so pages it saw
+                    # no rows on genuinely have no transactions
+                    layout_known = True
+                    held_pages = []
+                    metrics.increment('parser_pages')
+                    with metrics.stage('clean'):
+                        queue.append((self._clean_items(parsed['rows'], profile, header.period), None))
+                elif not layout_known:
+                    held_pages.append((page, layout))
+                    if len(held_pages) > MAX_HELD_PAGES:
+                        queue_llm_page(*held_pages.pop(0))
+
+                yield from tally(drain(max_in_flight))
+
+            if not layout_known:
+                for held_page in held_pages:
+                    queue_llm_page(*held_page)
+
+            yield from tally(drain(0))
+
+        statement_total = header.total
+        extracted_total = totals['amount']
+        category_counts = totals['categories']
+        if statement_total is None:
+            print("Could not extract statement total from PDF")
+        print(f"Extracted statement total: ${statement_total}")
+        print(f"Total from extracted transactions: ${extracted_total:.2f}")
+        if header.transaction_count is not None and header.transaction_count != totals['count']:
+            print(f"Statement lists {header.transaction_count} transactions, extracted {totals['count']}")
+
+        metrics.increment('transactions', totals['count'])
+
+        # Check if we need to add a balancing transaction
+        balancing = statement_total and category_counts and abs(statement_total - extracted_total) > 0.01
+        metrics.reconcile(statement_total, extracted_total,
+                          statement_total - extracted_total if balancing else None)
+        if balancing:
+            difference = statement_total - extracted_total
+            print(f"Adding balancing transaction of ${difference:.2f} to match statement total")
+
+            # Use the most common category
+            most_common_category = max(category_counts.items(), key=lambda x: x[1])[0]
+
+            # Add a balancing transaction
+            yield {
+                'transaction_date': header.period_start or totals['last_date'],  # Date it within the statement period
+                'description': 'Additional transactions to match statement total',
+                'amount': difference,
+                'expense_category': most_common_category
+            }
             
-    def _clean_transaction(self, transaction):
-        """Clean and validate a transaction"""
+    def make_text_splitter(self):
+        """Splitter for LLM chunks; start offsets let overlapping rows be matched up"""
+        return RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=100,
+            add_start_index=True
+        )
+
+    def make_chains(self):
+        """Extraction chains with and without the category fields"""
+        return {
+            'full': create_extraction_chain(self.schema, self.llm),
+            'without_category': create_extraction_chain(self.schema_without_category, self.llm)
+        }
+
+    def _extract_chunk(self, chains, i, split, profile=None, metrics=None, period=None):
+        """Run the extraction chain on one chunk and return its cleaned transactions"""
+        print(f"Processing chunk {i+1}")
+        metrics = metrics or IngestionMetrics()
+        started = time.perf_counter()
+        transactions = []
+
+        try:
+            # If every merchant in the chunk is already known the LLM does
+            # not need to categorize anything
+            schema, chain = self.schema, chains['full']
+            if self.merchant_index:
+                descriptions = row_descriptions(split.page_content,
+                                                (profile.table if profile else {}).get('ignore_words', ()))
+                known = self.merchant_index.lookup_many(descriptions)
+                if descriptions and all(normalize_merchant(d) in known for d in descriptions):
+                    schema, chain = self.schema_without_category, chains['without_category']
+                    metrics.increment('categorization_skipped')
+
+            # Chunks seen before (re-uploads, retries) skip the LLM entirely
+            cache_key = None
+            extracted_items = None
+            if self.extraction_cache:
+                cache_key = self.extraction_cache.make_key(
+                    split.page_content, schema, self.llm.model_name, self.transport_mode)
+                extracted_items = self.extraction_cache.get(cache_key)
+                if extracted_items is not None:
+                    print(f"Using cached extraction for chunk {i+1}")
+                    metrics.increment('cache_hits')
+
+            if extracted_items is None:
+                # Extract transactions from the chunk
+                with metrics.stage('llm'):
+                    result = chain.invoke(split.page_content,
+                                          config={'callbacks': [TokenUsageCallback(metrics)]})
+
+                # Handle the result
+                if isinstance(result, dict) and 'text' in result:
+                    extracted_items = result.get('text', [])
+                elif isinstance(result, list):
+                    extracted_items = result
+                else:
+                    print(f"Unexpected result format: {type(result)}")
+                    metrics.increment('chunk_errors')
+                    return transactions
+
+                if cache_key:
+                    self.extraction_cache.set(cache_key, extracted_items)
+
+            with metrics.stage('clean'):
+                transactions = self._clean_items(extracted_items, profile, period)
+
+        except Exception as e:
+            print(f"Error processing chunk {i+1}: {str(e)}")
+            metrics.increment('chunk_errors')
+
+        finally:
+            metrics.add_time('extract', time.perf_counter() - started)
+
+        return transactions
+
+    def _clean_items(self, extracted_items, profile=None, period=None):
+        """Clean raw extracted items and drop zero-value and summary lines.
+
+        `period` is the statement's (start, end) dates when known; rows take
+        their year from it.
+        """
+        profile = profile or self.profiles.generic
+        # One index lookup for the merchants the statement does not categorize
+        known = {}
+        if self.merchant_index:
+            known = self.merchant_index.lookup_many([
+                profile.strip_ignored(str(item.get('description') or '')) for item in extracted_items
+                if isinstance(item, dict) and not profile.map_category(str(item.get('spend_category') or '').strip())
+            ])
+
+        transactions = []
+        for item in extracted_items:
+            if not isinstance(item, dict):
+                print(f"Skipping invalid item format: {type(item)}")
+                continue
+
+            try:
+                cleaned_transaction = self._clean_transaction(item, profile, known, period)
+                if cleaned_transaction:
+                    # Skip zero-value transactions
+                    if cleaned_transaction['amount'] == 0:
+                        print(f"Skipping zero-value transaction: {cleaned_transaction['description']}")
+                        continue
+
+                    transactions.append(cleaned_transaction)
+            except Exception as e:
+                print(f"Error cleaning transaction: {str(e)}, Item: {item}")
+                continue
+        return transactions
+
+    def _clean_transaction(self, transaction, profile=None, known=None, period=None):
+        """Clean and validate a transaction.
+
+        `known` is the merchant index's answer for the batch
+        ({merchant_key: category}, see _clean_items). The category comes
+        from the statement when the profile maps its spend category, then
+        from the index, then from the LLM; "category_source" records which.
+        """
+        profile = profile or self.profiles.generic
         try:
             if not isinstance(transaction, dict):
                 print(f"Invalid transaction format: {type(transaction)}")
                 return None
 
-            # Validate date format
-            date_str = transaction.get('date')
-            if not date_str:
-                print("Missing date")
+            # Rows whose date cannot be read are dropped, never given one
+            transaction_date = parse_transaction_date(transaction.get('date'), period)
+            if transaction_date is None:
+                print(f"Invalid date: {transaction.get('date')}")
                 return None
-                
-            # Ensure date is in YYYY-MM-DD format
-            try:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                # Force year to 2025 if it's not already
-                if date_obj.year != 2025:
-                    date_str = date_str.replace(str(date_obj.year), '2025')
-            except ValueError:
-                # Try to parse other common formats
-                try:
-                    if '/' in date_str:
-                        parts = date_str.split('/')
-                        if len(parts) == 3:
-                            month, day, year = parts
-                            # Force year to be 2025
-                            year = '2025'
-                            date_obj = datetime.strptime(f"{year}-{month}-{day}", '%Y-%m-%d')
-                            date_str = date_obj.strftime('%Y-%m-%d')
-                    elif '-' in date_str:
-                        parts = date_str.split('-')
-                        if len(parts) == 3:
-                            year, month, day = parts
-                            # Force year to be 2025
-                            year = '2025'
-                            date_obj = datetime.strptime(f"{year}-{month}-{day}", '%Y-%m-%d')
-                            date_str = date_obj.strftime('%Y-%m-%d')
-                    else:
-                        # Try to extract month and day
-                        if "Jan" in date_str:
-                            month = "01"
-                        elif "Feb" in date_str:
-                            month = "02"
-                        else:
-                            month = "01"  # Default to January
-                            
-                        # Try to extract day
-                        import re
-                        day_match = re.search(r'\d{1,2}', date_str)
-                        if day_match:
-                            day = day_match.group().zfill(2)
-                        else:
-                            day = "01"  # Default to 1st
-                            
-                        date_str = f"2025-{month}-{day}"
-                except:
-                    print(f"Invalid date format: {date_str}, defaulting to 2025-01-01")
-                    date_str = "2025-01-01"
-            
+            date_str = transaction_date.isoformat()
+
             # Clean amount
             amount = transaction.get('amount')
             if not isinstance(amount, (int, float)):
@@ -233,31 +454,24 @@ class PDFProcessor:
                     return None
             
             # Skip transactions that look like summaries
-            description = transaction.get('description', '').strip()
-            if any(keyword in description.lower() for keyword in 
-                  ['total', 'summary', 'spend categories', 'year-to-date', 'budget', 'payment thank you']):
+            description = profile.strip_ignored(transaction.get('description', ''))
+            if profile.is_summary(description):
                 print(f"Skipping summary line: {description}")
                 return None
             
-            # Map spend categories to our categories
+            # Map spend categories to our categories using the bank profile
             spend_category = transaction.get('spend_category', '').strip()
-            category = transaction.get('category', 'Other')
-            
-            if spend_category:
-                if "Restaurants" in spend_category:
-                    category = "Dining"
-                elif "Retail and Grocery" in spend_category:
-                    category = "Shopping"
-                elif "Transportation" in spend_category:
-                    category = "Transportation"
-                elif "Hotel, Entertainment and Recreation" in spend_category:
-                    category = "Entertainment"
-                elif "Health and Education" in spend_category:
-                    category = "Health"
-                elif "Professional and Financial Services" in spend_category:
-                    category = "Other"
-                elif "Personal and Household Expenses" in spend_category:
-                    category = "Other"
+            mapped_category = profile.map_category(spend_category)
+            known_category = (known or {}).get(normalize_merchant(description))
+
+            # The statement's own category is a fact; a merchant we have
+            # already confirmed wins over any guess
+            if mapped_category:
+                category, category_source = mapped_category, 'statement'
+            elif known_category:
+                category, category_source = known_category, 'merchant_index'
+            else:
+                category, category_source = transaction.get('category', 'Other'), 'llm'
             
             # Validate category
             valid_categories = ["Food", "Dining", "Transportation", "Utilities", 
@@ -271,59 +485,11 @@ class PDFProcessor:
                 'transaction_date': date_str,
                 'description': description,
                 'amount': amount,
-                'expense_category': category
+                'expense_category': category,
+                'category_source': category_source
             }
             
         except Exception as e:
             print(f"Error cleaning transaction: {str(e)}")
             print(f"Transaction data: {transaction}")
             return None
-
-    def _extract_statement_total(self, pages):
-        """Extract the total amount from the statement's Spend Report section"""
-        try:
-            for page in pages:
-                content = page.page_content
-                if "Spend Report" in content and "Total" in content:
-                    # Look for the total amount pattern
-                    import re
-                    # Pattern to match "Total X Y,YYY.YY" where X is the transaction count and Y,YYY.YY is the amount
-                    total_pattern = r"Total\s+\d+\s+([\d,]+\.\d{2})"
-                    match = re.search(total_pattern, content)
-                    if match:
-                        total_str = match.group(1).replace(',', '')
-                        return float(total_str)
-                        
-                    # Alternative pattern if the above doesn't match
-                    alt_pattern = r"Total.*?(\d+,\d+\.\d{2})"
-                    match = re.search(alt_pattern, content)
-                    if match:
-                        total_str = match.group(1).replace(',', '')
-                        return float(total_str)
-            
-            # If we couldn't find the total, try a different approach
-            for page in pages:
-                content = page.page_content
-                if "Spend Report" in content:
-                    lines = content.split('\n')
-                    for i, line in enumerate(lines):
-                        if "Total" in line and i < len(lines) - 1:
-                            # Look for numbers in this line or the next
-                            amount_pattern = r"(\d+,\d+\.\d{2}|\d+\.\d{2})"
-                            match = re.search(amount_pattern, line)
-                            if match:
-                                total_str = match.group(1).replace(',', '')
-                                return float(total_str)
-                            
-                            # Check next line
-                            match = re.search(amount_pattern, lines[i+1])
-                            if match:
-                                total_str = match.group(1).replace(',', '')
-                                return float(total_str)
-            
-            print("Could not extract statement total from PDF")
-            return None
-            
-        except Exception as e:
-            print(f"Error extracting statement total: {str(e)}")
-            return None 
\ No newline at end of file
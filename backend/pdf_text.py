@@ -0,0 +1,174 @@
+import argparse
+import json
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+load_dotenv()
+
+
+# Backends. Each takes a file path and a page range and returns the page
+# texts; they are plain module-level functions so a process pool can run them.
+
+def _pypdf_page_count(file_path):
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def _pypdf_extract(file_path, start, end):
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text(extraction_mode="plain") for i in range(start, end)]
+
+
+def _mmap_page_count(file_path):
+    from pypdf import PdfReader
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return len(PdfReader(mapped).pages)
+
+
+def _mmap_extract(file_path, start, end):
+    # The OS pages the file in on demand and shares it between workers
+    from pypdf import PdfReader
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = PdfReader(mapped)
+        return [reader.pages[i].extract_text(extraction_mode="plain") for i in range(start, end)]
+
+
+def _pdfplumber_page_count(file_path):
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def _pdfplumber_extract(file_path, start, end):
+    import pdfplumber
+    texts = []
+    with pdfplumber.open(file_path) as pdf:
+        for i in range(start, end):
+            page = pdf.pages[i]
+            texts.append(page.extract_text() or '')
+            page.close()
+    return texts
+
+
+BACKENDS = {
+    'pypdf': (_pypdf_page_count, _pypdf_extract),
+    'mmap': (_mmap_page_count, _mmap_extract),
+    'pdfplumber': (_pdfplumber_page_count, _pdfplumber_extract),
+}
+
+
+class PDFTextExtractor:
+    """Page text extraction with interchangeable backends.
+
+    Small statements are decoded in-process a few pages at a time. Large ones
+    are split into page ranges that are decoded on a process pool, so
+    multi-hundred-page exports use every core. Pages always come back in
+    order as langchain Documents, like PyPDFLoader produces.
+    """
+
+    def __init__(self, backend=None, workers=None, pages_per_task=None, parallel_min_pages=None):
+        self.backend = backend or os.getenv('PDF_TEXT_BACKEND', 'pypdf')
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown PDF text backend: {self.backend}")
+        self.workers = workers if workers is not None else int(
+            os.getenv('PDF_TEXT_WORKERS', str(os.cpu_count() or 1)))
+        self.pages_per_task = pages_per_task or int(os.getenv('PDF_TEXT_PAGES_PER_TASK', '8'))
+        self.parallel_min_pages = parallel_min_pages or int(os.getenv('PDF_TEXT_PARALLEL_MIN_PAGES', '24'))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        # Upload worker threads share one extractor; only the first may start the pool
+        with self._pool_lock:
+            # Spawned (not forked) workers are safe to start from a threaded server
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def iter_pages(self, file_path):
+        """Yield one Document per page, in page order"""
+        page_count_fn, extract_fn = BACKENDS[self.backend]
+        page_count = page_count_fn(file_path)
+        ranges = [(start, min(start + self.pages_per_task, page_count))
+                  for start in range(0, page_count, self.pages_per_task)]
+
+        if self.workers > 1 and page_count >= self.parallel_min_pages:
+            pool = self._get_pool()
+            # Keep a bounded number of ranges in flight so memory stays flat
+            pending = deque()
+            for start, end in ranges:
+                pending.append((start, pool.submit(extract_fn, file_path, start, end)))
+                if len(pending) >= self.workers * 2:
+                    yield from self._documents(file_path, *self._result(pending.popleft()))
+            while pending:
+                yield from self._documents(file_path, *self._result(pending.popleft()))
+        else:
+            for start, end in ranges:
+                yield from self._documents(file_path, start, extract_fn(file_path, start, end))
+
+    def _result(self, item):
+        start, future = item
+        return start, future.result()
+
+    def _documents(self, file_path, start, texts):
+        for offset, text in enumerate(texts):
+            yield Document(page_content=text, metadata={"source": file_path, "page": start + offset})
+
+
+def benchmark(file_path, backends=None, workers=None, repeat=3, pages_per_task=None):
+    """Time each backend on a file, serially and on a process pool"""
+    results = {}
+    for backend in backends or BACKENDS:
+        for mode, mode_workers in (('serial', 1), ('parallel', workers or os.cpu_count() or 1)):
+            extractor = PDFTextExtractor(backend=backend, workers=mode_workers,
+                                         pages_per_task=pages_per_task, parallel_min_pages=1)
+            try:
+                # Warm-up run starts the pool and fills the OS page cache
+                pages = sum(1 for _ in extractor.iter_pages(file_path))
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    for _ in extractor.iter_pages(file_path):
+                        pass
+                    timings.append(time.perf_counter() - started)
+            finally:
+                extractor.shutdown()
+            best = min(timings)
+            results[f"{backend}/{mode}"] = {
+                'pages': pages,
+                'workers': mode_workers,
+                'best_seconds': round(best, 4),
+                'pages_per_second': round(pages / best, 1) if best else None
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction backends")
+    parser.add_argument("files", nargs="+", help="Statement PDFs to benchmark")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="Limit to these backends")
+    parser.add_argument("--workers", type=int, help="Process pool size for the parallel runs")
+    parser.add_argument("--pages-per-task", type=int, help="Pages decoded per pool task")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {path: benchmark(path, args.backend, args.workers, args.repeat, args.pages_per_task)
+              for path in args.files}
+    print(json.dumps(report, indent=2))
@@ -1,6 +1,8 @@
 USE BudgetWise;
 -- Delete all transactions but keep user accounts
 DELETE FROM budget_data;
+DELETE FROM budget_monthly_rollups;
+DELETE FROM budget_daily_rollups;
 -- Reset auto-increment counter
 ALTER TABLE budget_data AUTO_INCREMENT = 1;
 -- Delete all users but keep user accounts
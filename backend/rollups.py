@@ -0,0 +1,174 @@
+"""Per-user rollups of budget_data for the dashboard summary.
+
+budget_monthly_rollups has one row per user, month and category: the count,
+sum, sum of absolute amounts and first and last date. budget_daily_rollups
+has one row per user and day: the count and sum. The ingest adds what it
+inserts in the same transaction (apply_inserted), so the summary reads a
+few dozen rows per user however long the history grows.
+
+Writers lock the user's row in users (lock_user) before they touch the
+rollups, so two uploads for one user cannot interleave their updates; a
+streamed upload takes the lock only after extraction, just before it
+commits. `python rollups.py --rebuild`
+recomputes everything from budget_data.
+"""
+import argparse
+import logging
+from decimal import Decimal
+from dotenv import load_dotenv
+
+from database import bulk_insert
+
+load_dotenv()
+
+MONTHLY = 'budget_monthly_rollups'
+DAILY = 'budget_daily_rollups'
+MONTHLY_COLUMNS = ('user_id', 'month', 'expense_category', 'transaction_count', 'total_amount',
+                   'absolute_amount', 'earliest_date', 'latest_date')
+DAILY_COLUMNS = ('user_id', 'transaction_date', 'transaction_count', 'total_amount')
+ADD_MONTHLY = ("transaction_count = transaction_count + VALUES(transaction_count), "
+               "total_amount = total_amount + VALUES(total_amount), "
+               "absolute_amount = absolute_amount + VALUES(absolute_amount), "
+               "earliest_date = LEAST(earliest_date, VALUES(earliest_date)), "
+               "latest_date = GREATEST(latest_date, VALUES(latest_date))")
+ADD_DAILY = ("transaction_count = transaction_count + VALUES(transaction_count), "
+             "total_amount = total_amount + VALUES(total_amount)")
+CENT = Decimal('0.01')
+
+
+def lock_user(cursor, user_id):
+    """Hold the user's row until the transaction ends; serializes their rollup writers"""
+    cursor.execute("SELECT id FROM users WHERE id = %s FOR UPDATE", (user_id,))
+    cursor.fetchall()
+
+
+def rollup_deltas(columns, rows):
+    """Monthly and daily rollup rows for budget_data rows laid out as `columns`"""
+    user = columns.index('user_id')
+    category = columns.index('expense_category')
+    amount = columns.index('amount')
+    date = columns.index('transaction_date')
+    monthly = {}
+    daily = {}
+    for row in rows:
+        day = str(row[date])[:10]
+        value = Decimal(str(row[amount])).quantize(CENT)
+        month_entry = monthly.setdefault((row[user], day[:7], row[category]), [0, Decimal(0), Decimal(0), day, day])
+        month_entry[0] += 1
+        month_entry[1] += value
+        month_entry[2] += abs(value)
+        month_entry[3] = min(month_entry[3], day)
+        month_entry[4] = max(month_entry[4], day)
+        day_entry = daily.setdefault((row[user], day), [0, Decimal(0)])
+        day_entry[0] += 1
+        day_entry[1] += value
+    return ([key + tuple(values) for key, values in sorted(monthly.items())],
+            [key + tuple(values) for key, values in sorted(daily.items())])
+
+
+def apply_inserted(cursor, columns, rows, inserted):
+    """Add rows just inserted into budget_data to the rollups, in the caller's transaction.
+
+    When the insert skipped some rows as duplicates there is no telling
+    which, so the months the rows fall in are recomputed from budget_data
+    instead; the transaction sees its own inserts.
+    """
+    if not inserted:
+        return
+    if inserted == len(rows):
+        monthly, daily = rollup_deltas(columns, rows)
+        # Always multi-row INSERTs: LOAD DATA would ignore the rows to add up
+        bulk_insert(cursor, MONTHLY, MONTHLY_COLUMNS, monthly, on_duplicate=ADD_MONTHLY, load_min_rows=0)
+        bulk_insert(cursor, DAILY, DAILY_COLUMNS, daily, on_duplicate=ADD_DAILY, load_min_rows=0)
+        return
+    user = columns.index('user_id')
+    date = columns.index('transaction_date')
+    months = {}
+    for row in rows:
+        months.setdefault(row[user], set()).add(str(row[date])[:7])
+    for user_id, user_months in months.items():
+        refresh_months(cursor, user_id, min(user_months), max(user_months))
+
+
+def _month_after(month):
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}-01"
+
+
+def refresh_months(cursor, user_id, first_month, last_month):
+    """Recompute one user's rollups for the months `first_month`..`last_month` (YYYY-MM)"""
+    start, end = f"{first_month}-01", _month_after(last_month)
+    cursor.execute(f"DELETE FROM {MONTHLY} WHERE user_id = %s AND month >= %s AND month <= %s",
+                   (user_id, first_month, last_month))
+    cursor.execute(f"DELETE FROM {DAILY} WHERE user_id = %s AND transaction_date >= %s AND transaction_date < %s",
+                   (user_id, start, end))
+    _insert_from_budget_data(cursor, "user_id = %s AND transaction_date >= %s AND transaction_date < %s",
+                             (user_id, start, end))
+
+
+def _insert_from_budget_data(cursor, condition, params):
+    cursor.execute(f"""
+        INSERT INTO {MONTHLY} ({', '.join(MONTHLY_COLUMNS)})
+        SELECT user_id, month, expense_category, COUNT(*), SUM(amount), SUM(ABS(amount)),
+               MIN(transaction_date), MAX(transaction_date)
+        FROM budget_data WHERE {condition}
+        GROUP BY user_id, month, expense_category
+    """, params)
+    cursor.execute(f"""
+        INSERT INTO {DAILY} ({', '.join(DAILY_COLUMNS)})
+        SELECT user_id, transaction_date, COUNT(*), SUM(amount)
+        FROM budget_data WHERE {condition}
+        GROUP BY user_id, transaction_date
+    """, params)
+
+
+def rebuild(connection, user_ids=None, batch_size=100, progress=None):
+    """Recompute the rollups of the given users (default: everyone) from budget_data.
+
+    Users are done `batch_size` at a time, each batch in its own
+    transaction with their rows in users locked. Returns the users rebuilt.
+    """
+    cursor = connection.cursor()
+    try:
+        if user_ids is None:
+            cursor.execute("SELECT id FROM users ORDER BY id")
+            user_ids = [user_id for user_id, in cursor.fetchall()]
+        for start in range(0, len(user_ids), batch_size):
+            batch = list(user_ids[start:start + batch_size])
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"SELECT id FROM users WHERE id IN ({placeholders}) FOR UPDATE", batch)
+            cursor.fetchall()
+            cursor.execute(f"DELETE FROM {MONTHLY} WHERE user_id IN ({placeholders})", batch)
+            cursor.execute(f"DELETE FROM {DAILY} WHERE user_id IN ({placeholders})", batch)
+            _insert_from_budget_data(cursor, f"user_id IN ({placeholders})", batch)
+            connection.commit()
+            if progress:
+                progress(start + len(batch), len(user_ids))
+        return len(user_ids)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    from database import open_connection
+
+    parser = argparse.ArgumentParser(description="Dashboard rollup maintenance")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the rollups from budget_data")
+    parser.add_argument("--user-id", type=int, action="append", help="Only this user (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=100, help="Users per transaction")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        logging.basicConfig(level=logging.INFO)
+        connection = open_connection()
+        try:
+            rebuilt = rebuild(connection, args.user_id, args.batch_size,
+                              progress=lambda done, total: logging.info(f"Rebuilt {done}/{total} users"))
+            logging.info(f"Rebuilt rollups of {rebuilt} users")
+        finally:
+            connection.close()
+    else:
+        parser.print_help()
@@ -0,0 +1,271 @@
+"""Synthetic credit card statements in the layout of onlineStatement.pdf.
+
+    python statement_generator.py out.pdf --pages 20 --per-page 40 --seed 7
+
+Produces a text-only PDF with the account summary page, the payments and
+"new charges and credits" tables and the Spend Report, so every stage of
+the ingestion pipeline (text extraction, table parser, scanner, LLM
+fallback) sees the same structure as a real upload. No PDF library is
+needed; the file is written directly with the standard Helvetica font.
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+ROW_HEIGHT = 12
+MAX_ROWS_PER_PAGE = 50
+
+# Column positions of the transaction table
+DATE_X = 40
+POST_DATE_X = 80
+DESCRIPTION_X = 125
+CATEGORY_X = 355
+AMOUNT_RIGHT_X = 572
+
+ACCOUNT = "4525 XXXX XXXX 5351"
+
+MERCHANTS = [
+    ("TIM HORTONS #4321 CALGARY AB", "Restaurants"),
+    ("UBER CANADA/UBEREATS TORONTO ON", "Restaurants"),
+    ("STARBUCKS #123 CALGARY AB", "Restaurants"),
+    ("A&W #1055 CALGARY AB", "Restaurants"),
+    ("FRESHCO #8966 CALGARY AB", "Retail and Grocery"),
+    ("SAFEWAY #8831 CALGARY AB", "Retail and Grocery"),
+    ("AMAZON.CA AMAZON.CA ON", "Retail and Grocery"),
+    ("7-ELEVEN 42105 CALGARY AB", "Retail and Grocery"),
+    ("SHELL C12345 CALGARY AB", "Transportation"),
+    ("CALGARY TRANSIT CALGARY AB", "Transportation"),
+    ("CINEPLEX #9 CALGARY AB", "Hotel, Entertainment and Recreation"),
+    ("SPOTIFY P1234 STOCKHOLM SE", "Hotel, Entertainment and Recreation"),
+    ("SHOPPERS DRUG MART #2 CALGARY AB", "Health and Education"),
+    ("ENMAX CALGARY AB", "Professional and Financial Services"),
+    ("DOLLARAMA #104 CALGARY AB", "Personal and Household Expenses"),
+]
+
+# Helvetica advance widths (per 1000 units) for right-aligning amounts
+_DIGIT_WIDTHS = {'.': 278, ',': 278, '-': 333, '$': 556}
+
+
+def _text_width(text, size):
+    return sum(_DIGIT_WIDTHS.get(char, 556) for char in text) * size / 1000
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _money(amount):
+    return f"{amount:,.2f}"
+
+
+class _Page:
+    """Text items of one page, laid out from the top like pdfplumber sees them"""
+
+    def __init__(self):
+        self.items = []
+        self.top = 40
+
+    def text(self, x, text, size=8, top=None):
+        self.items.append((x, self.top if top is None else top, size, text))
+
+    def right(self, right_x, text, size=8):
+        self.text(right_x - _text_width(text, size), text, size)
+
+    def line(self, x, text, size=8):
+        self.text(x, text, size)
+        self.newline(size)
+
+    def newline(self, size=8):
+        self.top += max(ROW_HEIGHT, size + 4)
+
+    def stream(self):
+        commands = []
+        for x, top, size, text in self.items:
+            y = PAGE_HEIGHT - top - size
+            commands.append(f"BT /F1 {size} Tf 1 0 0 1 {x:.2f} {y:.2f} Tm ({_escape(text)}) Tj ET")
+        return "\n".join(commands).encode('latin-1')
+
+
+def _write_pdf(path, pages):
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for page in pages:
+        content = page.stream()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % (PAGE_WIDTH, PAGE_HEIGHT, content_id)
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def _transactions(count, period_start, period_days, rng):
+    rows = []
+    for _ in range(count):
+        description, spend_category = rng.choice(MERCHANTS)
+        amount = round(rng.lognormvariate(2.6, 0.9), 2)
+        # A few refunds, printed as negative amounts
+        if rng.random() < 0.02:
+            amount = -amount
+        rows.append({
+            'date': period_start + timedelta(days=rng.randrange(period_days)),
+            'description': description,
+            'spend_category': spend_category,
+            'amount': max(amount, 0.5) if amount > 0 else amount
+        })
+    rows.sort(key=lambda row: row['date'])
+    return rows
+
+
+def _row(page, row):
+    trans_date = row['date']
+    post_date = trans_date + timedelta(days=1)
+    page.text(DATE_X, trans_date.strftime('%b %d'))
+    page.text(POST_DATE_X, post_date.strftime('%b %d'))
+    page.text(DESCRIPTION_X, row['description'])
+    page.text(CATEGORY_X, row['spend_category'])
+    page.right(AMOUNT_RIGHT_X, _money(row['amount']))
+    page.newline()
+
+
+def _table_header(page, with_category=True):
+    page.text(DATE_X, "Trans")
+    page.text(POST_DATE_X, "Post")
+    page.newline()
+    page.text(DATE_X, "date")
+    page.text(POST_DATE_X, "date")
+    page.text(DESCRIPTION_X, "Description")
+    if with_category:
+        page.text(CATEGORY_X, "Spend Categories")
+    page.right(AMOUNT_RIGHT_X, "Amount($)")
+    page.newline()
+
+
+def generate_statement(path, pages=4, transactions_per_page=30, seed=0, year=2025):
+    """Write a statement PDF and return what it contains.
+
+    `pages` counts every page: the account summary, at least one page of
+    transactions and the Spend Report. Returns a dict with the page count,
+    the transactions (ISO dates) and their total.
+    """
+    pages = max(3, pages)
+    per_page = max(1, min(transactions_per_page, MAX_ROWS_PER_PAGE))
+    rng = random.Random(seed)
+    period_start = date(year, 1, 11)
+    period_end = date(year, 2, 10)
+    period_days = (period_end - period_start).days + 1
+    period_text = f"{period_start:%B} {period_start.day} to {period_end:%B} {period_end.day}, {year}"
+
+    transaction_pages = pages - 2
+    # The first transaction page also carries the payments table
+    first_capacity = max(1, per_page - 8)
+    charges = _transactions(first_capacity + per_page * (transaction_pages - 1), period_start, period_days, rng)
+    total = round(sum(row['amount'] for row in charges), 2)
+    payments = [round(rng.uniform(200, 600), 2) for _ in range(2)]
+
+    # Page 1: account summary
+    summary = _Page()
+    summary.line(40, "Your account at a glance", 11)
+    summary.line(40, f"Previous balance ${_money(sum(payments))}")
+    summary.line(40, f"Payments ${_money(sum(payments))}")
+    summary.line(40, f"Purchases {_money(total)}")
+    summary.line(40, f"Total charges + ${_money(total)}")
+    summary.line(40, f"Account number {ACCOUNT}")
+    summary.line(40, f"{period_end:%B} statement period")
+    summary.line(40, period_text)
+    summary.line(40, "Simplii Financial")
+    summary.line(40, "Cash Back Visa")
+    summary.line(40, f"Page 1 of {pages}")
+    output = [summary]
+
+    # Transaction pages
+    remaining = list(charges)
+    for index in range(transaction_pages):
+        page = _Page()
+        page.line(40, f"Prepared for: MR SAMPLE CUSTOMER {period_text} Account number: {ACCOUNT}")
+        capacity = per_page
+        if index == 0:
+            page.line(40, f"Transactions from {period_text}")
+            page.line(40, "Your payments", 10)
+            _table_header(page, with_category=False)
+            for i, amount in enumerate(payments):
+                paid = period_start + timedelta(days=5 + i * 14)
+                page.text(DATE_X, paid.strftime('%b %d'))
+                page.text(POST_DATE_X, (paid + timedelta(days=1)).strftime('%b %d'))
+                page.text(DESCRIPTION_X, "PAYMENT THANK YOU/PAIEMENT MERCI")
+                page.right(AMOUNT_RIGHT_X, _money(amount))
+                page.newline()
+            page.line(40, f"Total payments ${_money(sum(payments))}")
+            page.line(40, "Your new charges and credits", 10)
+            capacity = first_capacity
+        else:
+            page.line(40, "Your new charges and credits (continued)", 10)
+        _table_header(page)
+        for row in remaining[:capacity]:
+            _row(page, row)
+        remaining = remaining[capacity:]
+        if index == transaction_pages - 1:
+            page.line(40, f"Total for {ACCOUNT} ${_money(total)}")
+        page.line(40, f"Page {index + 2} of {pages}")
+        output.append(page)
+
+    # Last page: Spend Report
+    report = _Page()
+    report.line(40, f"Prepared for: MR SAMPLE CUSTOMER {period_text} Account number: {ACCOUNT}")
+    report.line(40, "Spend Report", 10)
+    report.line(40, "Spend Categories Transactions Amount")
+    by_category = {}
+    for row in charges:
+        count, amount = by_category.get(row['spend_category'], (0, 0))
+        by_category[row['spend_category']] = (count + 1, amount + row['amount'])
+    for category, (count, amount) in sorted(by_category.items()):
+        report.line(40, f"{category} {count} {_money(amount)}")
+    report.line(40, f"Total {len(charges)} {_money(total)}")
+    report.line(40, f"Page {pages} of {pages}")
+    output.append(report)
+
+    _write_pdf(path, output)
+    return {
+        'pages': pages,
+        'total': total,
+        'transactions': [
+            {'transaction_date': row['date'].isoformat(), 'description': row['description'],
+             'amount': row['amount'], 'spend_category': row['spend_category']}
+            for row in charges
+        ]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic statement PDF")
+    parser.add_argument("output", help="Path of the PDF to write")
+    parser.add_argument("--pages", type=int, default=4, help="Total pages, including summary and Spend Report")
+    parser.add_argument("--per-page", type=int, default=30, help=f"Transactions per page (max {MAX_ROWS_PER_PAGE})")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    contents = generate_statement(args.output, args.pages, args.per_page, args.seed)
+    print(json.dumps({'output': args.output, 'pages': contents['pages'],
+                      'transactions': len(contents['transactions']), 'total': contents['total']}))
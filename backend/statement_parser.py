@@ -0,0 +1,311 @@
+import re
+from datetime import date
+
+import pdfplumber
+
+# Precompiled patterns shared by every page
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+MONTH_TOKEN = re.compile(r'^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?$', re.IGNORECASE)
+DAY_TOKEN = re.compile(r'^\d{1,2}$')
+AMOUNT_TOKEN = re.compile(r'^(-)?\$?((?:\d{1,3}(?:,\d{3})+|\d+)\.\d{2})(CR)?$')
+ROW_START = re.compile(r'^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? \d{1,2}\b', re.IGNORECASE)
+TEXT_ROW = re.compile(
+    r'^(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? \d{1,2}'
+    r'(?: (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? \d{1,2})?'
+    r' (?P<description>.+?)(?: -?\$?[\d,]+\.\d{2})?\s*$',
+    re.IGNORECASE | re.MULTILINE
+)
+STATEMENT_PERIOD = re.compile(
+    r'([A-Z][a-z]+)\s+(\d{1,2})\s+to\s+([A-Z][a-z]+)\s+(\d{1,2}),\s*(\d{4})'
+)
+
+def statement_period(match):
+    """(start, end) dates of a STATEMENT_PERIOD match, or None if they are not real dates.
+
+    Only the end date carries a year; "December 11 to January 10, 2025"
+    starts in the previous year.
+    """
+    start_month = MONTHS.get(match.group(1)[:3].lower())
+    end_month = MONTHS.get(match.group(3)[:3].lower())
+    if not start_month or not end_month:
+        return None
+    end_year = int(match.group(5))
+    start_year = end_year - 1 if start_month > end_month else end_year
+    try:
+        return date(start_year, start_month, int(match.group(2))), date(end_year, end_month, int(match.group(4)))
+    except ValueError:
+        return None
+
+
+def year_in_period(month, period):
+    """The year of a row dated in `month` on a statement covering `period` (start, end)"""
+    start, end = period
+    # Months after the end month are from before the turn of the year
+    return start.year if month > end.month else end.year
+
+
+# Header words of the transaction table when a profile names none
+DEFAULT_HEADER = {'description': 'Description', 'amount': 'Amount', 'category': None}
+
+# Rows on the same visual line can differ by a couple of points in `top`
+LINE_TOLERANCE = 3
+
+
+def row_descriptions(text, ignore_words=()):
+    """Return the descriptions of date-led rows found in plain page text.
+
+    `ignore_words` are glyphs the statement prints before a description
+    (a profile's table.ignore_words) and are not part of it.
+    """
+    descriptions = []
+    for match in TEXT_ROW.finditer(text):
+        words = match.group('description').split(' ')
+        while len(words) > 1 and words[0] in ignore_words:
+            words.pop(0)
+        descriptions.append(' '.join(words).strip())
+    return descriptions
+
+
+class TableLayout:
+    """What the table parser needs to know about one issuer's statements.
+
+    Built from a bank profile: its payments section (skipped; it ends at
+    payments_end or charges_start) and its "table" settings, the words that
+    start the description, amount and optional spend category columns and
+    any glyphs to drop from lines (e.g. a cash-back marker).
+    """
+
+    def __init__(self, sections=None, header=None, ignore_words=()):
+        sections = sections or {}
+        self.payments_start = sections.get('payments_start')
+        self.payments_end = [sections[key] for key in ('payments_end', 'charges_start') if key in sections]
+        self.header = {**DEFAULT_HEADER, **(header or {})}
+        self.ignore_words = set(ignore_words)
+
+    @classmethod
+    def from_profile(cls, profile):
+        if profile is None:
+            return cls()
+        return cls(profile.sections, profile.table.get('header'), profile.table.get('ignore_words', ()))
+
+    def starts_payments(self, line_text):
+        return bool(self.payments_start and self.payments_start.match(line_text))
+
+    def ends_payments(self, line_text):
+        return any(pattern.match(line_text) for pattern in self.payments_end)
+
+    def strip(self, text):
+        for word in self.ignore_words:
+            text = text.replace(word, '')
+        return text.strip()
+
+
+class StatementTableParser:
+    """Layout-aware parser that pulls transaction rows straight out of the PDF.
+
+    Rows are rebuilt from pdfplumber word coordinates (or real tables when the
+    PDF has them) and matched against precompiled date/amount patterns. Pages
+    where a date-led line cannot be parsed are reported back so only those go
+    through the LLM. Rows take their year from the statement period; until a
+    page has shown it, dated rows cannot be read either.
+    """
+
+    def iter_pages(self, file_path, profile=None):
+        """Yield parse results one page at a time, releasing each page afterwards"""
+        layout = TableLayout.from_profile(profile)
+        with pdfplumber.open(file_path) as pdf:
+            period = None
+            for page in pdf.pages:
+                result = self.parse_page(page, period, layout)
+                period = result['period']
+                # Drop pdfplumber's cached layout objects for this page
+                page.close()
+                yield result
+
+    def parse_page(self, page, period=None, layout=None):
+        """Parse a single pdfplumber page into raw transaction items.
+
+        `period` is the (start, end) of the statement as read from earlier
+        pages; a period printed on this page replaces it.
+        """
+        layout = layout or TableLayout()
+        text = page.extract_text() or ''
+        match = STATEMENT_PERIOD.search(text)
+        if match:
+            period = statement_period(match) or period
+
+        rows = self._parse_tables(page, period, layout)
+        if rows is not None:
+            return {'rows': rows, 'confident': True, 'period': period}
+
+        rows = []
+        confident = True
+        columns = None
+        in_payments = False
+
+        for line in self._group_lines(page.extract_words(), layout):
+            line_text = ' '.join(word['text'] for word in line)
+
+            if layout.starts_payments(line_text):
+                in_payments = True
+                continue
+            if layout.ends_payments(line_text):
+                in_payments = False
+                continue
+
+            header = self._detect_columns(line, layout)
+            if header:
+                columns = header
+                continue
+
+            if columns:
+                # Drop margin artefacts (barcodes, form codes) left of the table
+                line = [word for word in line if word['x0'] >= columns['date'] - LINE_TOLERANCE]
+                line_text = ' '.join(word['text'] for word in line)
+
+            if not ROW_START.match(line_text):
+                continue
+            # "January 11 to February 10, 2025" is the period, not a row
+            if in_payments or STATEMENT_PERIOD.match(line_text):
+                continue
+
+            row = self._parse_row(line, columns, period)
+            if row is None:
+                # A date-led line we could not read: let the LLM handle this page
+                confident = False
+                continue
+            rows.append(row)
+
+        return {'rows': rows, 'confident': confident, 'period': period}
+
+    def _group_lines(self, words, layout):
+        """Group words into visual lines using their vertical position"""
+        lines = []
+        for word in sorted(words, key=lambda w: (round(w['top']), w['x0'])):
+            if word['text'] in layout.ignore_words:
+                continue
+            if lines and abs(lines[-1][0]['top'] - word['top']) <= LINE_TOLERANCE:
+                lines[-1].append(word)
+            else:
+                lines.append([word])
+        return [sorted(line, key=lambda w: w['x0']) for line in lines]
+
+    def _detect_columns(self, line, layout):
+        """Return column x positions if this line is a transaction table header"""
+        header = layout.header
+        texts = [word['text'] for word in line]
+        if header['description'] not in texts:
+            return None
+        amount_words = [word for word in line if word['text'].startswith(header['amount'])]
+        if not amount_words:
+            return None
+
+        columns = {
+            'date': line[0]['x0'],
+            'description': line[texts.index(header['description'])]['x0'],
+            'amount': amount_words[0]['x0'],
+            'category': None
+        }
+        if header['category'] and header['category'] in texts:
+            columns['category'] = line[texts.index(header['category'])]['x0']
+        return columns
+
+    def _parse_row(self, line, columns, period):
+        """Turn one visual line into a raw transaction item"""
+        tokens = [word['text'] for word in line]
+        if len(tokens) < 4 or not MONTH_TOKEN.match(tokens[0]) or not DAY_TOKEN.match(tokens[1]):
+            return None
+
+        date_str = self._to_iso_date(tokens[0], tokens[1], period)
+        if date_str is None:
+            return None
+
+        amount = self._to_amount(tokens[-1])
+        if amount is None:
+            return None
+
+        # Skip the posting date if the statement has one
+        start = 2
+        if len(tokens) > 4 and MONTH_TOKEN.match(tokens[2]) and DAY_TOKEN.match(tokens[3]):
+            start = 4
+        body = line[start:-1]
+
+        category_x = columns['category'] if columns else None
+        if category_x is not None:
+            description = [word['text'] for word in body if word['x0'] < category_x]
+            spend_category = [word['text'] for word in body if word['x0'] >= category_x]
+        else:
+            description = [word['text'] for word in body]
+            spend_category = []
+
+        if not description:
+            return None
+
+        return {
+            'date': date_str,
+            'description': ' '.join(description),
+            'amount': amount,
+            'spend_category': ' '.join(spend_category)
+        }
+
+    def _parse_tables(self, page, period, layout):
+        """Read rows from ruled tables; None when the page has no usable table"""
+        if period is None:
+            # Undatable rows: the line parser will flag the page for the LLM
+            return None
+        rows = []
+        found = False
+        words = {name: word.lower() for name, word in layout.header.items() if word}
+        for table in page.extract_tables():
+            if not table or len(table) < 2:
+                continue
+            header = [(cell or '').strip().lower() for cell in table[0]]
+            date_col = next((i for i, cell in enumerate(header) if 'date' in cell), None)
+            amount_col = next((i for i, cell in enumerate(header) if cell.startswith(words['amount'])), None)
+            desc_col = next((i for i, cell in enumerate(header) if words['description'] in cell), None)
+            if date_col is None or amount_col is None or desc_col is None:
+                continue
+            category_col = next((i for i, cell in enumerate(header)
+                                 if 'categor' in cell or ('category' in words and words['category'] in cell)), None)
+
+            found = True
+            for cells in table[1:]:
+                cells = [(cell or '').strip() for cell in cells]
+                date_parts = cells[date_col].split()
+                amount = self._to_amount(cells[amount_col].replace(' ', ''))
+                if len(date_parts) < 2 or amount is None:
+                    continue
+                date_str = self._to_iso_date(date_parts[0], date_parts[1], period)
+                if date_str is None:
+                    continue
+                rows.append({
+                    'date': date_str,
+                    'description': layout.strip(cells[desc_col]),
+                    'amount': amount,
+                    'spend_category': cells[category_col] if category_col is not None else ''
+                })
+
+        return rows if found else None
+
+    def _to_iso_date(self, month_token, day_token, period):
+        """ISO date of a month/day pair on a statement covering `period`, or None"""
+        month = MONTHS.get(month_token[:3].lower())
+        if month is None or period is None:
+            return None
+        try:
+            return date(year_in_period(month, period), month, int(day_token)).isoformat()
+        except ValueError:
+            return None
+
+    def _to_amount(self, token):
+        match = AMOUNT_TOKEN.match(token)
+        if not match:
+            return None
+        amount = float(match.group(2).replace(',', ''))
+        # "CR" suffixes and leading minus signs are both credits
+        if match.group(1) or match.group(3):
+            amount = -amount
+        return amount
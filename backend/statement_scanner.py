@@ -0,0 +1,178 @@
+import re
+from datetime import date
+
+from statement_parser import STATEMENT_PERIOD, statement_period
+
+# Precompiled patterns shared by every layout; section patterns come from
+# the bank profile (see bank_profiles.json)
+LINE = re.compile(r'^.*$', re.MULTILINE)
+DATE_ROW = re.compile(r'^(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? \d{1,2}\b', re.IGNORECASE)
+AMOUNT = re.compile(r'(\d+,\d+\.\d{2}|\d+\.\d{2})')
+# Stands in for sections a profile does not define
+NEVER = re.compile(r'(?!)')
+
+
+class StatementHeader:
+    """Statement-level facts collected by StatementScanner"""
+
+    def __init__(self):
+        self.total = None
+        self.transaction_count = None
+        self.period_start = None
+        self.period_end = None
+        self.transaction_pages = []
+        self.payment_pages = []
+        self.summary_pages = []
+
+    @property
+    def recognized(self):
+        """True once the transaction section layout has been seen"""
+        return bool(self.transaction_pages)
+
+    @property
+    def period(self):
+        """The statement period as (start, end) dates, or None until it is seen"""
+        if self.period_start is None or self.period_end is None:
+            return None
+        return date.fromisoformat(self.period_start), date.fromisoformat(self.period_end)
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'transaction_count': self.transaction_count,
+            'period_start': self.period_start,
+            'period_end': self.period_end,
+            'transaction_pages': list(self.transaction_pages),
+            'payment_pages': list(self.payment_pages),
+            'summary_pages': list(self.summary_pages)
+        }
+
+
+class StatementScanner:
+    """Single-pass scanner for the statement header and section layout.
+
+    Pages are fed in order as they are loaded. Each page is scanned once, and
+    that one scan yields both the page's layout (which character spans hold
+    payments or the spend summary, whether it has transaction rows) and the
+    statement-wide header used for reconciliation. `sections` holds the
+    bank profile's compiled section patterns; without them only the period
+    and date-led rows are detected.
+    """
+
+    def __init__(self, sections=None):
+        sections = sections or {}
+        self.payments_start = sections.get('payments_start', NEVER)
+        self.payments_end = sections.get('payments_end', NEVER)
+        self.charges_start = sections.get('charges_start', NEVER)
+        self.charges_end = sections.get('charges_end', NEVER)
+        self.summary_start = sections.get('summary_start', NEVER)
+        self.summary_total = sections.get('summary_total', NEVER)
+        self.header = StatementHeader()
+        self._in_payments = False
+        self._in_charges = False
+
+    def scan_page(self, page_index, text):
+        """Scan one page of text and return its layout.
+
+        The layout is a dict with 'skip_spans' ((start, end) offsets of text
+        that never holds purchases), 'has_rows' (a date-led line was seen)
+        and 'in_transactions' (part of the charges section is on this page).
+        """
+        header = self.header
+        skip_spans = []
+        has_rows = False
+        in_transactions = self._in_charges
+        # Payments that run over from the previous page start at the top
+        payments_start = 0 if self._in_payments else None
+        summary_start = None
+        total_pending = False
+
+        for match in LINE.finditer(text):
+            line = match.group().strip()
+            if not line:
+                continue
+
+            if header.period_start is None:
+                period = STATEMENT_PERIOD.search(line)
+                if period:
+                    self._set_period(period)
+
+            if summary_start is not None:
+                # Everything from the Spend Report to the end of the page is summary
+                if header.total is None:
+                    self._scan_summary_line(line, total_pending)
+                    total_pending = header.total is None and line.startswith('Total')
+                continue
+
+            if self.payments_start.match(line):
+                self._in_payments = True
+                payments_start = match.start()
+                if page_index not in header.payment_pages:
+                    header.payment_pages.append(page_index)
+                continue
+
+            if self._in_payments:
+                if self.payments_end.match(line):
+                    skip_spans.append((payments_start, match.end()))
+                    self._in_payments = False
+                    payments_start = None
+                elif self.charges_start.match(line):
+                    skip_spans.append((payments_start, match.start()))
+                    self._in_payments = False
+                    payments_start = None
+                else:
+                    continue
+
+            if self.charges_start.match(line):
+                self._in_charges = True
+                in_transactions = True
+            elif self.charges_end.match(line):
+                self._in_charges = False
+            elif self.summary_start.match(line):
+                summary_start = match.start()
+                header.summary_pages.append(page_index)
+            elif DATE_ROW.match(line):
+                has_rows = True
+
+        if payments_start is not None:
+            skip_spans.append((payments_start, len(text)))
+        if summary_start is not None:
+            skip_spans.append((summary_start, len(text)))
+        if in_transactions and page_index not in header.transaction_pages:
+            header.transaction_pages.append(page_index)
+
+        return {'skip_spans': skip_spans, 'has_rows': has_rows, 'in_transactions': in_transactions}
+
+    def _scan_summary_line(self, line, total_pending):
+        header = self.header
+        match = self.summary_total.match(line)
+        if match:
+            # One group is the amount; two are the transaction count and the amount
+            if len(match.groups()) > 1:
+                header.transaction_count = int(match.group(1))
+            header.total = float(match.groups()[-1].replace(',', ''))
+            return
+        # Some layouts put the amount after the label or on the next line
+        if line.startswith('Total') or total_pending:
+            amount = AMOUNT.search(line)
+            if amount:
+                header.total = float(amount.group(1).replace(',', ''))
+
+    def _set_period(self, match):
+        period = statement_period(match)
+        if period:
+            self.header.period_start, self.header.period_end = (day.isoformat() for day in period)
+
+
+def strip_spans(text, spans):
+    """Return text with the given (start, end) spans removed"""
+    if not spans:
+        return text
+    pieces = []
+    position = 0
+    for start, end in sorted(spans):
+        if start > position:
+            pieces.append(text[position:start])
+        position = max(position, end)
+    pieces.append(text[position:])
+    return ''.join(pieces)
@@ -0,0 +1,39 @@
+import unittest
+from bank_profiles import BankProfile, BankProfileRegistry
+
+SIMPLII_FIRST_PAGE = """Your account at a glance
+Previous balance $319.22
+January 11 to February 10, 2025
+Simplii Financial
+Cash Back Visa Card
+"""
+
+
+class TestBankProfiles(unittest.TestCase):
+    def setUp(self):
+        self.registry = BankProfileRegistry()
+
+    def test_detects_known_format_from_first_page(self):
+        profile = self.registry.detect(SIMPLII_FIRST_PAGE)
+        self.assertEqual(profile.id, 'simplii_cash_back_visa')
+        self.assertEqual(profile.parser, 'table')
+        self.assertTrue(profile.sections['payments_start'].match("Your payments"))
+        self.assertEqual(profile.map_category("Restaurants"), "Dining")
+        self.assertEqual(profile.map_category("Retail and Grocery"), "Shopping")
+        self.assertIsNone(profile.map_category("Something new"))
+
+    def test_unknown_format_falls_back_to_llm(self):
+        profile = self.registry.detect("Welcome to Example Bank\nStatement of account")
+        self.assertIs(profile, self.registry.generic)
+        self.assertEqual(profile.parser, 'llm')
+        self.assertEqual(profile.sections, {})
+        self.assertTrue(profile.is_summary("Total payments"))
+
+    def test_invalid_profiles_are_rejected(self):
+        with self.assertRaises(ValueError):
+            BankProfile('bad', 'Bad bank', category_map={'Groceries': 'Groceries'})
+        with self.assertRaises(ValueError):
+            BankProfile('bad', 'Bad bank', parser='ocr')
+
+if __name__ == '__main__':
+    unittest.main()
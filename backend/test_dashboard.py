@@ -0,0 +1,57 @@
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from dashboard import fetch_summary, summary_query
+
+
+class RecordingCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, query, params):
+        self.executed.append((query, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+class TestDashboardSummary(unittest.TestCase):
+    def test_every_placeholder_gets_a_parameter(self):
+        for date_filter, date_params in (('', ()), (' AND transaction_date >= %s AND transaction_date < %s',
+                                                    (date(2025, 1, 1), date(2025, 2, 1)))):
+            query, params = summary_query(7, date_filter, date_params)
+            self.assertEqual(query.count('%s'), len(params))
+            self.assertEqual(query.count('UNION ALL'), 3)
+        self.assertIn('budget_monthly_rollups', summary_query(7)[0])
+        self.assertNotIn('rollups', summary_query(7, ' AND transaction_date >= %s', (date(2025, 1, 1),))[0])
+
+    def test_sections_come_back_in_one_round_trip(self):
+        rows = [
+            ('by_date', date(2025, 1, 3), None, None, Decimal(1), Decimal('10.00'), None, None, None),
+            ('by_date', date(2025, 1, 14), None, None, Decimal(2), Decimal('4.00'), None, None, None),
+            ('category', None, None, 'Food', Decimal(3), Decimal('14.00'), date(2025, 1, 3), date(2025, 1, 14), None),
+            ('category', None, None, 'Rent', Decimal(1), Decimal('900.00'), date(2025, 2, 1), date(2025, 2, 1), None),
+            ('month', None, '2025-02', None, None, Decimal('900.00'), None, None, None),
+            ('month', None, '2025-01', None, None, Decimal('14.00'), None, None, None),
+            ('recent', date(2025, 1, 14), 'COFFEE', 'Food', None, Decimal('2.00'), None, None, 11),
+            ('recent', date(2025, 2, 1), 'RENT', 'Rent', None, Decimal('900.00'), None, None, 12),
+            ('recent', date(2025, 1, 14), 'COFFEE', 'Food', None, Decimal('2.00'), None, None, 13),
+        ]
+        cursor = RecordingCursor(rows)
+        summary = fetch_summary(cursor, 7)
+
+        self.assertEqual(len(cursor.executed), 1)
+        self.assertEqual(summary['total_transactions'], 4)
+        self.assertEqual([entry['date'] for entry in summary['transactions_by_date']],
+                         [date(2025, 1, 14), date(2025, 1, 3)])
+        self.assertEqual(summary['transactions_by_date'][0]['transactions_count'], 2)
+        self.assertEqual([entry['month'] for entry in summary['monthly_spending']], ['2025-01', '2025-02'])
+        self.assertEqual([entry['transaction_id'] for entry in summary['recent_transactions']], [12, 13, 11])
+        self.assertEqual(summary['category_summary'][1],
+                         {'expense_category': 'Rent', 'count': 1, 'total_amount': Decimal('900.00'),
+                          'earliest_date': date(2025, 2, 1), 'latest_date': date(2025, 2, 1)})
+
+if __name__ == '__main__':
+    unittest.main()
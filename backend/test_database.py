@@ -0,0 +1,314 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+from flask import Flask
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+import database
+from database import ConnectionPool, ReplicaRouter, bulk_insert
+
+
+class FakeConnection:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def is_connected(self):
+        return self.connected
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class StatusCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        self.connection.status_queries.append(query)
+        if self.connection.lag == 'denied':
+            raise Error("Access denied; you need the REPLICATION CLIENT privilege", errno=1227)
+
+    def fetchall(self):
+        lag = self.connection.lag
+        if lag == 'standalone':
+            return []
+        return [{'Seconds_Behind_Source': None if lag == 'stopped' else lag}]
+
+    def close(self):
+        pass
+
+
+class FakeReplica(FakeConnection):
+    def __init__(self, lag=0):
+        super().__init__()
+        self.lag = lag
+        self.status_queries = []
+
+    def cursor(self, dictionary=False):
+        return StatusCursor(self)
+
+
+class RecordingCursor:
+    def __init__(self, load_data_errno=None):
+        self.load_data_errno = load_data_errno
+        self.queries = []
+        self.loaded = None
+        self.rowcount = 0
+
+    def execute(self, query, params):
+        self.queries.append(query)
+        if query.startswith('LOAD DATA'):
+            if self.load_data_errno:
+                raise Error("LOAD DATA failed", errno=self.load_data_errno)
+            with open(params[0], encoding='utf-8') as f:
+                self.loaded = f.read()
+            self.rowcount = self.loaded.count('\n')
+        else:
+            self.rowcount = len(params) // 2
+
+
+class TestBulkInsert(unittest.TestCase):
+    def setUp(self):
+        database._load_data_refused = False
+        self.rows = [(i, f"row {i}") for i in range(5)]
+
+    def test_rows_go_out_in_multi_row_batches(self):
+        cursor = RecordingCursor()
+        inserted = bulk_insert(cursor, 'items', ('id', 'name'), self.rows, on_duplicate="id = id",
+                               batch_size=2, load_min_rows=0)
+        self.assertEqual(inserted, 5)
+        self.assertEqual(len(cursor.queries), 3)
+        self.assertEqual(cursor.queries[0],
+                         "INSERT INTO items (id, name) VALUES (%s, %s), (%s, %s) ON DUPLICATE KEY UPDATE id = id")
+
+    def test_large_imports_use_load_data(self):
+        cursor = RecordingCursor()
+        rows = self.rows + [(5, "tab\there\nnewline \\ slash"), (6, None)]
+        self.assertEqual(bulk_insert(cursor, 'items', ('id', 'name'), rows, on_duplicate="id = id",
+                                     load_min_rows=3), 7)
+        self.assertIn("IGNORE INTO TABLE items", cursor.queries[0])
+        self.assertIn("5\ttab\\there\\nnewline \\\\ slash\n6\t\\N\n", cursor.loaded)
+
+    def test_falls_back_when_server_refuses_load_data(self):
+        # Loading local data is disabled on the server
+        cursor = RecordingCursor(load_data_errno=3948)
+        self.assertEqual(bulk_insert(cursor, 'items', ('id', 'name'), self.rows, load_min_rows=3), 5)
+        self.assertTrue(cursor.queries[-1].startswith("INSERT INTO items"))
+        # Later imports go straight to INSERT
+        cursor.queries = []
+        bulk_insert(cursor, 'items', ('id', 'name'), self.rows, load_min_rows=3)
+        self.assertEqual(len(cursor.queries), 1)
+
+    def test_other_load_data_errors_are_raised(self):
+        # A deadlock or lock wait timeout rolls the transaction back; the
+        # INSERTs must not go on to commit the rest of it
+        for errno in (1213, 1205):
+            cursor = RecordingCursor(load_data_errno=errno)
+            with self.assertRaises(Error):
+                bulk_insert(cursor, 'items', ('id', 'name'), self.rows, load_min_rows=3)
+            self.assertEqual(len(cursor.queries), 1)
+            self.assertFalse(database._load_data_refused)
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def pool(self, size=2, max_overflow=1, timeout=0.05, check_after=0):
+        return ConnectionPool(size=size, max_overflow=max_overflow, timeout=timeout, check_after=check_after,
+                              connect=self.connect)
+
+    def test_connections_are_reused_and_reset(self):
+        pool = self.pool()
+        first = pool.checkout()
+        self.opened[0].in_transaction = True
+        first.close()
+        self.assertEqual(self.opened[0].rollbacks, 1)
+
+        second = pool.checkout()
+        self.assertIs(second._connection, self.opened[0])
+        self.assertEqual(len(self.opened), 1)
+        second.close()
+        with self.assertRaises(PoolError):
+            second.cursor()
+
+    def test_overflow_is_closed_and_exhaustion_times_out(self):
+        pool = self.pool(size=1, max_overflow=1)
+        held = [pool.checkout(), pool.checkout()]
+        with self.assertRaises(PoolError):
+            pool.checkout()
+        stats = pool.stats()
+        self.assertEqual((stats['in_use'], stats['timeouts']), (2, 1))
+
+        for connection in held:
+            connection.close()
+        self.assertEqual(pool.stats()['open'], 1)
+        self.assertEqual([c.closed for c in self.opened], [True, False])
+
+    def test_waiter_gets_returned_connection(self):
+        pool = self.pool(size=1, max_overflow=0, timeout=2)
+        held = pool.checkout()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.checkout()))
+        waiter.start()
+        threading.Timer(0.05, held.close).start()
+        waiter.join(2)
+        self.assertIs(got[0]._connection, self.opened[0])
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_dead_connection_is_replaced_on_checkout(self):
+        pool = self.pool()
+        pool.checkout().close()
+        self.opened[0].connected = False
+        connection = pool.checkout()
+        self.assertIs(connection._connection, self.opened[1])
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+        # Connections used moments ago are not pinged again
+        pool.check_after = 60
+        connection.close()
+        pool.checkout().close()
+        self.assertEqual(pool.stats()['health_checks'], 1)
+
+    def test_discarded_connection_frees_its_slot(self):
+        pool = self.pool(size=1, max_overflow=0)
+        connection = pool.checkout()
+        self.opened[0].in_transaction = True
+        connection.discard()
+        self.assertEqual((self.opened[0].closed, self.opened[0].rollbacks), (True, 0))
+        self.assertEqual(pool.stats()['open'], 0)
+        pool.checkout().close()
+        self.assertEqual(len(self.opened), 2)
+
+    def test_request_connection_returns_at_teardown(self):
+        pool = self.pool()
+        database._pool, previous = pool, database._pool
+        try:
+            app = Flask(__name__)
+            database.init_app(app)
+            with app.app_context():
+                self.assertIs(database.get_db(), database.get_db())
+                self.assertEqual(pool.stats()['in_use'], 1)
+            self.assertEqual(pool.stats()['in_use'], 0)
+        finally:
+            database._pool = previous
+
+class TestReplicaRouter(unittest.TestCase):
+    def setUp(self):
+        self.replicas = {'r1': [], 'r2': []}
+        self.lag = {'r1': 0, 'r2': 0}
+        self.refuse = set()
+
+    def connect(self, host, port):
+        if host in self.refuse:
+            raise Error("Can't connect to MySQL server")
+        connection = FakeReplica(self.lag[host])
+        self.replicas[host].append(connection)
+        return connection
+
+    def router(self, **options):
+        options = {'retry_after': 60, 'max_lag': 30, 'check_after': 0, **options}
+        return ReplicaRouter(endpoints=[('r1', '3307'), ('r2', '3308')], connect=self.connect, **options)
+
+    def test_reads_take_turns_and_fail_over(self):
+        router = self.router()
+        first, second = router.checkout(), router.checkout()
+        self.assertEqual((first._connection, second._connection), (self.replicas['r1'][0], self.replicas['r2'][0]))
+        first.close()
+        second.close()
+
+        # r1 stops accepting connections: it is left out and r2 serves
+        router._replicas[0]['pool'].dispose()
+        self.refuse.add('r1')
+        self.assertIs(router.checkout()._connection, self.replicas['r2'][0])
+        self.assertIsNotNone(router.checkout())
+        stats = router.stats()
+        self.assertEqual([replica['healthy'] for replica in stats['replicas']], [False, True])
+        self.assertEqual(stats['failovers'], 1)
+
+        # With r2 lagging too, reads go to the primary
+        self.lag['r2'] = 120
+        router._replicas[1]['pool'].dispose()
+        self.assertIsNone(router.checkout())
+        self.assertEqual(router.stats()['primary_fallbacks'], 1)
+
+    def test_busy_replicas_fall_back_to_the_primary_at_once(self):
+        with mock.patch.dict(os.environ, {'DB_POOL_MAX_OVERFLOW': '0', 'DB_POOL_TIMEOUT': '30'}):
+            router = self.router(pool_size=1)
+        held = [router.checkout(), router.checkout()]
+        started = time.perf_counter()
+        self.assertIsNone(router.checkout())
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(router.stats()['primary_fallbacks'], 1)
+        # Busy is not broken: both stay in rotation
+        self.assertEqual(router.stats()['failovers'], 0)
+        for connection in held:
+            connection.close()
+
+    def test_replica_that_stopped_replicating_is_left_out(self):
+        self.lag['r1'] = 'stopped'
+        router = self.router()
+        self.assertIs(router.checkout()._connection, self.replicas['r2'][0])
+        self.assertEqual(router.stats()['replicas'][0]['last_error'], 'Not replicating')
+
+        # Without the lag check a replica is used as long as it answers
+        self.assertIsNotNone(self.router(max_lag=0).checkout())
+
+    def test_unknown_lag_is_not_lagging(self):
+        self.lag = {'r1': 'denied', 'r2': 'standalone'}
+        with self.assertLogs(level='WARNING') as logs:
+            router = self.router()
+            for _ in range(4):
+                connection = router.checkout()
+                self.assertIsNotNone(connection)
+                connection.close()
+        # One warning per replica, not one per check
+        self.assertEqual(len(logs.output), 2)
+        stats = router.stats()
+        self.assertEqual(stats['primary_fallbacks'], 0)
+        self.assertEqual([replica['healthy'] for replica in stats['replicas']], [True, True])
+        self.assertIn('privilege', stats['replicas'][0]['lag_unknown'])
+        # A refused SHOW REPLICA STATUS is not retried as SHOW SLAVE STATUS
+        self.assertEqual(self.replicas['r1'][0].status_queries, ['SHOW REPLICA STATUS'] * 2)
+
+        # Failing closed is a choice
+        router = self.router(lag_unknown='skip')
+        self.assertIsNone(router.checkout())
+        self.assertEqual(router.stats()['failovers'], 2)
+        with self.assertRaises(ValueError):
+            self.router(lag_unknown='maybe')
+
+    def test_recent_writers_read_the_primary(self):
+        primary = ConnectionPool(size=1, max_overflow=1, connect=FakeConnection)
+        previous = database._pool, database._router, database._wrote_recently
+        database._pool, database._router = primary, self.router()
+        try:
+            app = Flask(__name__)
+            database.init_app(app, wrote_recently=lambda user_id: user_id == 7)
+            with app.app_context():
+                self.assertIs(database.get_read_db(7), database.get_db())
+                replica = database.get_read_db(8)
+                self.assertIs(replica._connection, self.replicas['r1'][0])
+                self.assertIs(database.get_read_db(9), replica)
+            self.assertEqual((primary.stats()['in_use'], database._router.stats()['replicas'][0]['pool']['in_use']),
+                             (0, 0))
+        finally:
+            database._pool, database._router, database._wrote_recently = previous
+
+if __name__ == '__main__':
+    unittest.main()
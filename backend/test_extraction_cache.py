@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+import extraction_cache
+from extraction_cache import DEFAULT_CACHE_PATH, ExtractionCache
+import os
+import sqlite3
+import tempfile
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestExtractionCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'cache.sqlite3')
+        self.schema = {"properties": {"amount": {"type": "number"}}}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_hit_and_miss(self):
+        cache = ExtractionCache(path=self.path, max_entries=10, max_age_seconds=3600)
+        key = cache.make_key("Jan 09 FRESHCO 4.24", self.schema, "gpt-4-turbo-preview")
+
+        self.assertIsNone(cache.get(key))
+        cache.set(key, [{"amount": 4.24}])
+        self.assertEqual(cache.get(key), [{"amount": 4.24}])
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'entries': 1})
+
+        # Entries persist across instances
+        self.assertEqual(ExtractionCache(path=self.path).get(key), [{"amount": 4.24}])
+
+    def test_key_depends_on_schema_model_and_mode(self):
+        key = ExtractionCache.make_key("text", self.schema, "model-a")
+        self.assertNotEqual(key, ExtractionCache.make_key("text", self.schema, "model-b"))
+        self.assertNotEqual(key, ExtractionCache.make_key("text", {"properties": {}}, "model-a"))
+        # Fake extractions from load tests never answer for the real model
+        self.assertEqual(key, ExtractionCache.make_key("text", self.schema, "model-a", 'live'))
+        self.assertNotEqual(key, ExtractionCache.make_key("text", self.schema, "model-a", 'synthetic'))
+        self.assertNotEqual(ExtractionCache.make_key("text", self.schema, "model-a", 'replay'),
+                            ExtractionCache.make_key("text", self.schema, "model-a", 'synthetic'))
+
+    def test_size_eviction_keeps_most_recent(self):
+        clock = FakeClock()
+        cache = ExtractionCache(path=self.path, max_entries=2, max_age_seconds=3600, clock=clock)
+        for i in range(3):
+            cache.set(f"key-{i}", [i])
+            clock.advance(1)
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertIsNone(cache.get("key-0"))
+        self.assertEqual(cache.get("key-2"), [2])
+
+    def test_age_eviction(self):
+        clock = FakeClock()
+        cache = ExtractionCache(path=self.path, max_entries=10, max_age_seconds=60, clock=clock)
+        cache.set("old", [1])
+        clock.advance(59)
+        self.assertEqual(cache.get("old"), [1])
+
+        clock.advance(2)
+        self.assertIsNone(cache.get("old"))
+        # The next write drops it from the file too
+        cache.set("new", [2])
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_default_path_does_not_depend_on_the_working_directory(self):
+        previous = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        try:
+            # Opened in memory so the test leaves no cache file next to the code
+            with mock.patch.dict(os.environ, {'EXTRACTION_CACHE_PATH': ''}), \
+                    mock.patch('sqlite3.connect', return_value=sqlite3.connect(':memory:')) as connect:
+                cache = ExtractionCache()
+        finally:
+            os.chdir(previous)
+        self.assertEqual(cache.path, DEFAULT_CACHE_PATH)
+        self.assertEqual(connect.call_args[0][0], DEFAULT_CACHE_PATH)
+        self.assertEqual(os.path.dirname(cache.path), os.path.dirname(os.path.abspath(extraction_cache.__file__)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+import unittest
+from ingestion import StatementIngestor
+from fingerprint import drop_overlap_duplicates, fingerprint_statement
+
+
+def make_transaction(date, description, amount, category='Food'):
+    return {'transaction_date': date, 'description': description,
+            'amount': amount, 'expense_category': category}
+
+
+class FakeProcessor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def iter_transactions(self, file_path, metrics=None):
+        if self.statements[file_path] is None:
+            raise ValueError("unreadable")
+        return iter(self.statements[file_path])
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, query, params):
+        self.connection.round_trips += 1
+        self.result = []
+        if query.startswith('SELECT fingerprint'):
+            self.result = [(f,) for f in params if f in self.connection.fingerprints]
+            return
+        if not query.startswith('INSERT INTO budget_data'):
+            # The user lock and the rollup updates
+            self.connection.statements.append(query)
+            return
+        # A multi-row INSERT; behaves like the unique index on budget_data.fingerprint
+        self.rowcount = 0
+        for start in range(0, len(params), 6):
+            row = tuple(params[start:start + 6])
+            if row[-1] not in self.connection.fingerprints:
+                self.connection.fingerprints.add(row[-1])
+                self.connection.pending.append(row)
+                self.rowcount += 1
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.pending = []
+        self.committed = []
+        self.commits = 0
+        self.round_trips = 0
+        self.fingerprints = set()
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending = []
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class TestTransactionDedup(unittest.TestCase):
+    def test_repeats_in_a_statement_get_distinct_fingerprints(self):
+        coffee = make_transaction('2025-01-14', 'STARBUCKS #123 CALGARY AB', 2.00)
+        fingerprints = [fp for fp, _ in fingerprint_statement(7, [coffee, dict(coffee)])]
+        self.assertEqual(len(set(fingerprints)), 2)
+
+        # Store numbers and spacing do not change the fingerprint
+        reprinted = make_transaction('2025-01-14', 'STARBUCKS 123   CALGARY AB', 2)
+        self.assertEqual(next(fingerprint_statement(7, [reprinted]))[0], fingerprints[0])
+        self.assertNotEqual(next(fingerprint_statement(8, [reprinted]))[0], fingerprints[0])
+
+    def test_overlap_duplicates_are_dropped(self):
+        freshco = make_transaction('2025-01-20', 'FRESHCO #8966 CALGARY AB', 40.10)
+        coffee = make_transaction('2025-01-21', 'STARBUCKS #123 CALGARY AB', 2.00)
+        overlap = "Jan 21 Jan 22 STARBUCKS #123 CALGARY AB\nDining 2.00\n"
+
+        # The coffee printed in the overlap came back from both chunks, and
+        # a second coffee on the same day only appears in the later chunk
+        kept = drop_overlap_duplicates([coffee, dict(coffee)], [freshco, coffee], overlap)
+        self.assertEqual(len(kept), 1)
+        self.assertEqual(drop_overlap_duplicates([coffee], [freshco], overlap), [coffee])
+
+
+class TestIngestion(unittest.TestCase):
+    def test_reupload_saves_nothing_new(self):
+        coffee = make_transaction('2025-01-14', 'STARBUCKS #123 CALGARY AB', 2.00)
+        processor = FakeProcessor({'a.pdf': [coffee, dict(coffee)]})
+        connection = FakeConnection()
+        ingestor = StatementIngestor(processor, connection_factory=lambda: connection)
+
+        self.assertEqual(ingestor.ingest(7, 'a.pdf')['transactions_count'], 2)
+        outcome = ingestor.ingest(7, 'a.pdf')
+        self.assertEqual(outcome['transactions_count'], 0)
+        self.assertEqual(outcome['results'][0]['duplicates_skipped'], 2)
+        self.assertEqual(len(connection.committed), 2)
+
+        metrics = outcome['results'][0]['metrics']
+        self.assertEqual(metrics['counts']['duplicates_skipped'], 2)
+        self.assertIn('db_insert', metrics['stages'])
+
+    def test_user_is_locked_only_after_extraction(self):
+        connection = FakeConnection()
+
+        def statement():
+            for day in range(1, 8):
+                # Nothing may hold the user's row while rows are still coming
+                self.assertFalse(any('FOR UPDATE' in query for query in connection.statements))
+                yield make_transaction(f'2025-01-{day:02d}', f'MERCHANT {day}', day * 1.5)
+
+        processor = FakeProcessor({'a.pdf': statement()})
+        ingestor = StatementIngestor(processor, connection_factory=lambda: connection, batch_size=2)
+
+        self.assertEqual(ingestor.ingest(7, 'a.pdf')['transactions_count'], 7)
+        self.assertIn('FOR UPDATE', connection.statements[0])
+        # The lock, then one upsert into each rollup table for all four batches
+        self.assertEqual(len(connection.statements), 3)
+        self.assertEqual(connection.commits, 1)
+
+    def test_overlapping_statements_are_deduped(self):
+        coffee = make_transaction('2025-01-14', 'STARBUCKS #123 CALGARY AB', 2.00)
+        january = [coffee, dict(coffee), make_transaction('2025-01-20', 'FRESHCO #8966 CALGARY AB', 40.10)]
+        # The year-to-date export repeats January with a different store number format
+        year_to_date = [make_transaction('2025-01-14', 'STARBUCKS 123 CALGARY AB', 2.00),
+                        make_transaction('2025-01-14', 'STARBUCKS 123 CALGARY AB', 2.00),
+                        make_transaction('2025-01-14', 'STARBUCKS 123 CALGARY AB', 2.00),
+                        make_transaction('2025-02-02', 'SHELL CALGARY AB', 55.00, 'Transportation')]
+        processor = FakeProcessor({'jan.pdf': january, 'ytd.pdf': year_to_date})
+        connection = FakeConnection()
+        ingestor = StatementIngestor(processor, connection_factory=lambda: connection)
+
+        jan_result, ytd_result = ingestor.ingest_many(7, ['jan.pdf', 'ytd.pdf'])['results']
+
+        self.assertEqual((jan_result['transactions_count'], jan_result['duplicates_skipped']), (3, 0))
+        # Only the third coffee and the February fill-up are new
+        self.assertEqual((ytd_result['transactions_count'], ytd_result['duplicates_skipped']), (2, 2))
+        self.assertEqual(connection.committed[-1][2], 55.00)
+
+    def test_batch_is_committed_once_with_per_file_results(self):
+        shared = make_transaction('2025-01-20', 'FRESHCO #8966 CALGARY AB', 40.10)
+        processor = FakeProcessor({
+            'a.pdf': [shared, make_transaction('2025-01-21', 'SUBWAY CALGARY AB', 9.50, 'Dining')],
+            'b.pdf': [shared, make_transaction('2025-02-01', 'ENMAX CALGARY AB', 80.00, 'Utilities')],
+            'bad.pdf': None
+        })
+        connection = FakeConnection()
+        ingestor = StatementIngestor(processor, connection_factory=lambda: connection, batch_size=1)
+
+        outcome = ingestor.ingest_many(7, ['a.pdf', 'b.pdf', 'bad.pdf'])
+
+        self.assertEqual(outcome['transactions_count'], 3)
+        self.assertEqual(connection.commits, 1)
+        self.assertEqual(len(connection.committed), 3)
+        self.assertEqual([result['transactions_count'] for result in outcome['results']], [2, 1, 0])
+        self.assertEqual(outcome['results'][1]['duplicates_skipped'], 1)
+        self.assertEqual(outcome['results'][2]['error'], 'Could not extract data from PDF')
+
+    def test_year_of_statements_takes_five_round_trips(self):
+        statements = {
+            f'{month:02d}.pdf': [make_transaction(f'2025-{month:02d}-{day:02d}', f'MERCHANT {day}', day * 1.5)
+                                 for day in range(1, 29)]
+            for month in range(1, 13)
+        }
+        connection = FakeConnection()
+        ingestor = StatementIngestor(FakeProcessor(statements), connection_factory=lambda: connection)
+
+        outcome = ingestor.ingest_many(7, sorted(statements))
+
+        self.assertEqual(outcome['transactions_count'], 12 * 28)
+        # The user lock, one lookup of existing fingerprints, one multi-row
+        # INSERT and one upsert into each rollup table
+        self.assertEqual(connection.round_trips, 5)
+        self.assertEqual(connection.commits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
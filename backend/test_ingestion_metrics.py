@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+# Use the local LLM stand-in unless a mode (e.g. live or replay) is chosen
+os.environ.setdefault('LLM_TRANSPORT_MODE', 'synthetic')
+os.environ.setdefault('LLM_SYNTHETIC_LATENCY_MS', '0')
+os.environ.setdefault('LLM_SYNTHETIC_JITTER_MS', '0')
+# The shared rate limiter's buckets live in a scratch file, not next to the code
+os.environ.setdefault('LLM_RATE_LIMIT_DB', os.path.join(tempfile.mkdtemp(), 'llm_rate_limit.sqlite3'))
+
+from ingestion_metrics import IngestionMetrics, MetricsRegistry
+from pdf_processor import PDFProcessor
+
+
+class TestIngestionMetrics(unittest.TestCase):
+    def test_statement_metrics_feed_the_registry(self):
+        registry = MetricsRegistry()
+        for seconds in (0.5, 1.5):
+            metrics = IngestionMetrics('a.pdf', registry=registry)
+            metrics.add_time('llm', seconds)
+            metrics.increment('chunks', 3)
+            metrics.reconcile(100.0, 99.5, 0.5)
+
+        self.assertEqual(metrics.to_dict()['stages'], {'llm': 1.5})
+        self.assertEqual(metrics.to_dict()['reconciliation']['delta'], 0.5)
+
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot['counters']['ingestion.chunks'], 6)
+        self.assertEqual(snapshot['counters']['ingestion.balancing_transactions'], 2)
+        self.assertEqual(snapshot['timings']['ingestion.llm'],
+                         {'count': 2, 'total_seconds': 2.0, 'avg_seconds': 1.0, 'max_seconds': 1.5})
+
+    def test_llm_pipeline_records_stages_and_tokens(self):
+        # Without the table parser every chunk goes through the LLM
+        processor = PDFProcessor(table_parser=False, extraction_cache=False)
+        metrics = IngestionMetrics('onlineStatement.pdf', registry=MetricsRegistry())
+        transactions = list(processor.iter_transactions("onlineStatement.pdf", metrics=metrics))
+
+        report = metrics.to_dict()
+        counts = report['counts']
+        self.assertGreater(counts['chunks'], 0)
+        self.assertEqual(counts['llm_calls'], counts['chunks'])
+        self.assertGreater(counts['tokens_in'], 0)
+        self.assertGreater(counts['tokens_out'], 0)
+        self.assertEqual(counts['pages'], counts['llm_pages'] + counts.get('skipped_pages', 0))
+        for stage in ('load', 'scan', 'split', 'extract', 'llm', 'clean'):
+            self.assertIn(stage, report['stages'])
+        self.assertNotIn('parse', report['stages'])
+        self.assertEqual(report['reconciliation']['statement_total'], 1209.90)
+        self.assertGreaterEqual(counts['transactions'], len(transactions) - 1)
+
+if __name__ == '__main__':
+    unittest.main()
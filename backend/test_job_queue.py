@@ -0,0 +1,136 @@
+import unittest
+from job_queue import UploadJobQueue, UploadWorkerPool
+from concurrent.futures import ThreadPoolExecutor
+import os
+import tempfile
+import time
+from unittest import mock
+
+class TestUploadJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queue = UploadJobQueue(path=os.path.join(self.temp_dir.name, 'jobs.sqlite3'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_jobs_are_claimed_once_in_order(self):
+        job_ids = [self.queue.enqueue(1, f"statement-{i}.pdf") for i in range(20)]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            claimed = list(executor.map(lambda _: self.queue.claim(), range(25)))
+
+        claimed_ids = [job['id'] for job in claimed if job]
+        self.assertEqual(sorted(claimed_ids), sorted(job_ids))
+        self.assertEqual(claimed.count(None), 5)
+        self.assertEqual(self.queue.get(job_ids[0])['state'], 'running')
+
+    def test_worker_pool_records_results(self):
+        ok_id = self.queue.enqueue(1, "good.pdf")
+        bad_id = self.queue.enqueue(1, "bad.pdf")
+
+        def handler(job):
+            if job['file_path'] == "bad.pdf":
+                raise ValueError("Could not extract data from PDF")
+            return 42
+
+        pool = UploadWorkerPool(self.queue, handler, workers=0)
+        self.assertTrue(pool.run_once())
+        self.assertTrue(pool.run_once())
+        self.assertFalse(pool.run_once())
+
+        ok_job = self.queue.get(ok_id)
+        self.assertEqual(ok_job['state'], 'completed')
+        self.assertEqual(ok_job['transactions_count'], 42)
+
+        bad_job = self.queue.get(bad_id)
+        self.assertEqual(bad_job['state'], 'failed')
+        self.assertEqual(bad_job['error'], "Could not extract data from PDF")
+
+        # Only the completed upload counts as a recent write
+        self.assertTrue(self.queue.completed_since(1, 60))
+        self.assertFalse(self.queue.completed_since(2, 60))
+        self.queue.fail(ok_id, "retracted")
+        self.assertFalse(self.queue.completed_since(1, 60))
+
+    def test_only_expired_leases_are_requeued(self):
+        queue = UploadJobQueue(path=self.queue.path, lease_seconds=0.5)
+        job_id = queue.enqueue(1, "statement.pdf")
+        job = queue.claim()
+
+        # A worker that keeps renewing keeps its job however long it runs
+        for _ in range(3):
+            time.sleep(0.2)
+            self.assertTrue(queue.renew(job))
+            self.assertIsNone(queue.claim())
+
+        # Once the renewals stop, the next claim takes the job over
+        time.sleep(0.7)
+        retry = queue.claim()
+        self.assertEqual((retry['id'], retry['attempts']), (job_id, 2))
+        self.assertFalse(queue.renew(job))
+        self.assertTrue(queue.renew(retry))
+
+    def test_worker_renews_the_lease_of_a_slow_job(self):
+        queue = UploadJobQueue(path=self.queue.path, lease_seconds=0.5)
+        queue.enqueue(1, "slow.pdf")
+        claims = []
+
+        def handler(job):
+            # Another worker polls while this one is still busy
+            time.sleep(0.6)
+            claims.append(queue.claim())
+            time.sleep(0.5)
+            return 1
+
+        UploadWorkerPool(queue, handler, workers=0).run_once()
+        self.assertEqual(claims, [None])
+        self.assertEqual(queue.state_counts(), {'completed': 1})
+
+    def test_jobs_that_keep_losing_their_worker_are_failed(self):
+        queue = UploadJobQueue(path=self.queue.path, lease_seconds=0.2, max_attempts=2)
+        job_id = queue.enqueue(1, "crash.pdf")
+        queue.claim()
+        time.sleep(0.3)
+        self.assertEqual(queue.claim()['attempts'], 2)
+
+        time.sleep(0.3)
+        abandoned = []
+        self.assertIsNone(queue.claim(abandoned))
+        self.assertEqual([job['id'] for job in abandoned], [job_id])
+        self.assertEqual(queue.get(job_id)['state'], 'failed')
+
+        # The pool releases the files of a job the queue gave up on
+        job_id = queue.enqueue(1, "crash-again.pdf")
+        queue.claim()
+        time.sleep(0.3)
+        queue.claim()
+        time.sleep(0.3)
+        discarded = []
+        UploadWorkerPool(queue, lambda job: 1, workers=0, cleanup=discarded.append).run_once()
+        self.assertEqual([job['id'] for job in discarded], [job_id])
+
+    def test_only_the_current_claim_discards_the_upload(self):
+        queue = UploadJobQueue(path=self.queue.path, lease_seconds=0.5)
+        job_id = queue.enqueue(1, "statement.pdf")
+        discarded = []
+        retries = []
+
+        def handler(job):
+            # The heartbeat stalls, so another worker takes the job over
+            time.sleep(0.7)
+            retries.append(queue.claim())
+            return 1
+
+        with mock.patch.object(queue, 'renew', return_value=True):
+            UploadWorkerPool(queue, handler, workers=0, cleanup=discarded.append).run_once()
+        self.assertEqual((retries[0]['id'], retries[0]['attempts']), (job_id, 2))
+        # The retry still needs the file
+        self.assertEqual(discarded, [])
+        self.assertEqual(queue.get(job_id)['state'], 'running')
+
+        self.assertTrue(queue.complete(job_id, 1, attempts=2))
+        self.assertFalse(queue.fail(job_id, "too late", attempts=2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import httpx
+import openai
+from llm_rate_limit import AdaptiveConcurrencyLimit, RateLimitedTransport, RateLimiter, SharedTokenBucket
+from llm_transport import SyntheticLLMServer
+
+
+class ScriptedTransport(httpx.BaseTransport):
+    """Answers with the given status codes in turn"""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def handle_request(self, request):
+        self.calls += 1
+        status = self.statuses.pop(0)
+        headers = {'retry-after-ms': '1'} if status == 429 else {}
+        body = {'usage': {'total_tokens': 10}} if status == 200 else {'error': {'message': 'busy'}}
+        return httpx.Response(status, headers=headers, json=body, request=request)
+
+
+class TestLLMRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'limits.sqlite3')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def limiter(self, **kwargs):
+        limiter = RateLimiter(path=self.path, concurrency=AdaptiveConcurrencyLimit(initial=2, maximum=4), **kwargs)
+        limiter.retry_base = 0.001
+        return limiter
+
+    def test_bucket_is_shared_between_processes(self):
+        # Two instances on one file stand in for two worker processes
+        first = SharedTokenBucket('requests', 60, burst_seconds=2, path=self.path)
+        second = SharedTokenBucket('requests', 60, burst_seconds=2, path=self.path)
+        self.assertEqual(first.reserve(1), 0)
+        self.assertEqual(second.reserve(1), 0)
+        self.assertAlmostEqual(first.reserve(1), 1.0, delta=0.1)
+        second.refund(1)
+        self.assertAlmostEqual(first.reserve(1), 1.0, delta=0.1)
+
+    def test_concurrency_adapts(self):
+        limit = AdaptiveConcurrencyLimit(initial=4, minimum=1, maximum=8, latency_tolerance=3)
+        limit.acquire()
+        limit.release(overloaded=True)
+        self.assertEqual(limit.limit, 2)
+        for _ in range(4):
+            limit.acquire()
+            limit.release(latency=1.0)
+        grown = limit.limit
+        self.assertGreater(grown, 3)
+        # Much slower than the best latency seen
+        limit.acquire()
+        limit.release(latency=10.0)
+        self.assertAlmostEqual(limit.limit, grown * 0.9)
+
+    def test_throttled_requests_are_retried(self):
+        inner = ScriptedTransport([429, 503, 200])
+        client = httpx.Client(transport=RateLimitedTransport(inner, self.limiter()))
+        response = client.post('http://llm.test/v1/chat/completions', json={'messages': []})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(inner.calls, 3)
+
+        inner = ScriptedTransport([429, 429])
+        limiter = self.limiter(max_retries=1)
+        client = httpx.Client(transport=RateLimitedTransport(inner, limiter))
+        with mock.patch.object(limiter.tokens, 'refund') as refund:
+            self.assertEqual(client.post('http://llm.test/v1/chat/completions', json={}).status_code, 429)
+        # Neither rejected attempt keeps its token estimate, the returned one included
+        estimated = limiter.estimate_tokens(b'{}')
+        self.assertEqual(refund.call_args_list, [mock.call(estimated), mock.call(estimated)])
+
+    def test_slot_is_released_on_any_error(self):
+        class BrokenTransport(httpx.BaseTransport):
+            def handle_request(self, request):
+                raise ValueError("not a transport error")
+
+        limiter = self.limiter()
+        client = httpx.Client(transport=RateLimitedTransport(BrokenTransport(), limiter))
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                client.post('http://llm.test/v1/chat/completions', json={})
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+
+        inner = ScriptedTransport([])
+        inner.handle_request = lambda request: (_ for _ in ()).throw(httpx.ConnectError("refused"))
+        limiter = self.limiter(max_retries=1)
+        client = httpx.Client(transport=RateLimitedTransport(inner, limiter))
+        with self.assertRaises(httpx.ConnectError):
+            client.post('http://llm.test/v1/chat/completions', json={})
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+
+    def test_openai_client_survives_injected_errors(self):
+        server = SyntheticLLMServer(latency_ms=0, jitter_ms=0, error_rate=0.5, seed=3).start()
+        try:
+            transport = RateLimitedTransport(httpx.HTTPTransport(), self.limiter())
+            client = openai.OpenAI(api_key='offline', base_url=server.url, max_retries=0,
+                                   http_client=httpx.Client(transport=transport))
+            for _ in range(5):
+                response = client.chat.completions.create(
+                    model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'Summarize my spending'}])
+                self.assertTrue(response.choices[0].message.content)
+            self.assertGreater(server.stats['errors'], 0)
+        finally:
+            server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import unittest
+import tempfile
+from unittest import mock
+import httpx
+import httpcore
+import openai
+from llm_rate_limit import RateLimitedTransport
+from llm_transport import (Cassette, RecordingTransport, ReplayTransport, SyntheticLLMServer, llm_client_options,
+                           upstream_transport)
+
+PASSAGE = """Extract and save the relevant entities.
+
+Passage:
+Jan 14 Jan 15 STARBUCKS #123 CALGARY AB
+Restaurants 2.00
+Jan 20 Jan 21 FRESHCO #8966 CALGARY AB
+Retail and Grocery 40.10
+"""
+
+EXTRACTION_REQUEST = {
+    'model': 'gpt-4-turbo-preview',
+    'messages': [{'role': 'user', 'content': PASSAGE}],
+    'functions': [{'name': 'information_extraction', 'parameters': {'type': 'object', 'properties': {}}}],
+    'function_call': {'name': 'information_extraction'}
+}
+
+
+class TestLLMTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = SyntheticLLMServer(latency_ms=0, jitter_ms=0, error_rate=0, seed=1).start()
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def client(self, **kwargs):
+        return openai.OpenAI(api_key='offline', base_url=self.server.url, max_retries=0, **kwargs)
+
+    def test_synthetic_extraction(self):
+        response = self.client().chat.completions.create(**EXTRACTION_REQUEST)
+        arguments = response.choices[0].message.function_call.arguments
+        self.assertIn('"description": "STARBUCKS #123 CALGARY AB"', arguments)
+        self.assertIn('"category": "Shopping"', arguments)
+        self.assertGreater(response.usage.total_tokens, 0)
+
+    def test_record_then_replay_offline(self):
+        cassette = Cassette(self.temp_dir.name)
+        recording = httpx.Client(transport=RecordingTransport(cassette))
+        recorded = self.client(http_client=recording).chat.completions.create(**EXTRACTION_REQUEST)
+        self.assertEqual(len(cassette), 1)
+
+        # Replay answers from the cassette alone; nothing listens on this port
+        replaying = httpx.Client(transport=ReplayTransport(cassette))
+        client = openai.OpenAI(api_key='offline', base_url='http://127.0.0.1:9/v1', max_retries=0,
+                               http_client=replaying)
+        replayed = client.chat.completions.create(**EXTRACTION_REQUEST)
+        self.assertEqual(replayed.choices[0].message.function_call.arguments,
+                         recorded.choices[0].message.function_call.arguments)
+
+        with self.assertRaises(openai.BadRequestError):
+            client.chat.completions.create(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'new'}])
+
+    def test_error_injection(self):
+        self.server.stop()
+        self.server = SyntheticLLMServer(latency_ms=0, jitter_ms=0, error_rate=1, seed=1).start()
+        with self.assertRaises(openai.APIStatusError):
+            self.client().chat.completions.create(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'hi'}])
+        self.assertEqual(self.server.stats['errors'], 1)
+
+    def test_live_client_keeps_the_sdk_defaults(self):
+        proxy = {'HTTPS_PROXY': 'http://proxy.test:3128', 'NO_PROXY': ''}
+        with mock.patch.dict(os.environ, proxy):
+            pool = upstream_transport()._pool
+            self.assertIsInstance(pool, httpcore.HTTPProxy)
+            self.assertEqual(pool._proxy_url.host, b'proxy.test')
+            self.assertEqual(pool._max_connections, openai.DEFAULT_CONNECTION_LIMITS.max_connections)
+            self.assertNotIsInstance(upstream_transport('http://127.0.0.1:8089/v1')._pool, httpcore.HTTPProxy)
+        with mock.patch.dict(os.environ, dict(proxy, NO_PROXY='api.openai.com')):
+            self.assertNotIsInstance(upstream_transport()._pool, httpcore.HTTPProxy)
+
+        limits = os.path.join(self.temp_dir.name, 'limits.sqlite3')
+        with mock.patch.dict(os.environ, {'LLM_RATE_LIMIT': 'on', 'LLM_RATE_LIMIT_DB': limits, 'OPENAI_API_KEY': 'x'}), \
+                mock.patch('llm_rate_limit._shared_limiter', None):
+            client = llm_client_options('live')['http_client']
+        self.assertIsInstance(client._transport, RateLimitedTransport)
+        self.assertTrue(client.follow_redirects)
+        self.assertEqual(client.timeout, openai.DEFAULT_TIMEOUT)
+
+if __name__ == '__main__':
+    unittest.main()
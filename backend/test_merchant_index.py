@@ -0,0 +1,121 @@
+import os
+import tempfile
+import threading
+import unittest
+
+os.environ.setdefault('LLM_TRANSPORT_MODE', 'synthetic')
+# Rate limit buckets and cached extractions go to scratch files, not next to the code
+os.environ.setdefault('LLM_RATE_LIMIT_DB', os.path.join(tempfile.mkdtemp(), 'llm_rate_limit.sqlite3'))
+os.environ.setdefault('EXTRACTION_CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'extraction_cache.sqlite3'))
+
+from bank_profiles import BankProfileRegistry
+from merchant_index import MerchantCategoryIndex
+from pdf_processor import PDFProcessor
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params):
+        self.connection.queries.append(query)
+        self.connection.check(self)
+        self.result = [(key, self.connection.rows[key]) for key in params if key in self.connection.rows]
+
+    def executemany(self, query, rows):
+        self.connection.rows.update(rows)
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows=None, check=lambda cursor: None):
+        self.rows = dict(rows or {})
+        self.queries = []
+        self.check = check
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestMerchantCategoryIndex(unittest.TestCase):
+    def test_lookup_does_not_hold_the_lock_during_the_query(self):
+        held = []
+        connection = FakeConnection({'FRESHCO': 'Food'}, check=lambda cursor: held.append(index._lock.locked()))
+        index = MerchantCategoryIndex(lambda: connection)
+
+        self.assertEqual(index.lookup_many(['FRESHCO #8966 CALGARY AB', 'NEW PLACE CALGARY AB']),
+                         {'FRESHCO': 'Food'})
+        self.assertEqual(held, [False])
+        # Hits and misses are both answered from memory next time
+        self.assertEqual(index.lookup('FRESHCO #1 EDMONTON AB'), 'Food')
+        self.assertIsNone(index.lookup('NEW PLACE CALGARY AB'))
+        self.assertEqual(len(connection.queries), 1)
+
+    def test_unknown_merchants_are_asked_again_after_the_ttl(self):
+        now = [0.0]
+        connection = FakeConnection()
+        index = MerchantCategoryIndex(lambda: connection, miss_ttl=60, clock=lambda: now[0])
+        self.assertIsNone(index.lookup('NEW PLACE CALGARY AB'))
+        self.assertIsNone(index.lookup('NEW PLACE CALGARY AB'))
+        self.assertEqual(len(connection.queries), 1)
+
+        # Another process learns the merchant; this one finds out once the miss expires
+        connection.rows['NEW PLACE'] = 'Dining'
+        now[0] = 61
+        self.assertEqual(index.lookup('NEW PLACE CALGARY AB'), 'Dining')
+        self.assertEqual(len(connection.queries), 2)
+
+    def test_only_confirmed_categories_are_learned(self):
+        connection = FakeConnection()
+        index = MerchantCategoryIndex(lambda: connection)
+        learned = index.record([
+            {'description': 'FRESHCO CALGARY AB', 'expense_category': 'Food', 'category_source': 'statement'},
+            {'description': 'CORNER CAFE CALGARY AB', 'expense_category': 'Dining', 'category_source': 'user'},
+            {'description': 'MYSTERY LLC', 'expense_category': 'Shopping', 'category_source': 'llm'},
+            {'description': 'ODD SHOP', 'expense_category': 'Other', 'category_source': 'merchant_index'},
+            {'description': 'NO SOURCE', 'expense_category': 'Food'},
+        ])
+        self.assertEqual(learned, 2)
+        self.assertEqual(connection.rows, {'FRESHCO': 'Food', 'CORNER CAFE': 'Dining'})
+
+
+class TestCategorySources(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection({'FRESHCO': 'Food', 'CORNER CAFE': 'Dining'})
+        self.processor = PDFProcessor(merchant_index=MerchantCategoryIndex(lambda: self.connection))
+        self.profile = BankProfileRegistry().get('simplii_cash_back_visa')
+
+    def test_statement_category_wins_over_the_index(self):
+        items = [
+            {'date': '2025-01-03', 'description': 'FRESHCO #8966 CALGARY AB', 'amount': 12.5,
+             'spend_category': 'Retail and Grocery', 'category': 'Food'},
+            {'date': '2025-01-04', 'description': 'CORNER CAFE CALGARY AB', 'amount': 4.5, 'category': 'Food'},
+            {'date': '2025-01-05', 'description': 'MYSTERY LLC', 'amount': 9.0, 'category': 'Entertainment'},
+        ]
+        transactions = self.processor._clean_items(items, self.profile)
+
+        self.assertEqual([(t['expense_category'], t['category_source']) for t in transactions],
+                         [('Shopping', 'statement'), ('Dining', 'merchant_index'), ('Entertainment', 'llm')])
+        # One batched query, and only for the rows the statement leaves uncategorized
+        self.assertEqual(len(self.connection.queries), 1)
+        self.assertNotIn('FRESHCO', self.processor.merchant_index._cache)
+
+    def test_profile_glyphs_are_not_part_of_the_merchant(self):
+        items = [{'date': '2025-01-04', 'description': 'ÝCORNER CAFE CALGARY AB', 'amount': 4.5, 'category': 'Food'}]
+        transaction, = self.processor._clean_items(items, self.profile)
+        self.assertEqual(transaction['description'], 'CORNER CAFE CALGARY AB')
+        self.assertEqual((transaction['expense_category'], transaction['category_source']), ('Dining', 'merchant_index'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import date
+from io import StringIO
+
+from fingerprint import backfill_fingerprints, transaction_fingerprint
+from migrate import MigrationError, MigrationRunner, online_ddl, split_statements
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+        self._result = []
+
+    def execute(self, query, params=()):
+        connection = self.connection
+        connection.executed.append(' '.join(query.split()))
+        if query.startswith("SELECT version"):
+            self._result = list(connection.applied.items())
+        elif query.startswith("INSERT INTO schema_migrations"):
+            connection.applied[params[0]] = params[2]
+        elif query.startswith("SELECT GET_LOCK") or query.startswith("SELECT RELEASE_LOCK"):
+            self._result = [(1,)]
+        elif query.startswith("SELECT COUNT(*)"):
+            self._result = [(sum(1 for row in connection.rows if row['fingerprint'] is None),)]
+        elif 'FROM budget_data' in query:
+            *last, limit = params
+            walk_key = lambda row: (row['user_id'], row['transaction_date'], row['id'])
+            rows = sorted((row for row in connection.rows if row['fingerprint'] is None and walk_key(row) > tuple(last)),
+                          key=walk_key)
+            self._result = [(row['id'], row['user_id'], row['transaction_date'], row['description'], row['amount'])
+                            for row in rows[:limit]]
+        elif query.startswith("UPDATE IGNORE"):
+            # One statement per batch: CASE id WHEN ... THEN ... END WHERE id IN (...)
+            count = query.count('WHEN')
+            connection.update_statements += 1
+            self.rowcount = 0
+            for row_id, fingerprint in zip(params[:2 * count:2], params[1:2 * count:2]):
+                if any(row['fingerprint'] == fingerprint for row in connection.rows):
+                    continue
+                next(row for row in connection.rows if row['id'] == row_id)['fingerprint'] = fingerprint
+                self.rowcount += 1
+        else:
+            self._result = []
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows=()):
+        self.executed = []
+        self.applied = {}
+        self.rows = [dict(row) for row in rows]
+        self.commits = 0
+        self.update_statements = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class TestMigrationRunner(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.write('001_add_note.sql', "-- adds a column; with a ';' in a comment\n"
+                                       "ALTER TABLE budget_data ADD COLUMN note VARCHAR(20) DEFAULT 'a;b';\n"
+                                       "ALTER TABLE budget_data ADD COLUMN big TEXT, ALGORITHM=COPY;\n")
+        self.write('002_fill_note.py', "def upgrade(connection, progress):\n"
+                                       "    connection.cursor().execute('UPDATE budget_data SET note = 1')\n"
+                                       "    progress(1, 1)\n")
+        self.write('README.md', "not a migration")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, filename, content):
+        with open(os.path.join(self.temp_dir.name, filename), 'w') as f:
+            f.write(content)
+
+    def run_quietly(self, function, *args):
+        with redirect_stdout(StringIO()):
+            return function(*args)
+
+    def test_statements_are_split_outside_quotes_and_comments(self):
+        statements = split_statements("SELECT ';' -- no; split\n; SELECT `a;b` # nor; here\n;;")
+        self.assertEqual(statements, ["SELECT ';'", "SELECT `a;b`"])
+
+    def test_alters_run_online_unless_they_say_otherwise(self):
+        self.assertEqual(online_ddl("ALTER TABLE budget_data ADD INDEX idx (user_id)"),
+                         "ALTER TABLE budget_data ALGORITHM=INPLACE, LOCK=NONE, ADD INDEX idx (user_id)")
+        for statement in ("ALTER TABLE t ADD COLUMN c INT, ALGORITHM=COPY",
+                          "ALTER TABLE t REORGANIZE PARTITION pmax INTO (PARTITION p1 VALUES LESS THAN (1))",
+                          "UPDATE t SET c = 1"):
+            self.assertEqual(online_ddl(statement), statement)
+
+    def test_pending_migrations_run_once_in_order(self):
+        connection = FakeConnection()
+        runner = MigrationRunner(connection, self.temp_dir.name)
+        self.assertEqual(self.run_quietly(runner.migrate), [1, 2])
+        ran = [query for query in connection.executed if query.startswith(('ALTER', 'UPDATE'))]
+        self.assertEqual(ran, [
+            "ALTER TABLE budget_data ALGORITHM=INPLACE, LOCK=NONE, ADD COLUMN note VARCHAR(20) DEFAULT 'a;b'",
+            "ALTER TABLE budget_data ADD COLUMN big TEXT, ALGORITHM=COPY",
+            "UPDATE budget_data SET note = 1"
+        ])
+        self.assertEqual(self.run_quietly(runner.migrate), [])
+        self.assertEqual([entry['state'] for entry in runner.status()], ['applied', 'applied'])
+
+    def test_dry_run_and_baseline_change_nothing(self):
+        connection = FakeConnection()
+        runner = MigrationRunner(connection, self.temp_dir.name)
+        self.assertEqual(self.run_quietly(runner.migrate, None, True), [])
+        self.assertFalse(any(query.startswith('ALTER') for query in connection.executed))
+
+        self.assertEqual(runner.baseline(1), [1])
+        self.assertEqual([entry['state'] for entry in runner.status()], ['applied', 'pending'])
+        # Baselining takes the migration lock too
+        locks = [query.split('(')[0] for query in connection.executed if 'LOCK(' in query]
+        self.assertEqual(locks[-2:], ['SELECT GET_LOCK', 'SELECT RELEASE_LOCK'])
+
+    def test_edited_and_duplicate_migrations_are_reported(self):
+        connection = FakeConnection()
+        runner = MigrationRunner(connection, self.temp_dir.name)
+        runner.baseline(1)
+        self.write('001_add_note.sql', "ALTER TABLE budget_data ADD COLUMN other INT;")
+        self.assertEqual(MigrationRunner(connection, self.temp_dir.name).status()[0]['state'],
+                         'changed since applied')
+
+        self.write('002_again.sql', "SELECT 1;")
+        with self.assertRaises(MigrationError):
+            MigrationRunner(connection, self.temp_dir.name)
+
+
+class TestFingerprintBackfill(unittest.TestCase):
+    def test_backfill_walks_the_table_in_batches(self):
+        coffee = {'transaction_date': date(2025, 3, 1), 'description': 'TIM HORTONS #1', 'amount': 2.5}
+        rows = [dict(coffee, id=row_id, user_id=user_id, fingerprint=None)
+                for row_id, user_id in ((1, 1), (2, 2), (3, 1), (4, 1), (5, 2))]
+        # The same coffee a day later starts its own count
+        rows.append(dict(coffee, id=7, user_id=1, transaction_date=date(2025, 3, 2), fingerprint=None))
+        # A newer upload already stored the fingerprint of user 1's third coffee
+        rows.append(dict(coffee, id=6, user_id=1, fingerprint=transaction_fingerprint(1, coffee, 3)))
+        connection = FakeConnection(rows)
+        progress = []
+
+        updated = backfill_fingerprints(connection, batch_size=2, progress=lambda *args: progress.append(args))
+        self.assertEqual(updated, 5)
+        self.assertEqual(progress, [(2, 6), (4, 6), (6, 6)])
+        self.assertEqual(connection.update_statements, 3)
+        self.assertIn("WHERE (user_id, transaction_date, id) > (%s, %s, %s) AND fingerprint IS NULL "
+                      "ORDER BY user_id, transaction_date, id LIMIT %s",
+                      [query for query in connection.executed if query.startswith('SELECT id')][0])
+        fingerprints = {row['id']: row['fingerprint'] for row in connection.rows}
+        # Duplicates are numbered per user in id order, across batch boundaries
+        # and with the users' rows interleaved
+        self.assertEqual(fingerprints[1], transaction_fingerprint(1, coffee, 1))
+        self.assertEqual(fingerprints[3], transaction_fingerprint(1, coffee, 2))
+        self.assertIsNone(fingerprints[4])
+        self.assertEqual(fingerprints[5], transaction_fingerprint(2, coffee, 2))
+        self.assertEqual(fingerprints[7], transaction_fingerprint(1, dict(coffee, transaction_date=date(2025, 3, 2)), 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from datetime import date
+
+from partitions import ensure_future_partitions, initial_range, partition_by
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = []
+
+    def execute(self, query, params=()):
+        self.connection.executed.append(query)
+        if 'GET_LOCK' in query or 'RELEASE_LOCK' in query:
+            self.result = [(self.connection.lock_result,)]
+        elif 'information_schema.PARTITIONS' in query:
+            self.result = [(name,) for name in self.connection.partitions]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, partitions, lock_result=1):
+        self.partitions = partitions
+        self.lock_result = lock_result
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class TestPartitions(unittest.TestCase):
+    def test_partition_clause_has_one_partition_per_month(self):
+        clause = partition_by(date(2024, 11, 15), date(2025, 1, 1))
+        self.assertIn("PARTITION p_before VALUES LESS THAN ('2024-11-01')", clause)
+        self.assertIn("PARTITION p202412 VALUES LESS THAN ('2025-01-01')", clause)
+        self.assertIn("PARTITION p202501 VALUES LESS THAN ('2025-02-01')", clause)
+        self.assertTrue(clause.rstrip().endswith("PARTITION p_future VALUES LESS THAN (MAXVALUE)\n)"))
+
+    def test_initial_range_is_capped(self):
+        today = date(2026, 10, 18)
+        self.assertEqual(initial_range(date(2025, 3, 9), today, months_ahead=3),
+                         (date(2025, 3, 1), date(2027, 1, 1)))
+        self.assertEqual(initial_range(date(1970, 1, 1), today, months_ahead=0, history_months=12),
+                         (date(2025, 10, 1), date(2026, 10, 1)))
+        self.assertEqual(initial_range(None, today, months_ahead=0), (date(2026, 10, 1), date(2026, 10, 1)))
+
+    def test_future_months_are_split_off_p_future(self):
+        connection = FakeConnection(['p_before', 'p202609', 'p202610', 'p_future'])
+        created = ensure_future_partitions(connection, months_ahead=2, today=date(2026, 10, 18))
+        self.assertEqual(created, ['p202611', 'p202612'])
+        alter = next(query for query in connection.executed if query.startswith('ALTER'))
+        self.assertIn("REORGANIZE PARTITION p_future INTO", alter)
+        self.assertIn("PARTITION p202612 VALUES LESS THAN ('2027-01-01')", alter)
+
+        # Covered already, not partitioned, or another process is on it
+        for connection in (FakeConnection(['p_before', 'p202612', 'p_future']), FakeConnection([]),
+                           FakeConnection(['p_before', 'p_future'], lock_result=0)):
+            self.assertEqual(ensure_future_partitions(connection, months_ahead=2, today=date(2026, 10, 18)), [])
+            self.assertFalse(any(query.startswith('ALTER') for query in connection.executed))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,18 @@
 import unittest
-from pdf_processor import PDFProcessor
 import os
-from datetime import datetime
+import tempfile
+from datetime import date, datetime
+
+# Use the local LLM stand-in unless a mode (e.g. live or replay) is chosen
+os.environ.setdefault('LLM_TRANSPORT_MODE', 'synthetic')
+os.environ.setdefault('LLM_SYNTHETIC_LATENCY_MS', '0')
+os.environ.setdefault('LLM_SYNTHETIC_JITTER_MS', '0')
+# Rate limit buckets and cached extractions go to scratch files, not next to the code
+os.environ.setdefault('LLM_RATE_LIMIT_DB', os.path.join(tempfile.mkdtemp(), 'llm_rate_limit.sqlite3'))
+os.environ.setdefault('EXTRACTION_CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'extraction_cache.sqlite3'))
+
+from fingerprint import fingerprint_statement
+from pdf_processor import PDFProcessor, parse_transaction_date
 
 class TestPDFProcessor(unittest.TestCase):
     def setUp(self):
@@ -54,5 +65,22 @@ class TestPDFProcessor(unittest.TestCase):
                 print(f"Amount: ${trans['amount']:.2f}")
                 print(f"Category: {trans['expense_category']}")
 
+    def test_dates_keep_their_year(self):
+        netflix = {'description': 'NETFLIX.COM', 'amount': 16.99, 'category': 'Entertainment'}
+        rows = self.pdf_processor._clean_items([dict(netflix, date='2025-01-05'), dict(netflix, date='2026-01-05'),
+                                                dict(netflix, date='sometime'), dict(netflix, date='Jan 5')])
+        # Undatable rows are dropped rather than given a made-up date
+        self.assertEqual([row['transaction_date'] for row in rows], ['2025-01-05', '2026-01-05'])
+        fingerprints = [fingerprint for fingerprint, _ in fingerprint_statement(7, rows)]
+        self.assertNotEqual(fingerprints[0], fingerprints[1])
+
+    def test_statement_period_sets_the_year(self):
+        period = (date(2024, 12, 11), date(2025, 1, 10))
+        self.assertEqual(parse_transaction_date('Dec 20', period), date(2024, 12, 20))
+        self.assertEqual(parse_transaction_date('2025-12-20', period), date(2024, 12, 20))
+        self.assertEqual(parse_transaction_date('01/05/25', period), date(2025, 1, 5))
+        self.assertIsNone(parse_transaction_date('Dec 20'))
+        self.assertIsNone(parse_transaction_date('Feb 29', (date(2025, 2, 1), date(2025, 2, 28))))
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from pdf_text import BACKENDS, PDFTextExtractor
+from statement_generator import generate_statement
+
+
+class TestPDFTextExtractor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.workdir.name, "statement.pdf")
+        cls.contents = generate_statement(cls.path, pages=6, transactions_per_page=20, seed=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.workdir.cleanup()
+
+    def extract(self, **options):
+        extractor = PDFTextExtractor(pages_per_task=2, **options)
+        try:
+            pages = list(extractor.iter_pages(self.path))
+            return pages, extractor._pool is not None
+        finally:
+            extractor.shutdown()
+
+    def test_serial_and_parallel_return_the_same_pages(self):
+        for backend in BACKENDS:
+            serial, serial_pooled = self.extract(backend=backend, workers=1)
+            parallel, parallel_pooled = self.extract(backend=backend, workers=2, parallel_min_pages=1)
+
+            self.assertEqual((serial_pooled, parallel_pooled), (False, True))
+            self.assertEqual(len(serial), self.contents['pages'])
+            self.assertEqual([page.page_content for page in parallel], [page.page_content for page in serial])
+            self.assertEqual([page.metadata['page'] for page in parallel], list(range(self.contents['pages'])))
+
+    def test_page_threshold_picks_the_backend(self):
+        pages = self.contents['pages']
+        self.assertFalse(self.extract(workers=2, parallel_min_pages=pages + 1)[1])
+        self.assertTrue(self.extract(workers=2, parallel_min_pages=pages)[1])
+
+        with mock.patch.dict(os.environ, {'PDF_TEXT_PARALLEL_MIN_PAGES': str(pages + 1)}):
+            self.assertFalse(self.extract(workers=2)[1])
+        with mock.patch.dict(os.environ, {'PDF_TEXT_PARALLEL_MIN_PAGES': str(pages)}):
+            self.assertTrue(self.extract(workers=2)[1])
+
+    def test_threads_share_one_pool(self):
+        def slow_pool(**options):
+            time.sleep(0.05)
+            return mock.Mock()
+
+        extractor = PDFTextExtractor(workers=2)
+        with mock.patch('pdf_text.ProcessPoolExecutor', side_effect=slow_pool) as pool_class:
+            with ThreadPoolExecutor(max_workers=4) as threads:
+                pools = list(threads.map(lambda _: extractor._get_pool(), range(4)))
+        self.assertEqual(pool_class.call_count, 1)
+        self.assertTrue(all(pool is pools[0] for pool in pools))
+
+if __name__ == '__main__':
+    unittest.main()
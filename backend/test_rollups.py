@@ -0,0 +1,53 @@
+import unittest
+from decimal import Decimal
+
+from ingestion import TRANSACTION_COLUMNS
+from rollups import apply_inserted, rollup_deltas
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.queries = []
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        self.queries.append((' '.join(query.split()), params))
+
+
+def row(date, amount, category='Food', user_id=7):
+    return (user_id, category, amount, date, 'MERCHANT', f'{user_id}{date}{amount}')
+
+
+class TestRollups(unittest.TestCase):
+    def test_rows_are_summed_per_month_category_and_day(self):
+        rows = [row('2025-01-14', 2.1), row('2025-01-03', 10), row('2025-01-14', -5.25),
+                row('2025-02-01', 80, 'Utilities')]
+        monthly, daily = rollup_deltas(TRANSACTION_COLUMNS, rows)
+        self.assertEqual(monthly, [
+            (7, '2025-01', 'Food', 3, Decimal('6.85'), Decimal('17.35'), '2025-01-03', '2025-01-14'),
+            (7, '2025-02', 'Utilities', 1, Decimal('80.00'), Decimal('80.00'), '2025-02-01', '2025-02-01')
+        ])
+        self.assertEqual(daily[1], (7, '2025-01-14', 2, Decimal('-3.15')))
+
+    def test_inserted_rows_are_added_in_two_statements(self):
+        cursor = RecordingCursor()
+        apply_inserted(cursor, TRANSACTION_COLUMNS, [row('2025-01-14', 2), row('2025-03-01', 4)], 2)
+        self.assertEqual(len(cursor.queries), 2)
+        self.assertTrue(cursor.queries[0][0].startswith("INSERT INTO budget_monthly_rollups"))
+        self.assertIn("transaction_count = transaction_count + VALUES(transaction_count)", cursor.queries[0][0])
+        self.assertTrue(cursor.queries[1][0].startswith("INSERT INTO budget_daily_rollups"))
+
+    def test_skipped_duplicates_recompute_the_months_touched(self):
+        cursor = RecordingCursor()
+        apply_inserted(cursor, TRANSACTION_COLUMNS, [row('2025-01-14', 2), row('2025-03-01', 4)], 1)
+        deletes = [params for query, params in cursor.queries if query.startswith('DELETE')]
+        self.assertEqual(deletes, [(7, '2025-01', '2025-03'), (7, '2025-01-01', '2025-04-01')])
+        self.assertTrue(all(params == (7, '2025-01-01', '2025-04-01')
+                            for query, params in cursor.queries if 'FROM budget_data' in query))
+
+        cursor = RecordingCursor()
+        apply_inserted(cursor, TRANSACTION_COLUMNS, [row('2025-01-14', 2)], 0)
+        self.assertEqual(cursor.queries, [])
+
+if __name__ == '__main__':
+    unittest.main()
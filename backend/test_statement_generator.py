@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from bank_profiles import BankProfileRegistry
+from pdf_text import PDFTextExtractor
+from statement_generator import generate_statement
+from statement_parser import StatementTableParser
+from statement_scanner import StatementScanner
+
+
+class TestStatementGenerator(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, "statement.pdf")
+        self.contents = generate_statement(self.path, pages=5, transactions_per_page=25, seed=3)
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_parser_reads_every_generated_row(self):
+        profile = BankProfileRegistry().get('simplii_cash_back_visa')
+        pages = list(StatementTableParser().iter_pages(self.path, profile))
+        self.assertTrue(all(page['confident'] for page in pages))
+
+        rows = [row for page in pages for row in page['rows']]
+        self.assertEqual(len(rows), len(self.contents['transactions']))
+        self.assertAlmostEqual(sum(row['amount'] for row in rows), self.contents['total'], places=2)
+        self.assertEqual([row['date'] for row in rows],
+                         [t['transaction_date'] for t in self.contents['transactions']])
+        self.assertFalse(any("PAYMENT THANK YOU" in row['description'] for row in rows))
+
+    def test_layout_matches_the_simplii_profile(self):
+        pages = list(PDFTextExtractor().iter_pages(self.path))
+        self.assertEqual(len(pages), self.contents['pages'])
+
+        profile = BankProfileRegistry().detect(pages[0].page_content)
+        self.assertEqual(profile.id, 'simplii_cash_back_visa')
+
+        scanner = StatementScanner(profile.sections)
+        for index, page in enumerate(pages):
+            scanner.scan_page(index, page.page_content)
+        self.assertEqual(scanner.header.total, self.contents['total'])
+        self.assertEqual(scanner.header.transaction_count, len(self.contents['transactions']))
+        self.assertEqual(scanner.header.transaction_pages, [1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
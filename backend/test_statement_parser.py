@@ -0,0 +1,132 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+from bank_profiles import BankProfileRegistry
+from statement_parser import StatementTableParser, TableLayout, row_descriptions
+
+
+def word(text, x0, top):
+    return {'text': text, 'x0': x0, 'top': top}
+
+
+class FakePage:
+    """A pdfplumber page with no ruled tables, built from (top, [(x0, text), ...]) lines"""
+    def __init__(self, lines):
+        self.lines = lines
+
+    def extract_text(self):
+        return '\n'.join(' '.join(text for _, text in words) for _, words in self.lines)
+
+    def extract_words(self):
+        return [word(text, x0, top) for top, words in self.lines for x0, text in words]
+
+    def extract_tables(self):
+        return []
+
+
+# A card whose statements look nothing like Simplii's
+OTHER_BANK = {
+    "defaults": {"parser": "llm"},
+    "profiles": [{
+        "id": "northern_rewards_mastercard",
+        "name": "Northern Rewards Mastercard",
+        "match": ["Northern Bank", "Rewards Mastercard"],
+        "parser": "table",
+        "sections": {
+            "payments_start": "^Payments received\\b",
+            "payments_end": "^End of payments\\b",
+            "charges_start": "^Purchases and adjustments\\b"
+        },
+        "table": {
+            "header": {"description": "Details", "amount": "Debit", "category": "Type"},
+            "ignore_words": ["★"]
+        }
+    }]
+}
+
+
+class TestStatementTableParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = StatementTableParser()
+
+    def test_parse_sample_statement(self):
+        pdf_path = "onlineStatement.pdf"
+        self.assertTrue(os.path.exists(pdf_path), "Test PDF file does not exist")
+
+        profile = BankProfileRegistry().get('simplii_cash_back_visa')
+        pages = list(self.parser.iter_pages(pdf_path, profile))
+
+        # Every page of the sample layout should be handled without the LLM
+        self.assertTrue(all(page['confident'] for page in pages))
+
+        rows = [row for page in pages for row in page['rows']]
+
+        # The Spend Report lists 85 transactions totalling $1,209.90
+        self.assertEqual(len(rows), 85)
+        self.assertAlmostEqual(sum(row['amount'] for row in rows), 1209.90, places=2)
+
+        # Payments are not purchases
+        self.assertFalse(any("PAYMENT THANK YOU" in row['description'] for row in rows))
+
+        first_row = rows[0]
+        self.assertEqual(first_row['date'], '2025-01-09')
+        self.assertEqual(first_row['description'], 'CPA - PTO CALGARY AB')
+        self.assertEqual(first_row['amount'], 40.00)
+        self.assertEqual(first_row['spend_category'], 'Professional and Financial Services')
+
+        # Credits keep their sign
+        self.assertIn(-88.20, [row['amount'] for row in rows])
+
+    def test_layout_comes_from_the_profile(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'bank_profiles.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(OTHER_BANK, f)
+            profile = BankProfileRegistry(path).get('northern_rewards_mastercard')
+
+        page = FakePage([
+            (10, [(20, 'Payments'), (80, 'received')]),
+            (30, [(20, 'Date'), (120, 'Details'), (300, 'Type'), (450, 'Debit')]),
+            (50, [(20, 'Feb'), (40, '2'), (120, 'PAYMENT'), (170, 'RECEIVED'), (450, '-500.00')]),
+            (70, [(20, 'End'), (50, 'of'), (70, 'payments')]),
+            (90, [(20, 'Purchases'), (80, 'and'), (110, 'adjustments')]),
+            (110, [(20, 'Date'), (120, 'Details'), (300, 'Type'), (450, 'Debit')]),
+            (130, [(20, 'Feb'), (40, '3'), (100, '★'), (120, 'CORNER'), (170, 'CAFE'), (300, 'Dining'), (450, '4.50')]),
+            (150, [(20, 'Feb'), (40, '5'), (120, 'HARDWARE'), (190, 'CO'), (300, 'Retail'), (450, '30.00CR')]),
+        ])
+        period = (date(2025, 1, 11), date(2025, 2, 10))
+        result = self.parser.parse_page(page, period, TableLayout.from_profile(profile))
+
+        self.assertTrue(result['confident'])
+        self.assertEqual(result['rows'], [
+            {'date': '2025-02-03', 'description': 'CORNER CAFE', 'amount': 4.5, 'spend_category': 'Dining'},
+            {'date': '2025-02-05', 'description': 'HARDWARE CO', 'amount': -30.0, 'spend_category': 'Retail'},
+        ])
+        self.assertTrue(row_descriptions(page.extract_text(), profile.table['ignore_words'])[1].startswith('CORNER CAFE'))
+
+        # Simplii's headings and header words mean nothing on this layout
+        simplii = BankProfileRegistry().get('simplii_cash_back_visa')
+        rows = self.parser.parse_page(page, period, TableLayout.from_profile(simplii))['rows']
+        self.assertIn('PAYMENT RECEIVED', [row['description'] for row in rows])
+
+    def test_rows_take_their_year_from_the_period(self):
+        page = FakePage([
+            (10, [(20, 'December'), (80, '11'), (100, 'to'), (120, 'January'), (170, '10,'), (200, '2025')]),
+            (30, [(20, 'Date'), (120, 'Description'), (450, 'Amount')]),
+            (50, [(20, 'Dec'), (40, '28'), (120, 'NETFLIX.COM'), (450, '16.99')]),
+            (70, [(20, 'Jan'), (40, '5'), (120, 'CORNER'), (170, 'CAFE'), (450, '4.50')]),
+        ])
+        result = self.parser.parse_page(page)
+        self.assertTrue(result['confident'])
+        self.assertEqual(result['period'], (date(2024, 12, 11), date(2025, 1, 10)))
+        self.assertEqual([row['date'] for row in result['rows']], ['2024-12-28', '2025-01-05'])
+
+        # Without a period the rows cannot be dated, so the page goes to the LLM
+        result = self.parser.parse_page(FakePage(page.lines[1:]))
+        self.assertFalse(result['confident'])
+        self.assertEqual(result['rows'], [])
+
+if __name__ == '__main__':
+    unittest.main()
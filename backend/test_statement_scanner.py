@@ -0,0 +1,50 @@
+import unittest
+from bank_profiles import BankProfileRegistry
+from statement_scanner import StatementScanner, strip_spans
+
+PAGES = [
+    "Statement period\nDecember 11 to January 10, 2025\nTotal charges + $1,298.10\n",
+    "Your payments\nDec 15 Dec 16 PAYMENT THANK YOU/PAIEMENT MERCI 300.00\nTotal payments $300.00\n"
+    "Your new charges and credits\nDec 14 Dec 16 FRESHCO #8966 CALGARY AB\nGroceries 40.10\n",
+    "Your new charges and credits (continued)\nJan 02 Jan 03 SHELL CALGARY AB\nTransportation 55.00\n"
+    "Total for 4525 XXXX XXXX 5351 $95.10\n",
+    "Spend Report\nSpend Categories Transactions Amount\nTotal 2 95.10 141 $2,969.95\n",
+    "Terms and conditions apply.\n"
+]
+
+
+class TestStatementScanner(unittest.TestCase):
+    def setUp(self):
+        profile = BankProfileRegistry().get('simplii_cash_back_visa')
+        self.scanner = StatementScanner(profile.sections)
+        self.layouts = [self.scanner.scan_page(i, text) for i, text in enumerate(PAGES)]
+
+    def test_header(self):
+        header = self.scanner.header
+        self.assertEqual(header.total, 95.10)
+        self.assertEqual(header.transaction_count, 2)
+        self.assertEqual((header.period_start, header.period_end), ('2024-12-11', '2025-01-10'))
+        self.assertEqual(header.transaction_pages, [1, 2])
+        self.assertEqual(header.payment_pages, [1])
+        self.assertEqual(header.summary_pages, [3])
+
+    def test_payments_and_summary_are_cut_out(self):
+        charges = strip_spans(PAGES[1], self.layouts[1]['skip_spans'])
+        self.assertNotIn("PAYMENT THANK YOU", charges)
+        self.assertIn("FRESHCO #8966", charges)
+        self.assertEqual(strip_spans(PAGES[3], self.layouts[3]['skip_spans']), "")
+
+    def test_generic_layout_has_no_skip_regions(self):
+        scanner = StatementScanner()
+        layout = scanner.scan_page(1, PAGES[1])
+        self.assertEqual(layout['skip_spans'], [])
+        self.assertTrue(layout['has_rows'])
+        self.assertFalse(scanner.header.recognized)
+
+    def test_page_layout(self):
+        self.assertTrue(self.layouts[2]['in_transactions'])
+        self.assertFalse(self.layouts[4]['in_transactions'])
+        self.assertFalse(self.layouts[4]['has_rows'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from transaction_export import ExportStream, export_format, export_query, open_export
+
+
+def make_rows(count):
+    return [(row_id, date(2025, 1, 1 + row_id % 28), f'MERCHANT, "{row_id}"', Decimal(row_id) / 4, 'Food')
+            for row_id in range(1, count + 1)]
+
+
+class StreamingCursor:
+    """An unbuffered cursor: rows only come out through fetchmany"""
+    def __init__(self, connection, buffered=None):
+        self.connection = connection
+        self.buffered = buffered
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.connection.executed.append(query)
+        if query.lstrip().startswith('SELECT'):
+            self.rows = iter(self.connection.rows)
+
+    def fetchmany(self, size):
+        self.connection.batch_sizes.append(size)
+        return [row for _, row in zip(range(size), self.rows)]
+
+    def close(self):
+        pass
+
+
+class FakePooledConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+        self.batch_sizes = []
+        self.returned = self.discarded = False
+
+    def cursor(self, buffered=None):
+        return StreamingCursor(self, buffered)
+
+    def close(self):
+        self.returned = True
+
+    def discard(self):
+        self.discarded = True
+
+
+class TestTransactionExport(unittest.TestCase):
+    def start(self, rows, fmt, batch_size=4):
+        connection = FakePooledConnection(rows)
+        query, params = export_query(7, {'category': 'Food'})
+        cursor = open_export(connection, query, params)
+        self.assertIs(cursor.buffered, False)
+        return connection, ExportStream(connection, cursor, fmt, batch_size)
+
+    def test_csv_is_streamed_a_batch_at_a_time(self):
+        rows = make_rows(10)
+        connection, stream = self.start(rows, 'csv')
+        chunks = list(stream)
+
+        # The header, then one chunk per batch of four
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(connection.batch_sizes, [4, 4, 4, 4])
+        parsed = list(csv.reader(io.StringIO(''.join(chunks))))
+        self.assertEqual(parsed[0], ['id', 'transaction_date', 'description', 'amount', 'expense_category'])
+        self.assertEqual(parsed[1], ['1', '2025-01-02', 'MERCHANT, "1"', '0.25', 'Food'])
+        self.assertEqual(len(parsed), 11)
+        self.assertTrue(connection.returned)
+        self.assertIn('SET SESSION net_write_timeout = DEFAULT', connection.executed)
+
+    def test_ndjson_has_an_object_per_line(self):
+        connection, stream = self.start(make_rows(5), 'ndjson')
+        lines = ''.join(stream).splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[-1]), {'id': 5, 'transaction_date': '2025-01-06',
+                                                 'description': 'MERCHANT, "5"', 'amount': '1.25',
+                                                 'expense_category': 'Food'})
+
+    def test_abandoned_stream_discards_its_connection(self):
+        connection, stream = self.start(make_rows(10), 'csv')
+        iterator = iter(stream)
+        next(iterator)
+        stream.close()
+        self.assertTrue(connection.discarded)
+        self.assertFalse(connection.returned)
+
+        # Closed before the first chunk, as for a response that is never sent
+        connection, stream = self.start(make_rows(10), 'ndjson')
+        stream.close()
+        self.assertTrue(connection.discarded)
+
+    def test_failure_mid_stream_is_not_a_complete_file(self):
+        connection, stream = self.start(make_rows(10), 'csv')
+        iterator = iter(stream)
+        next(iterator)
+        with mock.patch.object(StreamingCursor, 'fetchmany', side_effect=OSError("connection reset")):
+            with self.assertRaises(OSError):
+                list(iterator)
+        self.assertTrue(connection.discarded)
+        self.assertFalse(connection.returned)
+
+    def test_bad_arguments_are_refused(self):
+        with self.assertRaises(ValueError):
+            export_format({'format': 'xlsx'})
+        with self.assertRaises(ValueError):
+            export_query(7, {'category': 'Snacks'})
+        query, params = export_query(7, {'min_amount': '5'}, ' AND transaction_date >= %s', [date(2025, 1, 1)])
+        self.assertEqual(query.count('%s'), len(params))
+        self.assertIn('ORDER BY transaction_date, id', query)
+
+if __name__ == '__main__':
+    unittest.main()
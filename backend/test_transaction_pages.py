@@ -0,0 +1,70 @@
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from transaction_pages import AFTER_CURSOR, MAX_LIMIT, build_page, decode_cursor, encode_cursor, page_query
+
+
+class KeysetCursor:
+    """Answers page queries from rows in memory, honouring the cursor bound and LIMIT"""
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda row: (row['transaction_date'], row['id']), reverse=True)
+
+    def execute(self, query, params):
+        rows = self.rows
+        if AFTER_CURSOR in query:
+            after = (params[-4], params[-2])
+            rows = [row for row in rows if (row['transaction_date'], row['id']) < after]
+        self.result = rows[:params[-1]]
+
+    def fetchall(self):
+        return self.result
+
+
+class TestTransactionPages(unittest.TestCase):
+    def test_cursor_round_trips(self):
+        token = encode_cursor(date(2025, 1, 14), 1234)
+        self.assertEqual(decode_cursor(token), (date(2025, 1, 14), 1234))
+        for bad in ('nonsense', encode_cursor(date(2025, 1, 14), 1)[:-3], '!!!'):
+            with self.assertRaises(ValueError):
+                decode_cursor(bad)
+
+    def test_filters_and_cursor_are_parameters(self):
+        args = {'category': 'Food', 'min_amount': '-20', 'max_amount': '5.50', 'limit': '10',
+                'cursor': encode_cursor(date(2025, 1, 14), 99)}
+        query, params, limit = page_query(7, args, ' AND transaction_date >= %s', [date(2025, 1, 1)])
+
+        self.assertEqual(query.count('%s'), len(params))
+        self.assertEqual(params, [7, date(2025, 1, 1), 'Food', Decimal('-20'), Decimal('5.50'),
+                                  date(2025, 1, 14), date(2025, 1, 14), 99, 11])
+        self.assertEqual(limit, 10)
+        self.assertIn('ORDER BY transaction_date DESC, id DESC', query)
+        self.assertEqual(page_query(7, {'limit': '100000'})[2], MAX_LIMIT)
+
+        for args in ({'category': 'Snacks'}, {'min_amount': 'ten'}, {'max_amount': 'NaN'},
+                     {'limit': '0'}, {'limit': 'all'}, {'cursor': 'x'}):
+            with self.assertRaises(ValueError):
+                page_query(7, args)
+
+    def test_pages_cover_every_row_once(self):
+        # Several rows share each date, so pages split days between them
+        rows = [{'id': row_id, 'transaction_date': date(2025, 1, 1 + row_id % 4), 'amount': Decimal(row_id)}
+                for row_id in range(1, 24)]
+        cursor = KeysetCursor(rows)
+        seen, args, pages = [], {'limit': '5'}, 0
+        while True:
+            query, params, limit = page_query(7, args)
+            cursor.execute(query, params)
+            page = build_page(cursor.fetchall(), limit)
+            pages += 1
+            self.assertLessEqual(len(page['transactions']), 5)
+            seen.extend(row['id'] for row in page['transactions'])
+            if not page['next_cursor']:
+                break
+            args = {'limit': '5', 'cursor': page['next_cursor']}
+
+        self.assertEqual(pages, 5)
+        self.assertEqual(seen, [row['id'] for row in cursor.rows])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Full transaction history export behind /api/transactions/<user_id>/export.
+
+The export is streamed rather than built up: the query runs on an
+unbuffered cursor, so rows stay in the server's result stream until
+fetchmany() asks for the next `EXPORT_BATCH_SIZE`, and each batch is
+written out as CSV or NDJSON before the next is read. Memory stays the same
+for ten rows or ten million. Rows come in the order of
+idx_budget_data_user_date (oldest first), so MySQL starts sending at once
+instead of sorting the history first. The filters are those of
+/api/transactions (see transaction_pages.py).
+
+A streamed response outlives its request context, so the export holds its
+own pooled connection and returns it when the last row is sent. If the
+client goes away mid-stream the connection still has unread rows and is
+closed instead of reused.
+"""
+import csv
+import io
+import json
+import logging
+import os
+from dotenv import load_dotenv
+
+from transaction_pages import page_filters
+
+load_dotenv()
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+# The server drops a result it cannot send for this long; a slow download
+# holds the stream back, so allow far longer than the default 60 seconds
+EXPORT_NET_WRITE_TIMEOUT = int(os.getenv('EXPORT_NET_WRITE_TIMEOUT', '3600'))
+
+EXPORT_COLUMNS = ('id', 'transaction_date', 'description', 'amount', 'expense_category')
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+EXPORT_QUERY = f"""
+    SELECT {', '.join(EXPORT_COLUMNS)}
+    FROM budget_data WHERE user_id = %s{{conditions}}
+    ORDER BY transaction_date, id
+"""
+
+
+def export_format(args):
+    """The format asked for with ?format= (default csv); ValueError if unknown"""
+    name = args.get('format') or 'csv'
+    if name not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    return name
+
+
+def export_query(user_id, args, date_filter='', date_params=()):
+    """The export statement and its parameters; ValueError for a bad filter"""
+    filters, params = page_filters(args)
+    return EXPORT_QUERY.format(conditions=date_filter + filters), [user_id, *date_params, *params]
+
+
+def fetch_batches(cursor, batch_size=None):
+    """Lists of at most `batch_size` rows until the result is exhausted"""
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _text(value):
+    # Dates as YYYY-MM-DD and amounts exactly as stored
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def csv_chunks(batches):
+    """The header, then one chunk of CSV lines per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_text(value) for value in row] for row in rows])
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(batches):
+    """One chunk per batch, a JSON object per line"""
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + '\n' for row in rows)
+
+
+def open_export(connection, query, params):
+    """Start the export query on an unbuffered cursor of `connection` and return the cursor"""
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute("SET SESSION net_write_timeout = %s", (EXPORT_NET_WRITE_TIMEOUT,))
+        cursor.execute(query, params)
+    except Exception:
+        cursor.close()
+        raise
+    return cursor
+
+
+class ExportStream:
+    """The body of an export response, a chunk per batch of rows.
+
+    It owns `connection` (a PooledConnection) and `cursor` (from
+    open_export). The WSGI server calls close() when the response is done
+    or abandoned, even if it was never iterated; the connection goes back
+    to the pool only if every row was read.
+    """
+
+    def __init__(self, connection, cursor, fmt, batch_size=None):
+        self.connection = connection
+        self.cursor = cursor
+        self.chunks = csv_chunks if fmt == 'csv' else ndjson_chunks
+        self.batch_size = batch_size
+        self.finished = False
+
+    def __iter__(self):
+        try:
+            yield from self.chunks(fetch_batches(self.cursor, self.batch_size))
+            self.finished = True
+        except Exception as e:
+            # The status line has gone out already; raising makes the server
+            # drop the connection, so the client sees a broken download rather
+            # than a short file that looks complete
+            logging.error(f"Transaction export failed: {str(e)}")
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        if self.finished and _finish(connection, self.cursor):
+            connection.close()
+        else:
+            connection.discard()
+
+
+def _finish(connection, cursor):
+    # Hand the connection back as open_export found it
+    try:
+        cursor.close()
+        cursor = connection.cursor()
+        cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+        cursor.close()
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,113 @@
+"""Keyset-paginated, filterable listing behind /api/transactions.
+
+A page is the newest `limit` rows of a user ordered by (transaction_date,
+id) descending. The next page starts after the last row sent, which the
+client hands back as an opaque `cursor`; unlike OFFSET, reading page 100
+costs the same as reading page 1. Optional filters narrow the rows:
+?category=, ?from= / ?to= (app.date_range_filter) and ?min_amount= /
+?max_amount=. Migration 007 gives every combination an index that returns
+rows in page order.
+"""
+import base64
+import binascii
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from merchant_index import VALID_CATEGORIES
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+PAGE_QUERY = """
+    SELECT id, transaction_date, description, amount, expense_category
+    FROM budget_data WHERE user_id = %s{conditions}
+    ORDER BY transaction_date DESC, id DESC LIMIT %s
+"""
+
+# Rows strictly before the cursor's (transaction_date, id). The leading
+# `transaction_date <= %s` is what MySQL turns into an index range (and
+# partition pruning); a row constructor comparison would not be.
+AFTER_CURSOR = " AND transaction_date <= %s AND (transaction_date < %s OR id < %s)"
+
+
+def encode_cursor(transaction_date, row_id):
+    """The cursor for the page after the row (transaction_date, row_id)"""
+    token = f"{transaction_date.isoformat()}:{row_id}".encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(transaction_date, id) from a cursor; ValueError if it is not one"""
+    try:
+        text = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        day, row_id = text.split(':')
+        return date.fromisoformat(day), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def page_limit(value):
+    """The page size asked for, DEFAULT_LIMIT if none and at most MAX_LIMIT"""
+    if not value:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be a positive integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_LIMIT)
+
+
+def _amount(args, name):
+    try:
+        amount = Decimal(args[name])
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a number")
+    if not amount.is_finite():
+        raise ValueError(f"{name} must be a number")
+    return amount
+
+
+def page_filters(args):
+    """SQL conditions and parameters for ?category=, ?min_amount= and ?max_amount="""
+    conditions, params = [], []
+    category = args.get('category')
+    if category:
+        if category not in VALID_CATEGORIES:
+            raise ValueError(f"Unknown category: {category}")
+        conditions.append(" AND expense_category = %s")
+        params.append(category)
+    for name, operator in (('min_amount', '>='), ('max_amount', '<=')):
+        if args.get(name):
+            conditions.append(f" AND amount {operator} %s")
+            params.append(_amount(args, name))
+    return ''.join(conditions), params
+
+
+def page_query(user_id, args, date_filter='', date_params=()):
+    """The statement for one page, its parameters and the page size.
+
+    Raises ValueError for a bad limit, cursor or filter. One row more than
+    the page is fetched to tell whether there is a next page.
+    """
+    limit = page_limit(args.get('limit'))
+    filters, params = page_filters(args)
+    conditions = date_filter + filters
+    params = [user_id, *date_params, *params]
+    if args.get('cursor'):
+        transaction_date, row_id = decode_cursor(args['cursor'])
+        conditions += AFTER_CURSOR
+        params += [transaction_date, transaction_date, row_id]
+    return PAGE_QUERY.format(conditions=conditions), params + [limit + 1], limit
+
+
+def build_page(rows, limit):
+    """The /api/transactions payload from up to limit + 1 rows (dictionaries)"""
+    transactions = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = transactions[-1]
+        next_cursor = encode_cursor(last['transaction_date'], last['id'])
+    return {'transactions': transactions, 'next_cursor': next_cursor}
+
@@ -0,0 +1,39 @@
+"""Standalone upload worker: python upload_worker.py
+
+Runs the statement-ingestion worker pool outside the web process so web
+workers stay free for the read endpoints. It shares the web app's queue
+file (upload_jobs.sqlite3 next to job_queue.py, or UPLOAD_JOB_DB_PATH if
+set); start the web app with UPLOAD_WORKER_THREADS=0.
+"""
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+from database import checkout_db
+from pdf_processor import PDFProcessor
+from merchant_index import MerchantCategoryIndex
+from ingestion import StatementIngestor
+from job_queue import UploadJobQueue, UploadWorkerPool
+from partitions import PartitionMaintainer
+
+load_dotenv()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    merchant_index = MerchantCategoryIndex(connection_factory=checkout_db)
+    pdf_processor = PDFProcessor(merchant_index=merchant_index)
+    ingestor = StatementIngestor(pdf_processor, merchant_index=merchant_index)
+
+    workers = int(os.getenv('UPLOAD_WORKER_PROCESS_THREADS', '2'))
+    pool = UploadWorkerPool(UploadJobQueue(), ingestor.run_job, workers=workers,
+                            cleanup=ingestor.discard_upload)
+    pool.start()
+    if PartitionMaintainer.enabled():
+        PartitionMaintainer(checkout_db).start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pool.stop()
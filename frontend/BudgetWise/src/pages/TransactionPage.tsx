@@ -1,4 +1,4 @@
-import { CSSProperties, useState, useEffect } from "react";
+import { CSSProperties, useState, useEffect, useRef, useCallback } from "react";
 import Navbar from "../components/ui/navbar";
 // import { useNavigate } from "react-router-dom";
 import { useMediaQuery } from "react-responsive";
@@ -15,47 +15,111 @@ interface GroupedTransactions {
   [key: string]: Transaction[];
 }
 
+const PAGE_SIZE = 50;
+
 const TransactionsPage = () => {
-  const [transactions, setTransactions] = useState<GroupedTransactions>({});
+  const [transactions, setTransactions] = useState<Transaction[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
   const [selectedMonth, setSelectedMonth] = useState("all");
   const [selectedCategory, setSelectedCategory] = useState("all");
   const [availableMonths, setAvailableMonths] = useState<string[]>([]);
-  const [availableCategories, setAvailableCategories] = useState<string[]>([]);
   const isMobile = useMediaQuery({ maxWidth: 768 });
+  // Responses for filters that have since changed are dropped
+  const requestId = useRef(0);
+  const sentinel = useRef<HTMLDivElement>(null);
+
+  const fetchPage = useCallback(
+    async (cursor: string | null) => {
+      const request = cursor ? requestId.current : ++requestId.current;
+      const userId = localStorage.getItem("user_id");
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (selectedMonth !== "all") {
+        const [year, month] = selectedMonth.split("-").map(Number);
+        const lastDay = new Date(year, month, 0).getDate();
+        params.set("from", `${selectedMonth}-01`);
+        params.set("to", `${selectedMonth}-${String(lastDay).padStart(2, "0")}`);
+      }
+      if (selectedCategory !== "all") params.set("category", selectedCategory);
+      if (cursor) params.set("cursor", cursor);
 
-  useEffect(() => {
-    const fetchTransactions = async () => {
       try {
-        const userId = localStorage.getItem("user_id");
         const response = await fetch(
-          `${import.meta.env.VITE_BACKEND_URL}/api/transactions/${userId}`
+          `${import.meta.env.VITE_BACKEND_URL}/api/transactions/${userId}?${params}`
         );
 
         if (!response.ok) throw new Error("Failed to fetch transactions");
 
         const data = await response.json();
-        const grouped = groupTransactionsByDate(data.transactions);
-        setTransactions(grouped);
-
-        const months = extractUniqueMonths(data.transactions);
-        setAvailableMonths(months);
-
-        const categories = Array.from(
-          new Set(data.transactions.map((t: Transaction) => t.expense_category))
+        if (request !== requestId.current) return;
+        setTransactions((loaded) =>
+          cursor ? [...loaded, ...data.transactions] : data.transactions
         );
-        setAvailableCategories(categories as string[]);
+        setNextCursor(data.next_cursor);
       } catch (err) {
-        setError("Failed to load transactions. Please try again later.");
+        if (request === requestId.current) {
+          setError("Failed to load transactions. Please try again later.");
+        }
       } finally {
-        setLoading(false);
+        if (request === requestId.current) {
+          setLoading(false);
+          setLoadingMore(false);
+        }
+      }
+    },
+    [selectedMonth, selectedCategory]
+  );
+
+  // The months to filter by come from the dashboard summary, which is cheap
+  useEffect(() => {
+    const fetchMonths = async () => {
+      try {
+        const userId = localStorage.getItem("user_id");
+        const response = await fetch(
+          `${import.meta.env.VITE_BACKEND_URL}/api/check-transactions/${userId}`
+        );
+        if (!response.ok) return;
+        const data = await response.json();
+        setAvailableMonths(
+          data.monthly_spending
+            .map((entry: { month: string }) => entry.month)
+            .reverse()
+        );
+      } catch (err) {
+        // The month filter just stays empty
       }
     };
 
-    fetchTransactions();
+    fetchMonths();
   }, []);
 
+  useEffect(() => {
+    setLoading(true);
+    setTransactions([]);
+    setNextCursor(null);
+    fetchPage(null);
+  }, [fetchPage]);
+
+  // Load the next page when the end of the list scrolls into view
+  useEffect(() => {
+    const element = sentinel.current;
+    if (!element || !nextCursor || loadingMore) return;
+
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries[0].isIntersecting) {
+          setLoadingMore(true);
+          fetchPage(nextCursor);
+        }
+      },
+      { rootMargin: "400px" }
+    );
+    observer.observe(element);
+    return () => observer.disconnect();
+  }, [nextCursor, loadingMore, fetchPage]);
+
   const groupTransactionsByDate = (transactions: Transaction[]) => {
     return transactions.reduce((acc: GroupedTransactions, transaction) => {
       const date = new Date(transaction.transaction_date).toLocaleDateString();
@@ -65,32 +129,18 @@ const TransactionsPage = () => {
     }, {});
   };
 
-  const extractUniqueMonths = (transactions: Transaction[]) => {
-    const months = transactions.map((t) =>
-      new Date(t.transaction_date).toLocaleString("default", {
-        month: "long",
-        year: "numeric",
-      })
-    );
-    return Array.from(new Set(months));
+  const monthLabel = (month: string) => {
+    const [year, number] = month.split("-").map(Number);
+    return new Date(year, number - 1, 1).toLocaleString("default", {
+      month: "long",
+      year: "numeric",
+    });
   };
 
-  const filteredTransactions = Object.entries(transactions)
-    .filter(([date]) => {
-      const monthYear = new Date(date).toLocaleString("default", {
-        month: "long",
-        year: "numeric",
-      });
-      return selectedMonth === "all" || monthYear === selectedMonth;
-    })
-    .map(([date, transactions]) => ({
-      date,
-      transactions: transactions.filter(
-        (t) =>
-          selectedCategory === "all" || t.expense_category === selectedCategory
-      ),
-    }))
-    .filter((group) => group.transactions.length > 0);
+  // Filtering happens on the server; the rows only need grouping by day
+  const groupedTransactions = Object.entries(
+    groupTransactionsByDate(transactions)
+  ).map(([date, transactions]) => ({ date, transactions }));
 
   const styles: { [key: string]: CSSProperties } = {
     pageWrapper: {
@@ -194,7 +244,6 @@ const TransactionsPage = () => {
     },
   };
 
-  if (loading) return <div style={styles.loading}>Loading transactions...</div>;
   if (error) return <div style={styles.error}>{error}</div>;
 
   return (
@@ -212,7 +261,7 @@ const TransactionsPage = () => {
               <option value="all">All Months</option>
               {availableMonths.map((month) => (
                 <option key={month} value={month}>
-                  {month}
+                  {monthLabel(month)}
                 </option>
               ))}
             </select>
@@ -223,7 +272,7 @@ const TransactionsPage = () => {
               style={styles.filterSelect}
             >
               <option value="all">All Categories</option>
-              {availableCategories.map((category) => (
+              {Object.keys(CATEGORIES).map((category) => (
                 <option
                   key={category}
                   value={category}
@@ -243,7 +292,11 @@ const TransactionsPage = () => {
           </div>
         </div>
 
-        {filteredTransactions.map(({ date, transactions }) => (
+        {loading && (
+          <div style={styles.loading}>Loading transactions...</div>
+        )}
+
+        {groupedTransactions.map(({ date, transactions }) => (
           <div key={date} style={styles.dateGroup}>
             <div style={styles.dateHeader}>
               {new Date(date).toLocaleDateString("en-US", {
@@ -286,7 +339,12 @@ const TransactionsPage = () => {
           </div>
         ))}
 
-        {filteredTransactions.length === 0 && (
+        <div ref={sentinel} />
+        {loadingMore && (
+          <div style={styles.loading}>Loading more transactions...</div>
+        )}
+
+        {!loading && groupedTransactions.length === 0 && (
           <div style={styles.error}>
             No transactions found for the selected filters
           </div>
@@ -41,6 +41,20 @@ const UploadPage = () => {
     }
   };
 
+  const waitForJob = async (jobId: string) => {
+    while (true) {
+      const response = await fetch(
+        `${import.meta.env.VITE_BACKEND_URL}/api/jobs/${jobId}`
+      );
+      const job = await response.json();
+
+      if (!response.ok) throw new Error(job.error || "Failed to check upload status");
+      if (job.state === "completed" || job.state === "failed") return job;
+
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+  };
+
   const handleUpload = async () => {
     if (!selectedFile) {
       setUploadStatus("Please select a file first");
@@ -77,8 +91,18 @@ const UploadPage = () => {
       const data = await response.json();
 
       if (response.ok) {
+        // Processing happens in the background; wait for the job to finish
+        setUploadStatus(" Processing your statement...");
+        const job = await waitForJob(data.job_id);
+
+        if (job.state === "failed") {
+          setUploadStatus(job.error || "Upload failed. Please try again.");
+          setTimeout(() => setShowPopup(false), 3000);
+          return;
+        }
+
         setUploadStatus(
-          ` Success! Added ${data.transactions_count} transactions to your budget.`
+          ` Success! Added ${job.transactions_count} transactions to your budget.`
         );
         setSelectedFile(null);
 